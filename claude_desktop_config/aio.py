@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+Async counterparts of the blocking file I/O of
+:class:`~claude_desktop_config.impl.ClaudeDesktopConfig`, for asyncio based
+services. Every read and write runs in an executor, so the event loop is
+never blocked.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import AsyncClaudeDesktopConfig, enable_mcp_server
+
+    acdc = AsyncClaudeDesktopConfig()
+    config = await acdc.read()
+    async with acdc.session() as config:
+        enable_mcp_server(config, "github", {"command": "npx"})
+"""
+
+import typing as T
+import functools
+import contextlib
+import dataclasses
+from pathlib import Path
+
+from . import metrics
+from .impl import ClaudeDesktopConfig, CONCURRENCY_LOCK, _copy_json
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+
+
+@dataclasses.dataclass
+class AsyncClaudeDesktopConfig:
+    """
+    Async wrapper of a :class:`~claude_desktop_config.impl.ClaudeDesktopConfig`.
+
+    :param cdc: The wrapped config, its ``cache``, ``codec``, ``minimal_edit``
+        and ``lazy`` options apply.
+    :param executor: The executor that runs the file I/O, ``None`` means the
+        default executor of the running loop, a bounded thread pool. Pass a
+        dedicated ``ThreadPoolExecutor`` to bound the I/O separately.
+    """
+
+    cdc: ClaudeDesktopConfig = dataclasses.field(default_factory=ClaudeDesktopConfig)
+    executor: T.Optional["concurrent.futures.Executor"] = dataclasses.field(
+        default=None,
+        repr=False,
+        compare=False,
+    )
+
+    @property
+    def path(self) -> Path:
+        return self.cdc.path
+
+    async def _run(self, func: T.Callable, *args, **kwargs):
+        # imported here, asyncio is slow to import
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(func, *args, **kwargs),
+        )
+
+    async def read(self, track: bool = False) -> dict[str, T.Any]:
+        """
+        See :meth:`~claude_desktop_config.impl.ClaudeDesktopConfig.read`.
+        """
+        return await self._run(self.cdc.read, track=track)
+
+    async def write(
+        self,
+        config: dict[str, T.Any],
+        atomic: bool = False,
+        fsync_dir: bool = False,
+    ) -> bool:
+        """
+        See :meth:`~claude_desktop_config.impl.ClaudeDesktopConfig.write`.
+        """
+        return await self._run(
+            self.cdc.write,
+            config,
+            atomic=atomic,
+            fsync_dir=fsync_dir,
+        )
+
+    async def update(
+        self,
+        mutate: T.Callable[[dict[str, T.Any]], T.Any],
+        concurrency: str = CONCURRENCY_LOCK,
+        **kwargs,
+    ) -> bool:
+        """
+        See :meth:`~claude_desktop_config.impl.ClaudeDesktopConfig.update`,
+        ``mutate`` is called in the executor, it must not touch the event loop.
+        """
+        return await self._run(
+            self.cdc.update,
+            mutate,
+            concurrency=concurrency,
+            **kwargs,
+        )
+
+    def _read_with_snapshot(
+        self,
+        track: bool,
+    ) -> tuple[dict[str, T.Any], T.Optional[dict[str, T.Any]]]:
+        config = self.cdc.read(track=track)
+        return config, None if track else _copy_json(config)
+
+    def _write_if_changed(
+        self,
+        config: dict[str, T.Any],
+        before: T.Optional[dict[str, T.Any]],
+        atomic: bool,
+        fsync_dir: bool,
+    ):
+        changed = config.dirty if before is None else config != before
+        if changed:
+            self.cdc.write(config, atomic=atomic, fsync_dir=fsync_dir)
+        else:
+            metrics.count(metrics.COUNTER_WRITES_SKIPPED)
+
+    @contextlib.asynccontextmanager
+    async def session(
+        self,
+        atomic: bool = True,
+        fsync_dir: bool = False,
+        track: bool = False,
+    ) -> T.AsyncIterator[dict[str, T.Any]]:
+        """
+        See :meth:`~claude_desktop_config.impl.ClaudeDesktopConfig.session`.
+        The file is not locked, use :meth:`update` to protect the
+        read-modify-write against other writers.
+        """
+        config, before = await self._run(self._read_with_snapshot, track)
+        yield config
+        await self._run(self._write_if_changed, config, before, atomic, fsync_dir)
@@ -1,7 +1,46 @@
 # -*- coding: utf-8 -*-
 
+from .impl import fingerprint_settings
 from .impl import enable_mcp_server
 from .impl import disable_mcp_server
+from .impl import McpChangeSet
+from .impl import apply_mcp_changes
+from .impl import SettingsChange
+from .impl import diff_settings
+from .impl import McpPlan
+from .impl import ConflictError
+from .impl import ReadCache
 from .impl import ClaudeDesktopConfig
+from .impl import FrozenDict
+from .impl import FrozenList
+from .impl import freeze_json
 from .impl import Mcp
 from .impl import BaseMcpEnum
+from .codec import JsonCodec
+from .codec import StdlibJsonCodec
+from .codec import OrjsonCodec
+from .document import ConfigDocument
+from .source_map import SourceMap
+from .source_map import parse_with_source_map
+from .source_map import LazySourceMap
+from .source_map import parse_lazy
+from .batch import ApplyResult
+from .batch import apply_many
+from .batch import apply_many_async
+from .batch import resume_many
+from .watcher import McpDriftWatcher
+from .discovery import DiscoveryCache
+from .discovery import discover_claude_desktop_configs
+from .aio import AsyncClaudeDesktopConfig
+from .metrics import Collector
+from .metrics import MetricsAggregator
+from .metrics import instrument
+from .snapshot import Snapshot
+from .snapshot import SnapshotStore
+from .journal import JournalEntry
+from .journal import JournalState
+from .journal import Journal
+from .profile import McpProfile
+from .layers import Layer
+from .layers import MergedLayers
+from .layers import merge_layers
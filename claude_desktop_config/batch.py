@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+"""
+Apply the same MCP set to many Claude Desktop config files at once.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import apply_many
+
+    results = apply_many(
+        MyMcpServers,
+        [MyMcpServers.filesystem, MyMcpServers.github],
+        ["/home/alice/.config/Claude/claude_desktop_config.json", ...],
+        max_workers=16,
+    )
+    for res in results:
+        print(res.path, res.status)
+
+    # or from asyncio code, results are streamed as each file is done
+    async for res in apply_many_async(MyMcpServers, wanted_mcps, paths):
+        print(res.path, res.status)
+
+    # record the batch in a journal, to resume it if it is killed partway
+    with Journal("/var/lib/mcp/batch.journal") as journal:
+        apply_many(MyMcpServers, wanted_mcps, paths, journal=journal)
+    resume_many(MyMcpServers, "/var/lib/mcp/batch.journal")
+"""
+
+import typing as T
+import dataclasses
+from pathlib import Path
+
+from .impl import T_STAT_KEY, ClaudeDesktopConfig, BaseMcpEnum
+from .journal import Journal
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+
+
+STATUS_CHANGED = "changed"
+STATUS_UNCHANGED = "unchanged"
+STATUS_ERROR = "error"
+
+
+@dataclasses.dataclass
+class ApplyResult:
+    """
+    The outcome of applying the wanted MCP set to a single config file.
+
+    :param path: The path of the config file.
+    :param changed: True if the file was rewritten.
+    :param error: The exception raised while processing this file, if any.
+    :param stat_key: The ``(st_mtime_ns, st_size, st_ino)`` of the file that
+        was written, taken from the written file itself, None if nothing was
+        written.
+    """
+
+    path: Path = dataclasses.field()
+    changed: bool = dataclasses.field(default=False)
+    error: T.Optional[BaseException] = dataclasses.field(default=None)
+    stat_key: T.Optional[T_STAT_KEY] = dataclasses.field(
+        default=None,
+        repr=False,
+        compare=False,
+    )
+
+    @property
+    def status(self) -> str:
+        """
+        One of ``"changed"``, ``"unchanged"`` or ``"error"``.
+        """
+        if self.error is not None:
+            return STATUS_ERROR
+        elif self.changed:
+            return STATUS_CHANGED
+        else:
+            return STATUS_UNCHANGED
+
+
+T_CDC_LIKE = T.Union[ClaudeDesktopConfig, str, Path]
+
+
+def _to_cdc(cdc: T_CDC_LIKE) -> ClaudeDesktopConfig:
+    if isinstance(cdc, ClaudeDesktopConfig):
+        return cdc
+    return ClaudeDesktopConfig(path=Path(cdc))
+
+
+def _apply_one(
+    args: tuple[T.Type[BaseMcpEnum], frozenset[BaseMcpEnum], ClaudeDesktopConfig],
+) -> ApplyResult:
+    mcp_enum_class, wanted_mcps, cdc = args
+    try:
+        changed = mcp_enum_class.apply(wanted_mcps, cdc)
+    except Exception as e:
+        return ApplyResult(path=cdc.path, error=e)
+    # a written file is already recorded as done by its config
+    if cdc.journal is not None and not changed:
+        cdc.journal.done(cdc.path)
+    if changed:
+        return ApplyResult(path=cdc.path, changed=True, stat_key=cdc._written_stat_key)
+    return ApplyResult(path=cdc.path)
+
+
+def _get_enum_name(mcp_enum_class: T.Type[BaseMcpEnum]) -> str:
+    return f"{mcp_enum_class.__module__}:{mcp_enum_class.__qualname__}"
+
+
+def _begin(
+    mcp_enum_class: T.Type[BaseMcpEnum],
+    wanted_mcps: frozenset[BaseMcpEnum],
+    cdcs: list[ClaudeDesktopConfig],
+    journal: T.Optional[Journal],
+) -> list[ClaudeDesktopConfig]:
+    """
+    Record the batch in the journal, and return configs that record their
+    writes in it.
+    """
+    if journal is None:
+        return cdcs
+    journal.begin(
+        _get_enum_name(mcp_enum_class),
+        mcp_enum_class._get_wanted_names(wanted_mcps),
+        [cdc.path for cdc in cdcs],
+    )
+    return [dataclasses.replace(cdc, journal=journal) for cdc in cdcs]
+
+
+def apply_many(
+    mcp_enum_class: T.Type[BaseMcpEnum],
+    wanted_mcps: T.Iterable[BaseMcpEnum],
+    cdcs: T.Iterable[T_CDC_LIKE],
+    max_workers: T.Optional[int] = None,
+    use_process: bool = False,
+    chunksize: int = 16,
+    journal: T.Optional[Journal] = None,
+) -> list[ApplyResult]:
+    """
+    Run :meth:`BaseMcpEnum.apply` against many config files concurrently.
+
+    A failure on one file is captured in its :class:`ApplyResult` and never
+    stops the rest of the batch.
+
+    :param mcp_enum_class: The :class:`BaseMcpEnum` subclass that defines
+        all managed MCP servers.
+    :param wanted_mcps: The MCPs that should be enabled on every file.
+    :param cdcs: Config file paths or :class:`ClaudeDesktopConfig` objects.
+    :param max_workers: Number of worker threads or processes,
+        ``None`` means the executor's default.
+    :param use_process: Use a process pool instead of a thread pool. The enum
+        class must be importable by the worker processes (defined at module level).
+    :param chunksize: Number of files sent to a worker process at once,
+        only used when ``use_process`` is True.
+    :param journal: Record the batch, and each change before it is made, in
+        this :class:`~claude_desktop_config.journal.Journal`, so that
+        :func:`resume_many` can finish the batch if it is interrupted.
+        Not supported with ``use_process``.
+
+    :return: One :class:`ApplyResult` per input, in input order.
+    """
+    if use_process and journal is not None:
+        raise ValueError("a journal can't be shared with worker processes")
+    wanted_mcps = frozenset(wanted_mcps)
+    cdcs = _begin(mcp_enum_class, wanted_mcps, [_to_cdc(cdc) for cdc in cdcs], journal)
+    tasks = [(mcp_enum_class, wanted_mcps, cdc) for cdc in cdcs]
+    # imported here because multiprocessing is slow to import
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    if use_process:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_apply_one, tasks, chunksize=chunksize))
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_apply_one, tasks))
+
+
+async def apply_many_async(
+    mcp_enum_class: T.Type[BaseMcpEnum],
+    wanted_mcps: T.Iterable[BaseMcpEnum],
+    cdcs: T.Iterable[T_CDC_LIKE],
+    max_concurrency: int = 16,
+    executor: T.Optional["concurrent.futures.Executor"] = None,
+    journal: T.Optional[Journal] = None,
+) -> T.AsyncIterator[ApplyResult]:
+    """
+    Async version of :func:`apply_many`, for asyncio based services. The
+    file I/O runs in ``executor`` and at most ``max_concurrency`` files are
+    processed at once.
+
+    A failure on one file is captured in its :class:`ApplyResult` and never
+    stops the rest of the batch. Breaking out of the loop early cancels the
+    files that were not started yet, call ``aclose()`` on the generator to
+    do it right away.
+
+    :param mcp_enum_class: The :class:`BaseMcpEnum` subclass that defines
+        all managed MCP servers.
+    :param wanted_mcps: The MCPs that should be enabled on every file.
+    :param cdcs: Config file paths or :class:`ClaudeDesktopConfig` objects.
+    :param max_concurrency: Maximum number of files processed at once.
+    :param executor: The executor that runs the file I/O, ``None`` means the
+        default executor of the running loop.
+    :param journal: See :func:`apply_many`. The batch is recorded before the
+        first file is processed, blocking the event loop for one fsync.
+
+    :return: An async iterator of one :class:`ApplyResult` per input,
+        in completion order.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+    # imported here, asyncio is slow to import
+    import asyncio
+
+    wanted_mcps = frozenset(wanted_mcps)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(cdc: ClaudeDesktopConfig) -> ApplyResult:
+        async with semaphore:
+            return await loop.run_in_executor(
+                executor,
+                _apply_one,
+                (mcp_enum_class, wanted_mcps, cdc),
+            )
+
+    cdcs = _begin(mcp_enum_class, wanted_mcps, [_to_cdc(cdc) for cdc in cdcs], journal)
+    tasks = [asyncio.ensure_future(run(cdc)) for cdc in cdcs]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def resume_many(
+    mcp_enum_class: T.Type[BaseMcpEnum],
+    journal_path: T.Union[str, Path],
+    max_workers: T.Optional[int] = None,
+) -> list[ApplyResult]:
+    """
+    Finish the latest batch of a journal written by :func:`apply_many`.
+
+    Only the files without a ``done`` record are applied again, and an
+    interrupted change whose file already has the content it was writing is
+    not applied again. The wanted MCP set is the one of the batch. The
+    files are read and written as plain :class:`ClaudeDesktopConfig`.
+
+    :param mcp_enum_class: The enum class of the batch.
+    :param journal_path: The journal file, new records are appended to it.
+    :param max_workers: See :func:`apply_many`.
+
+    :return: One :class:`ApplyResult` per file that was applied again, in
+        batch order.
+
+    :raises ValueError: If the batch was run with another enum class.
+    """
+    state = Journal.read(journal_path)
+    if state.enum is None:
+        return []
+    enum_name = _get_enum_name(mcp_enum_class)
+    if state.enum != enum_name:
+        raise ValueError(
+            f"the journal batch was run with {state.enum}, not {enum_name}"
+        )
+    mcp_index = mcp_enum_class._get_mcp_index()
+    wanted_mcps = [mcp_index[name] for name in state.wanted]
+    # the new batch record leaves out the changes that were fully written
+    applied = {entry.path for entry in state.interrupted if entry.is_applied()}
+    paths = [path for path in state.unfinished if path not in applied]
+    with Journal(journal_path) as journal:
+        return apply_many(
+            mcp_enum_class,
+            wanted_mcps,
+            paths,
+            max_workers=max_workers,
+            journal=journal,
+        )
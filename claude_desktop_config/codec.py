@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pluggable JSON backend used by :class:`~claude_desktop_config.impl.ClaudeDesktopConfig`.
+
+Every codec parses ``bytes`` directly and serializes to ``bytes`` that are
+identical to ``json.dumps(config, indent=4).encode("utf-8")``, so switching
+the backend never changes the file content.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import ClaudeDesktopConfig, StdlibJsonCodec
+
+    # orjson is used automatically when it is installed
+    cdc = ClaudeDesktopConfig()
+    # force the standard library backend
+    cdc = ClaudeDesktopConfig(codec=StdlibJsonCodec())
+"""
+
+import typing as T
+import re
+import json
+import math
+
+
+class JsonCodec:
+    """
+    Base class of JSON backends.
+    """
+
+    name: str = ""
+    #: True if :meth:`loads` also parses a :class:`memoryview`, e.g. of a
+    #: memory-mapped file, without copying it to ``bytes`` first
+    accepts_buffer: bool = False
+
+    def loads(self, data: bytes) -> T.Any:
+        """
+        Parse UTF-8 encoded JSON bytes.
+        """
+        raise NotImplementedError
+
+    def dumps(self, obj: T.Any) -> bytes:
+        """
+        Serialize to UTF-8 encoded JSON bytes, with the same format as
+        ``json.dumps(obj, indent=4)``.
+        """
+        raise NotImplementedError
+
+
+class StdlibJsonCodec(JsonCodec):
+    """
+    The :mod:`json` module from the standard library.
+    """
+
+    name = "json"
+
+    def loads(self, data: bytes) -> T.Any:
+        return json.loads(data)
+
+    def dumps(self, obj: T.Any) -> bytes:
+        return json.dumps(obj, indent=4).encode("utf-8")
+
+
+# same as ``[\x7f-\U0010ffff]`` but much cheaper to compile at import time
+_RE_NON_ASCII = re.compile("[^\x00-\x7e]")
+
+# number tokens that ``orjson`` and ``json`` format differently, for example
+# ``1e16`` vs ``1e+16`` and ``0.000015`` vs ``1.5e-05``. A match inside a
+# string value is a false positive, it only makes us take the slow path.
+_RE_UNSAFE_NUMBER = re.compile(rb"(?:^|: |\n *)-?(?:0\.0000|[0-9]+(?:\.[0-9]+)?[eE])")
+_DIGITS_TO_ZERO = bytes.maketrans(b"123456789", b"000000000")
+
+
+def _has_unsafe_number(data: bytes) -> bool:
+    # plain substring searches are much cheaper than the regex, which only
+    # runs when one of them matches
+    if data.find(b"0.0000") == -1:
+        zeroed = data.translate(_DIGITS_TO_ZERO)
+        if zeroed.find(b"0e0") == -1 and zeroed.find(b"0e-") == -1:
+            return False
+    return _RE_UNSAFE_NUMBER.search(data) is not None
+
+
+def _has_non_finite(obj: T.Any) -> bool:
+    """
+    True if ``obj`` contains a ``NaN`` or an infinite float, which ``orjson``
+    writes as ``null`` and :mod:`json` as ``NaN`` / ``Infinity``.
+    """
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    elif isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    elif isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(value) for value in obj)
+    return False
+
+
+def _escape_char(match: re.Match) -> str:
+    n = ord(match.group(0))
+    if n < 0x10000:
+        return "\\u{0:04x}".format(n)
+    n -= 0x10000
+    s1 = 0xD800 | ((n >> 10) & 0x3FF)
+    s2 = 0xDC00 | (n & 0x3FF)
+    return "\\u{0:04x}\\u{1:04x}".format(s1, s2)
+
+
+def _reindent(data: bytes) -> bytes:
+    """
+    Turn the 2-space indentation of ``orjson`` into 4-space indentation.
+
+    JSON strings can't contain a raw newline or tab, so every ``\\n`` is
+    followed by indentation only, and a tab is safe to use as a placeholder.
+    The deepest level is converted first so a shallower pattern never matches
+    an already converted line.
+    """
+    depth = 0
+    while b"\n" + b"  " * (depth + 1) in data:
+        depth += 1
+    for k in range(depth, 0, -1):
+        data = data.replace(b"\n" + b"  " * k, b"\n" + b"\t" * k)
+    return data.replace(b"\t", b"    ")
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    The `orjson <https://github.com/ijl/orjson>`_ library.
+
+    Input that ``orjson`` can't serialize byte-compatibly (non-string keys,
+    integers over 64 bit, floats in exponent form, ``NaN`` and ``Infinity``)
+    falls back to :mod:`json`.
+    """
+
+    name = "orjson"
+    accepts_buffer = True
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._fallback = StdlibJsonCodec()
+
+    def __reduce__(self):
+        # modules can't be pickled, e.g. when sent to a process pool
+        return (self.__class__, ())
+
+    def loads(self, data: bytes) -> T.Any:
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: T.Any) -> bytes:
+        try:
+            data = self._orjson.dumps(obj, option=self._orjson.OPT_INDENT_2)
+        except TypeError:  # orjson.JSONEncodeError is a subclass of TypeError
+            return self._fallback.dumps(obj)
+        if _has_unsafe_number(data):
+            return self._fallback.dumps(obj)
+        # orjson writes NaN and Infinity as null, only look for them if the
+        # output has a null
+        if data.find(b"null") != -1 and _has_non_finite(obj):
+            return self._fallback.dumps(obj)
+        data = _reindent(data)
+        # ``json.dumps`` uses ``ensure_ascii=True`` by default
+        if not data.isascii() or b"\x7f" in data:
+            data = _RE_NON_ASCII.sub(_escape_char, data.decode("utf-8"))
+            data = data.encode("utf-8")
+        return data
+
+
+_default_codec: T.Optional[JsonCodec] = None
+
+
+def get_default_codec() -> JsonCodec:
+    """
+    Return a shared :class:`OrjsonCodec` if ``orjson`` is installed, otherwise
+    a shared :class:`StdlibJsonCodec`. ``orjson`` is only imported on first use.
+    """
+    global _default_codec
+    if _default_codec is None:
+        try:
+            _default_codec = OrjsonCodec()
+        except ImportError:  # pragma: no cover
+            _default_codec = StdlibJsonCodec()
+    return _default_codec
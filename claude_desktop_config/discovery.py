@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+"""
+Find the Claude Desktop config files of every user of a machine.
+
+User homes come from the password database (:mod:`pwd`) or from the
+sub directories of a list of roots like ``/home``. They are probed
+concurrently on a thread pool, and each config file found is yielded as
+soon as it is found. A :class:`DiscoveryCache` remembers the mtime of the
+directories that were looked at, so the next scan only lists the roots
+and probes the homes that changed.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import (
+        DiscoveryCache,
+        discover_claude_desktop_configs,
+        apply_many,
+    )
+
+    cache = DiscoveryCache.load("/var/cache/mcp/discovery.json")
+    cdcs = list(discover_claude_desktop_configs(roots=["/home"], cache=cache))
+    cache.dump("/var/cache/mcp/discovery.json")
+    apply_many(MyMcpServers, wanted_mcps, cdcs)
+"""
+
+import typing as T
+import os
+import sys
+import stat
+import time
+import dataclasses
+from pathlib import Path
+
+from .impl import ClaudeDesktopConfig
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+
+RELATIVE_PATH_LINUX = (".config", "Claude", "claude_desktop_config.json")
+RELATIVE_PATH_MACOS = (
+    "Library",
+    "Application Support",
+    "Claude",
+    "claude_desktop_config.json",
+)
+RELATIVE_PATH_WINDOWS = ("AppData", "Roaming", "Claude", "claude_desktop_config.json")
+
+T_RELATIVE_PATH = tuple[str, ...]
+
+#: A directory modified less than this many nanoseconds before a scan may be
+#: modified again within the same mtime tick, its mtime is not cached.
+RACY_WINDOW_NS = 2_000_000_000
+
+CACHE_VERSION = 1
+
+
+def get_relative_config_path(platform: T.Optional[str] = None) -> T_RELATIVE_PATH:
+    """
+    The path of the config file relative to a user home, as a tuple of parts.
+
+    :param platform: A ``sys.platform`` value, ``None`` means the current one.
+    """
+    platform = sys.platform if platform is None else platform
+    if platform == "darwin":
+        return RELATIVE_PATH_MACOS
+    elif platform in ["win32", "cygwin"]:
+        return RELATIVE_PATH_WINDOWS
+    elif platform == "linux":
+        return RELATIVE_PATH_LINUX
+    else:
+        raise OSError("Unsupported operating system")
+
+
+def get_default_home_roots(platform: T.Optional[str] = None) -> list[str]:
+    """
+    The directories that hold the user homes, e.g. ``["/home"]`` on Linux.
+
+    :param platform: A ``sys.platform`` value, ``None`` means the current one.
+    """
+    platform = sys.platform if platform is None else platform
+    if platform == "darwin":
+        return ["/Users"]
+    elif platform in ["win32", "cygwin"]:
+        drive = os.environ.get("SystemDrive", "C:")
+        return [os.path.join(drive + os.sep, "Users")]
+    elif platform == "linux":
+        return ["/home"]
+    else:
+        raise OSError("Unsupported operating system")
+
+
+def iter_pwd_homes() -> T.Iterator[str]:
+    """
+    Yield the home directory of every user of the password database.
+
+    :raises ImportError: On Windows, which has no :mod:`pwd`.
+    """
+    # imported here, pwd does not exist on Windows
+    import pwd
+
+    for entry in pwd.getpwall():
+        if entry.pw_dir:
+            yield entry.pw_dir
+
+
+# (depth, mtime_ns, found): ``depth`` is the number of parts of the relative
+# path that exist as directories under the home, -1 if the home is missing,
+# ``mtime_ns`` is the mtime of that deepest directory, ``None`` if racy
+T_HOME_ENTRY = tuple[int, T.Optional[int], bool]
+# (mtime_ns, homes) of a root
+T_ROOT_ENTRY = tuple[T.Optional[int], list[str]]
+
+
+@dataclasses.dataclass
+class DiscoveryCache:
+    """
+    The result of the last :func:`discover_claude_desktop_configs` scan and
+    the mtime of the directories it looked at.
+
+    A new or deleted home changes the mtime of its root, a new or deleted
+    config file changes the mtime of its ``Claude`` directory, and a new
+    ``.config`` or ``Claude`` directory changes the mtime of its parent. As
+    long as these mtime are unchanged, the cached result is reused.
+
+    :param relative_path: The relative config path the entries are for.
+    :param roots: The mtime and sub directories of each listed root.
+    :param homes: The probe result of each home.
+    """
+
+    relative_path: T_RELATIVE_PATH = dataclasses.field(default=())
+    roots: dict[str, T_ROOT_ENTRY] = dataclasses.field(default_factory=dict)
+    homes: dict[str, T_HOME_ENTRY] = dataclasses.field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: T.Union[str, Path]) -> "DiscoveryCache":
+        """
+        Load a cache saved by :meth:`dump`. A missing, unreadable or
+        outdated file gives an empty cache.
+        """
+        try:
+            data = ClaudeDesktopConfig(path=Path(path)).read()
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return cls()
+        return cls(
+            relative_path=tuple(data["relative_path"]),
+            roots={
+                root: (mtime_ns, list(homes))
+                for root, (mtime_ns, homes) in data["roots"].items()
+            },
+            homes={home: tuple(entry) for home, entry in data["homes"].items()},
+        )
+
+    def dump(self, path: T.Union[str, Path]):
+        """
+        Save the cache to a JSON file, atomically.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": CACHE_VERSION,
+            "relative_path": list(self.relative_path),
+            "roots": {root: list(entry) for root, entry in self.roots.items()},
+            "homes": {home: list(entry) for home, entry in self.homes.items()},
+        }
+        ClaudeDesktopConfig(path=path).write(data, atomic=True)
+
+    def clear(self):
+        self.relative_path = ()
+        self.roots.clear()
+        self.homes.clear()
+
+
+def _get_mtime_ns(st: os.stat_result, scan_start_ns: int) -> T.Optional[int]:
+    # like git's "racily clean" entries, a directory modified just before
+    # the scan may be modified again without changing its mtime
+    if st.st_mtime_ns >= scan_start_ns - RACY_WINDOW_NS:
+        return None
+    return st.st_mtime_ns
+
+
+def _stat_dir(path: str) -> T.Optional[os.stat_result]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st if stat.S_ISDIR(st.st_mode) else None
+
+
+def _list_root(
+    root: str,
+    cached: T.Optional[T_ROOT_ENTRY],
+    scan_start_ns: int,
+) -> T_ROOT_ENTRY:
+    st = _stat_dir(root)
+    if st is None:
+        return None, []
+    if cached is not None and cached[0] == st.st_mtime_ns:
+        return cached
+    try:
+        with os.scandir(root) as it:
+            homes = [entry.path for entry in it if entry.is_dir()]
+    except OSError:
+        return None, []
+    return _get_mtime_ns(st, scan_start_ns), homes
+
+
+def _probe_home(
+    home: str,
+    relative_path: T_RELATIVE_PATH,
+    cached: T.Optional[T_HOME_ENTRY],
+    scan_start_ns: int,
+) -> T_HOME_ENTRY:
+    last = len(relative_path) - 1
+    if cached is not None:
+        depth, mtime_ns, found = cached
+        if depth >= 0 and mtime_ns is not None:
+            st = _stat_dir(os.path.join(home, *relative_path[:depth]))
+            if st is not None and st.st_mtime_ns == mtime_ns:
+                return cached
+    # deepest first, the config directory usually exists
+    for depth in range(last, -1, -1):
+        dir_path = os.path.join(home, *relative_path[:depth])
+        st = _stat_dir(dir_path)
+        if st is None:
+            continue
+        found = depth == last and os.path.isfile(
+            os.path.join(dir_path, relative_path[last])
+        )
+        return depth, _get_mtime_ns(st, scan_start_ns), found
+    return -1, None, False
+
+
+def _probe_homes(
+    homes: list[str],
+    relative_path: T_RELATIVE_PATH,
+    cached: T.Optional[list[T.Optional[T_HOME_ENTRY]]],
+    scan_start_ns: int,
+) -> list[tuple[str, T.Union[bool, T_HOME_ENTRY]]]:
+    # without cache, a single stat of the config file is enough
+    if cached is None:
+        return [
+            (home, os.path.isfile(os.path.join(home, *relative_path)))
+            for home in homes
+        ]
+    return [
+        (home, _probe_home(home, relative_path, entry, scan_start_ns))
+        for home, entry in zip(homes, cached)
+    ]
+
+
+def discover_claude_desktop_configs(
+    roots: T.Optional[T.Iterable[T.Union[str, Path]]] = None,
+    homes: T.Optional[T.Iterable[T.Union[str, Path]]] = None,
+    relative_path: T.Optional[T_RELATIVE_PATH] = None,
+    cache: T.Optional[DiscoveryCache] = None,
+    max_workers: int = 16,
+    chunksize: int = 64,
+    executor: T.Optional["concurrent.futures.Executor"] = None,
+) -> T.Iterator[ClaudeDesktopConfig]:
+    """
+    Find the Claude Desktop config files of many users.
+
+    Every sub directory of ``roots`` and every path of ``homes`` is a user
+    home. If neither is given, the homes of the password database are used,
+    or the default roots (:func:`get_default_home_roots`) if there is none.
+    Homes are probed concurrently and config files are yielded in the order
+    they are found, a home is never yielded twice.
+
+    :param roots: Directories whose sub directories are user homes.
+    :param homes: User home directories.
+    :param relative_path: The path of the config file relative to a home,
+        ``None`` means the one of the current platform,
+        see :func:`get_relative_config_path`.
+    :param cache: Reuse and update the result of a previous scan. Homes that
+        disappeared are dropped from it once the scan is complete.
+    :param max_workers: Number of threads probing homes at once.
+    :param chunksize: Number of homes probed by a thread at once. A probe is
+        a few ``stat``, so a task per home would cost more than the probe.
+    :param executor: Use this executor instead of a new thread pool.
+
+    :return: An iterator of one
+        :class:`~claude_desktop_config.impl.ClaudeDesktopConfig` per existing
+        config file.
+    """
+    if relative_path is None:
+        relative_path = get_relative_config_path()
+    relative_path = tuple(relative_path)
+    if roots is None and homes is None:
+        try:
+            homes = list(iter_pwd_homes())
+        except ImportError:  # pragma: no cover
+            roots = get_default_home_roots()
+    roots = [os.fspath(root) for root in roots or []]
+    homes = [os.fspath(home) for home in homes or []]
+    if cache is not None and cache.relative_path != relative_path:
+        cache.clear()
+        cache.relative_path = relative_path
+    scan_start_ns = time.time_ns()
+
+    # imported here because concurrent.futures is slow to import
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    seen = set()
+    # future -> root, or None for a chunk of homes
+    pending = dict()
+    completed = False
+
+    def submit_homes(homes: list[str]):
+        homes = [home for home in dict.fromkeys(homes) if home not in seen]
+        seen.update(homes)
+        for i in range(0, len(homes), chunksize):
+            chunk = homes[i : i + chunksize]
+            cached = None if cache is None else [cache.homes.get(h) for h in chunk]
+            future = executor.submit(
+                _probe_homes,
+                chunk,
+                relative_path,
+                cached,
+                scan_start_ns,
+            )
+            pending[future] = None
+
+    try:
+        for root in roots:
+            cached = None if cache is None else cache.roots.get(root)
+            future = executor.submit(_list_root, root, cached, scan_start_ns)
+            pending[future] = root
+        submit_homes(homes)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                root = pending.pop(future)
+                if root is not None:
+                    root_entry = future.result()
+                    if cache is not None:
+                        cache.roots[root] = root_entry
+                    submit_homes(root_entry[1])
+                    continue
+                for home, result in future.result():
+                    if cache is not None:
+                        cache.homes[home] = result
+                        result = result[2]
+                    if result:
+                        yield ClaudeDesktopConfig(path=Path(home, *relative_path))
+        completed = True
+    finally:
+        if own_executor:
+            executor.shutdown(wait=completed, cancel_futures=True)
+        if completed and cache is not None:
+            for home in list(cache.homes):
+                if home not in seen:
+                    del cache.homes[home]
+            for root in list(cache.roots):
+                if root not in roots:
+                    del cache.roots[root]
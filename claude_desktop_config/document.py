@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+
+"""
+A config dictionary that records its own mutations, so change detection
+costs O(changes) instead of a deep compare of the whole document.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import ClaudeDesktopConfig, enable_mcp_server
+
+    cdc = ClaudeDesktopConfig()
+    doc = cdc.read(track=True)
+    enable_mcp_server(doc, "github", {"command": "npx"})
+    print(doc.dirty_paths)  # {("mcpServers", "github")}
+    print(doc.added_servers)  # {"github"}
+    cdc.write(doc)  # no-op if nothing is dirty
+"""
+
+import typing as T
+from pathlib import Path
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    from .source_map import SourceMap, LazySourceMap
+
+T_PATH = tuple[T.Union[str, int], ...]
+
+
+def _wrap(value: T.Any, root: "ConfigDocument", path: T_PATH) -> T.Any:
+    # only plain containers are wrapped, frozen settings of an ``Mcp`` are
+    # immutable and don't need tracking
+    if type(value) is dict:
+        return _TrackedDict(value, root, path)
+    elif type(value) is list:
+        return _TrackedList(value, root, path)
+    return value
+
+
+class _TrackedDict(dict):
+    """
+    A ``dict`` that reports every mutation to its :class:`ConfigDocument`.
+
+    Children are wrapped lazily, the first time they are accessed.
+    """
+
+    __slots__ = ("_root", "_path")
+
+    def __init__(self, data, root: "ConfigDocument", path: T_PATH):
+        dict.__init__(self, data)
+        self._root = root
+        self._path = path
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def _wrap_child(self, key, value):
+        wrapped = _wrap(value, self._root, self._path + (key,))
+        if wrapped is not value:
+            dict.__setitem__(self, key, wrapped)
+        return wrapped
+
+    def _wrap_children(self):
+        for key, value in dict.items(self):
+            if type(value) is dict or type(value) is list:
+                self._wrap_child(key, value)
+
+    # --- read access, wraps the returned containers
+    def __getitem__(self, key):
+        return self._wrap_child(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        self._wrap_children()
+        return dict.items(self)
+
+    def values(self):
+        self._wrap_children()
+        return dict.values(self)
+
+    # --- write access, marks the touched paths as dirty
+    def __setitem__(self, key, value):
+        self._root._mark(self._path + (key,))
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._root._mark(self._path + (key,))
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *args):
+        if key in self:
+            self._root._mark(self._path + (key,))
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._root._mark(self._path + (key,))
+        return key, value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        dict.clear(self)
+        self._root._mark(self._path)
+
+
+class _TrackedList(list):
+    """
+    A ``list`` that reports every mutation to its :class:`ConfigDocument`.
+    Indexes shift, so any change marks the whole list as dirty.
+    """
+
+    __slots__ = ("_root", "_path")
+
+    def __init__(self, data, root: "ConfigDocument", path: T_PATH):
+        list.__init__(self, data)
+        self._root = root
+        self._path = path
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def _wrap_child(self, index: int, value):
+        if index < 0:
+            index += len(self)
+        wrapped = _wrap(value, self._root, self._path + (index,))
+        if wrapped is not value:
+            list.__setitem__(self, index, wrapped)
+        return wrapped
+
+    def __getitem__(self, index):
+        value = list.__getitem__(self, index)
+        if isinstance(index, slice):
+            return value
+        return self._wrap_child(index, value)
+
+    def __iter__(self):
+        for index, value in enumerate(list.__iter__(self)):
+            if type(value) is dict or type(value) is list:
+                self._wrap_child(index, value)
+        return list.__iter__(self)
+
+    def _mutator(name: str):
+        method = getattr(list, name)
+
+        def mutate(self, *args, **kwargs):
+            self._root._mark(self._path)
+            return method(self, *args, **kwargs)
+
+        mutate.__name__ = name
+        return mutate
+
+    __setitem__ = _mutator("__setitem__")
+    __delitem__ = _mutator("__delitem__")
+    __iadd__ = _mutator("__iadd__")
+    __imul__ = _mutator("__imul__")
+    append = _mutator("append")
+    clear = _mutator("clear")
+    extend = _mutator("extend")
+    insert = _mutator("insert")
+    pop = _mutator("pop")
+    remove = _mutator("remove")
+    reverse = _mutator("reverse")
+    sort = _mutator("sort")
+
+    del _mutator
+
+
+class ConfigDocument(_TrackedDict):
+    """
+    A Claude Desktop config dictionary that records mutations as they happen,
+    returned by ``ClaudeDesktopConfig.read(track=True)``.
+
+    It is a ``dict``, so every function that takes a config dictionary
+    works with it. Nested dicts and lists are tracked too, as long as they
+    are reached through the document. A container copied out of it with
+    ``dict(...)`` or ``copy.copy`` is not tracked.
+
+    :param data: The parsed config.
+    :param path: The file the document was read from. Writing a clean
+        document back to the same file is a no-op, unless the file was
+        changed since it was read.
+    :param source: The :class:`~claude_desktop_config.source_map.SourceMap`
+        of the file, if it was read with ``minimal_edit``, or its
+        :class:`~claude_desktop_config.source_map.LazySourceMap` if it was
+        read with ``lazy``. A lazily read document is :attr:`partial`.
+    :param stat_key: The ``(st_mtime_ns, st_size, st_ino)`` of the file when
+        it was read or last written, None if unknown.
+    """
+
+    __slots__ = (
+        "path",
+        "stat_key",
+        "_source",
+        "_partial",
+        "_dirty_paths",
+        "_clean_servers",
+    )
+
+    def __init__(
+        self,
+        data: T.Optional[dict[str, T.Any]] = None,
+        path: T.Optional[Path] = None,
+        source: T.Union["SourceMap", "LazySourceMap", None] = None,
+        stat_key: T.Optional[tuple[int, int, int]] = None,
+    ):
+        self.source = source
+        super().__init__({} if data is None else data, self, ())
+        self.path = path
+        self.stat_key = stat_key
+        self.mark_clean()
+
+    def __reduce__(self):
+        self.load()
+        return (self.__class__, (dict(self), self.path))
+
+    @property
+    def source(self) -> T.Union["SourceMap", "LazySourceMap", None]:
+        return self._source
+
+    @source.setter
+    def source(self, source: T.Union["SourceMap", "LazySourceMap", None]):
+        self._source = source
+        self._partial = source is not None and source.partial
+
+    @property
+    def partial(self) -> bool:
+        """
+        True if only ``mcpServers`` was parsed so far. The rest of the file
+        is parsed on first access to another key, see :meth:`load`.
+        """
+        return self._partial
+
+    def load(self):
+        """
+        Parse the part of a :attr:`partial` document that was not read yet.
+        Accessing any other key than ``mcpServers``, iterating the document
+        or comparing it does it automatically. Only serializers that read
+        the ``dict`` storage directly, like ``orjson``, need an explicit call.
+
+        :raises ~claude_desktop_config.impl.ConflictError: If the file was
+            changed since it was read.
+        """
+        if not self._partial:
+            return
+        config, source = self._source.load()
+        # keep the current, maybe mutated, "mcpServers" at its position
+        servers = dict.__getitem__(self, "mcpServers")
+        dict.clear(self)
+        for key, value in config.items():
+            dict.__setitem__(self, key, servers if key == "mcpServers" else value)
+        self.source = source
+
+    # --- a partial document only knows "mcpServers" until it is loaded
+    def __getitem__(self, key):
+        if self._partial and key != "mcpServers":
+            self.load()
+        return _TrackedDict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        if self._partial and key != "mcpServers":
+            self.load()
+        return dict.__contains__(self, key)
+
+    def __setitem__(self, key, value):
+        if self._partial and key != "mcpServers":
+            self.load()
+        _TrackedDict.__setitem__(self, key, value)
+
+    def _loading(name: str):
+        method = getattr(_TrackedDict, name)
+
+        def call(self, *args, **kwargs):
+            if self._partial:
+                self.load()
+            return method(self, *args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+    __delitem__ = _loading("__delitem__")
+    __iter__ = _loading("__iter__")
+    __reversed__ = _loading("__reversed__")
+    __len__ = _loading("__len__")
+    __eq__ = _loading("__eq__")
+    __ne__ = _loading("__ne__")
+    __repr__ = _loading("__repr__")
+    __or__ = _loading("__or__")
+    __ror__ = _loading("__ror__")
+    keys = _loading("keys")
+    items = _loading("items")
+    values = _loading("values")
+    copy = _loading("copy")
+    pop = _loading("pop")
+    popitem = _loading("popitem")
+    clear = _loading("clear")
+
+    del _loading
+
+    def _mark(self, path: T_PATH):
+        self._dirty_paths.add(path)
+
+    def _get_server_names(self) -> frozenset[str]:
+        mcp_servers = dict.get(self, "mcpServers")
+        if isinstance(mcp_servers, dict):
+            return frozenset(mcp_servers)
+        return frozenset()
+
+    def mark_clean(self):
+        """
+        Forget the recorded mutations, e.g. after the document was written.
+        """
+        self._dirty_paths: set[T_PATH] = set()
+        self._clean_servers = self._get_server_names()
+
+    @property
+    def dirty(self) -> bool:
+        """
+        True if the document was mutated since it was read or last written.
+        Setting a key to an equal value still counts as a mutation.
+        """
+        return bool(self._dirty_paths)
+
+    @property
+    def dirty_paths(self) -> frozenset[T_PATH]:
+        """
+        The paths of the mutated keys, e.g. ``("mcpServers", "github", "env")``.
+        A mutated list is reported as the path of the list.
+        """
+        return frozenset(self._dirty_paths)
+
+    def _get_touched_servers(self) -> tuple[frozenset[str], frozenset[str]]:
+        current = self._get_server_names()
+        if () in self._dirty_paths or ("mcpServers",) in self._dirty_paths:
+            touched = current | self._clean_servers
+        else:
+            touched = {
+                path[1]
+                for path in self._dirty_paths
+                if len(path) >= 2 and path[0] == "mcpServers"
+            }
+        return current, frozenset(touched)
+
+    @property
+    def added_servers(self) -> frozenset[str]:
+        """
+        The MCP servers that didn't exist when the document was clean.
+        """
+        current, touched = self._get_touched_servers()
+        return frozenset(
+            name
+            for name in touched
+            if name in current and name not in self._clean_servers
+        )
+
+    @property
+    def updated_servers(self) -> frozenset[str]:
+        """
+        The existing MCP servers whose settings were set or mutated.
+        """
+        current, touched = self._get_touched_servers()
+        return frozenset(
+            name for name in touched if name in current and name in self._clean_servers
+        )
+
+    @property
+    def removed_servers(self) -> frozenset[str]:
+        """
+        The MCP servers that existed when the document was clean and are gone.
+        """
+        current, touched = self._get_touched_servers()
+        return frozenset(
+            name
+            for name in touched
+            if name not in current and name in self._clean_servers
+        )
@@ -1,35 +1,288 @@
 # -*- coding: utf-8 -*-
 
 import typing as T
+import os
+import sys
 import json
 import enum
+import types
+import hashlib
+import marshal
+import unicodedata
+import functools
 import dataclasses
+import contextlib
+import time
+import tempfile
+import threading
+import weakref
 from pathlib import Path
+from collections import OrderedDict
 
-from .os_platform import IS_WINDOWS, IS_MACOS, IS_LINUX
+from . import metrics
+from .os_platform import IS_WINDOWS
+from .codec import JsonCodec, get_default_codec
+from .document import ConfigDocument
+from .journal import get_fingerprint, read_fingerprint
+from .profile import (
+    McpProfile,
+    _FragmentCache,
+    _NotSpliceable,
+    _splice_profile,
+    _precompute_fragments,
+)
+from .source_map import (
+    SourceMap,
+    LazySourceMap,
+    parse_with_source_map,
+    parse_lazy,
+    splice,
+    splice_servers,
+)
 
+if T.TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+    from .snapshot import SnapshotStore
+    from .journal import Journal
 
-@dataclasses.dataclass
+
+def _normalize_json(obj: T.Any) -> T.Any:
+    """
+    Normalize a JSON compatible object so that equivalent values have the
+    same canonical serialization:
+
+    - strings (and dict keys) are NFC normalized.
+    - integral floats become int, e.g. ``1.0`` -> ``1``, ``-0.0`` -> ``0``.
+    - tuples become lists.
+    """
+    if isinstance(obj, str):
+        return obj if obj.isascii() else unicodedata.normalize("NFC", obj)
+    elif isinstance(obj, dict):
+        return {_normalize_json(k): _normalize_json(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_normalize_json(v) for v in obj]
+    elif isinstance(obj, float) and obj.is_integer():
+        return int(obj)
+    else:
+        return obj
+
+
+def fingerprint_settings(settings: T.Any) -> str:
+    """
+    Compute a canonical, stable fingerprint of MCP server settings.
+
+    Two settings that only differ in key order, unicode normalization form,
+    or ``1`` vs ``1.0`` have the same fingerprint. The value is stable across
+    processes and Python versions, so it can be used to index and dedupe
+    MCP servers across many config files.
+
+    :param settings: The settings for the MCP server.
+
+    :return: A sha256 hex digest.
+    """
+    data = json.dumps(
+        _normalize_json(settings),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError(f"{self.__class__.__name__} object is immutable")
+
+
+class FrozenDict(dict):
+    """
+    A hashable ``dict`` that can't be modified. It is still a ``dict``, so it
+    compares equal to a plain ``dict`` and is serialized by every JSON library.
+    :func:`copy.copy` and :func:`copy.deepcopy` return a plain, mutable ``dict``.
+    """
+
+    # ``_fingerprint`` caches the :func:`fingerprint_settings` of interned
+    # settings that are shared by many :class:`Mcp`
+    __slots__ = ("__weakref__", "_fingerprint")
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __ior__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __hash__(self) -> int:
+        # key order doesn't matter to ``==``, so it can't matter to the hash
+        return hash(frozenset(self.items()))
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    # a copy is made to be modified, it is a plain ``dict``
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        import copy
+
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+
+class FrozenList(list):
+    """
+    A hashable ``list`` that can't be modified. It is still a ``list``, so it
+    compares equal to a plain ``list`` and is serialized by every JSON library.
+    :func:`copy.copy` and :func:`copy.deepcopy` return a plain, mutable ``list``.
+    """
+
+    __slots__ = ("__weakref__",)
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __iadd__ = _immutable
+    __imul__ = _immutable
+    append = _immutable
+    clear = _immutable
+    extend = _immutable
+    insert = _immutable
+    pop = _immutable
+    remove = _immutable
+    reverse = _immutable
+    sort = _immutable
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    # a copy is made to be modified, it is a plain ``list``
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo: dict) -> list:
+        import copy
+
+        return [copy.deepcopy(value, memo) for value in self]
+
+
+# intern key -> frozen object, an entry lives as long as its object is used.
+# The key of a container is made of the ids of its already interned children,
+# which stay alive as long as the container does, so an id is never reused
+# while its entry exists.
+_interned: "weakref.WeakValueDictionary[tuple, T.Any]" = weakref.WeakValueDictionary()
+_interned_lock = threading.Lock()
+
+
+def _intern_json(obj: T.Any) -> tuple[T.Any, T.Any]:
+    """
+    Return the frozen, interned version of ``obj`` and its intern key.
+    """
+    if isinstance(obj, str):
+        obj = sys.intern(str(obj))
+        return obj, obj
+    elif isinstance(obj, dict):
+        items = list()
+        key = list()
+        for k, v in obj.items():
+            k, _ = _intern_json(k)
+            v, v_key = _intern_json(v)
+            items.append((k, v))
+            key.append((k, v_key))
+        return _intern_container(FrozenDict, items, ("d", tuple(key)))
+    elif isinstance(obj, (list, tuple)):
+        values = list()
+        key = list()
+        for v in obj:
+            v, v_key = _intern_json(v)
+            values.append(v)
+            key.append(v_key)
+        return _intern_container(FrozenList, values, ("l", tuple(key)))
+    else:
+        # ``1``, ``1.0`` and ``True`` are equal but serialized differently
+        return obj, (type(obj), repr(obj))
+
+
+def _intern_container(klass, data, key: tuple) -> tuple[T.Any, T.Any]:
+    with _interned_lock:
+        frozen = _interned.get(key)
+        if frozen is None:
+            frozen = klass(data)
+            _interned[key] = frozen
+    return frozen, id(frozen)
+
+
+def freeze_json(obj: T.Any) -> T.Any:
+    """
+    Convert a JSON compatible object to a deeply immutable one, made of
+    :class:`FrozenDict` and :class:`FrozenList`. Identical sub-objects are
+    interned, so they are stored once no matter how many times they appear,
+    e.g. the same ``args`` list in thousands of MCP server settings.
+    """
+    return _intern_json(obj)[0]
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
 class Mcp:
     """
     Represents a Model Context Protocol (MCP) server configuration.
 
+    It is immutable and hashable. The settings are frozen with
+    :func:`freeze_json`, so identical settings and sub-settings are shared
+    by every ``Mcp``. Two ``Mcp`` are equal if they have the same name and
+    the same :attr:`fingerprint`.
+
     :param name: The name of the MCP server.
     :param settings: The settings for the MCP server, typically including command and arguments.
     """
 
-    name: str = dataclasses.field()
-    settings: dict[str, T.Any] = dataclasses.field()
+    # no ``dataclasses.field()`` defaults, they would conflict with
+    # ``__slots__`` (``dataclass(slots=True)`` requires Python 3.10)
+    # ``fingerprint`` is not a field, it is the :func:`fingerprint_settings`
+    # of the settings, computed once in ``__post_init__``
+    __slots__ = ("name", "settings", "fingerprint")
 
+    name: str
+    settings: T.Mapping[str, T.Any]
 
-def get_default_claude_desktop_config_path() -> Path:  # pragma: no cover
-    """
-    See https://modelcontextprotocol.io/quickstart/user
+    def __post_init__(self):
+        settings = freeze_json(self.settings)
+        try:
+            fingerprint = settings._fingerprint
+        except AttributeError:
+            fingerprint = fingerprint_settings(settings)
+            if isinstance(settings, FrozenDict):
+                settings._fingerprint = fingerprint
+        object.__setattr__(self, "name", sys.intern(self.name))
+        object.__setattr__(self, "settings", settings)
+        object.__setattr__(self, "fingerprint", fingerprint)
 
-    - macOS: ~/Library/Application Support/Claude/claude_desktop_config.json
-    - Windows: %APPDATA%\Claude\claude_desktop_config.json
+    def __eq__(self, other: T.Any) -> bool:
+        if not isinstance(other, Mcp):
+            return NotImplemented
+        return self.name == other.name and self.fingerprint == other.fingerprint
+
+    def __hash__(self) -> int:
+        return hash((self.name, self.fingerprint))
+
+    def __reduce__(self):
+        return (self.__class__, (self.name, self.settings))
+
+
+@functools.lru_cache(maxsize=64)
+def _resolve_claude_desktop_config_path(
+    platform: str,
+    home: T.Optional[str],
+    userprofile: T.Optional[str],
+    appdata: T.Optional[str],
+) -> Path:  # pragma: no cover
     """
-    if IS_MACOS:
+    ``home``, ``userprofile`` and ``appdata`` are not used directly, they are
+    part of the cache key because :meth:`pathlib.Path.home` depends on them.
+    """
+    if platform == "darwin":
         return (
             Path.home()
             / "Library"
@@ -37,10 +290,7 @@ def get_default_claude_desktop_config_path() -> Path:  # pragma: no cover
             / "Claude"
             / "claude_desktop_config.json"
         )
-    elif IS_WINDOWS:
-        import os
-
-        appdata = os.environ.get("APPDATA")
+    elif platform in ["win32", "cygwin"]:
         if appdata:
             return Path(appdata) / "Claude" / "claude_desktop_config.json"
         else:
@@ -52,16 +302,63 @@ def get_default_claude_desktop_config_path() -> Path:  # pragma: no cover
                 / "Claude"
                 / "claude_desktop_config.json"
             )
-    elif IS_LINUX:  # pragma: no cover
+    elif platform == "linux":
         return Path.home() / ".config" / "Claude" / "claude_desktop_config.json"
-    else:  # pragma: no cover
+    else:
         raise OSError("Unsupported operating system")
 
 
+def get_default_claude_desktop_config_path() -> Path:
+    r"""
+    See https://modelcontextprotocol.io/quickstart/user
+
+    - macOS: ~/Library/Application Support/Claude/claude_desktop_config.json
+    - Windows: %APPDATA%\Claude\claude_desktop_config.json
+
+    The result is memoized per ``(platform, HOME, USERPROFILE, APPDATA)``,
+    so changing the environment (e.g. switching ``HOME`` per user in one
+    process) resolves the path again.
+    """
+    environ = os.environ
+    return _resolve_claude_desktop_config_path(
+        sys.platform,
+        environ.get("HOME"),
+        environ.get("USERPROFILE"),
+        environ.get("APPDATA"),
+    )
+
+
+def _is_same_settings(
+    existing_settings: T.Any,
+    settings: T.Any,
+    fingerprint: T.Optional[str],
+) -> bool:
+    """
+    True if the existing settings of a server are the wanted ``settings``,
+    or canonically equal to them when their ``fingerprint`` is known.
+
+    The deep ``==`` goes first on purpose, even when the fingerprint is
+    known. It runs in C, stops at the first difference and costs about
+    0.15 us for typical settings, while :func:`fingerprint_settings` of the
+    existing settings costs about 5 us. Unchanged settings, the common case
+    of a reconcile, cost a single ``==``. Only settings that differ pay for
+    the fingerprint, which tells apart a real change from a difference of
+    key order, number type or Unicode normalization. Configs in the same
+    state don't reach this function at all, their plan is reused, see
+    :meth:`BaseMcpEnum.plan`.
+    """
+    if existing_settings == settings:
+        return True
+    if fingerprint is None:
+        return False
+    return fingerprint_settings(existing_settings) == fingerprint
+
+
 def enable_mcp_server(
     config: dict[str, T.Any],
     name: str,
     settings: dict[str, T.Any],
+    fingerprint: T.Optional[str] = None,
 ) -> bool:
     """
     Enable an MCP server by setting its configuration in the provided dictionary.
@@ -71,6 +368,10 @@ def enable_mcp_server(
     :param config: The configuration dictionary to modify.
     :param name: The name of the MCP server.
     :param settings: The settings for the MCP server.
+    :param fingerprint: Optional precomputed :func:`fingerprint_settings` of
+        ``settings`` (e.g. :attr:`Mcp.fingerprint`). If given, existing settings
+        with the same fingerprint are treated as unchanged even if they are not
+        strictly equal, for example when they only differ in unicode normalization.
 
     :return: True if the configuration was changed, False if it was unchanged.
     """
@@ -82,7 +383,7 @@ def enable_mcp_server(
 
     if name in config["mcpServers"]:
         existing_settings = config["mcpServers"][name]
-        if existing_settings == settings:
+        if _is_same_settings(existing_settings, settings, fingerprint):
             return False
         else:
             config["mcpServers"][name] = settings
@@ -112,64 +413,1545 @@ def disable_mcp_server(
     return False
 
 
+@dataclasses.dataclass
+class McpChangeSet:
+    """
+    The names of the MCP servers touched by :func:`apply_mcp_changes`.
+
+    :param added: Servers that didn't exist and were added.
+    :param updated: Servers that existed with different settings and were replaced.
+    :param removed: Servers that existed and were removed.
+    :param unchanged: Servers that were already in the wanted state.
+    """
+
+    added: list[str] = dataclasses.field(default_factory=list)
+    updated: list[str] = dataclasses.field(default_factory=list)
+    removed: list[str] = dataclasses.field(default_factory=list)
+    unchanged: list[str] = dataclasses.field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        """
+        True if the configuration was changed.
+        """
+        return bool(self.added or self.updated or self.removed)
+
+    def __bool__(self) -> bool:
+        return self.changed
+
+
+def apply_mcp_changes(
+    config: dict[str, T.Any],
+    enable: T.Optional[T.Mapping[str, dict[str, T.Any]]] = None,
+    disable: T.Optional[T.Iterable[str]] = None,
+    fingerprints: T.Optional[T.Mapping[str, str]] = None,
+) -> McpChangeSet:
+    """
+    Enable and disable many MCP servers in a single pass over the
+    ``mcpServers`` mapping of the provided configuration dictionary.
+
+    This is an idempotent operation, just like :func:`enable_mcp_server`
+    and :func:`disable_mcp_server`.
+
+    :param config: The configuration dictionary to modify.
+    :param enable: A mapping of MCP server name to its settings.
+    :param disable: The names of the MCP servers to remove.
+    :param fingerprints: Optional precomputed :func:`fingerprint_settings`
+        of the ``enable`` settings by name, see :func:`enable_mcp_server`.
+
+    :return: A :class:`McpChangeSet`, it is truthy if the configuration was changed.
+    """
+    enable = {} if enable is None else enable
+    disable = [] if disable is None else list(disable)
+    fingerprints = {} if fingerprints is None else fingerprints
+    for name in disable:
+        if name in enable:
+            raise ValueError(f"MCP server {name!r} is both enabled and disabled")
+    change_set = McpChangeSet()
+
+    mcp_servers = config.get("mcpServers")
+    if mcp_servers is None:
+        if enable:
+            mcp_servers = config["mcpServers"] = {}
+        else:
+            change_set.unchanged.extend(disable)
+            return change_set
+
+    for name, settings in enable.items():
+        if name not in mcp_servers:
+            mcp_servers[name] = settings
+            change_set.added.append(name)
+        elif _is_same_settings(mcp_servers[name], settings, fingerprints.get(name)):
+            change_set.unchanged.append(name)
+        else:
+            mcp_servers[name] = settings
+            change_set.updated.append(name)
+
+    for name in disable:
+        if name in mcp_servers:
+            del mcp_servers[name]
+            change_set.removed.append(name)
+        else:
+            change_set.unchanged.append(name)
+
+    return change_set
+
+
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_CHANGED = "changed"
+
+
+@dataclasses.dataclass(frozen=True)
+class SettingsChange:
+    """
+    One leaf level difference between the current and the wanted settings
+    of an MCP server.
+
+    :param server: The MCP server name.
+    :param path: The keys leading to the value inside the server settings,
+        e.g. ``("env", "API_KEY")``. Lists are compared as a whole.
+    :param kind: ``"added"``, ``"removed"`` or ``"changed"``.
+    :param old: The current value, None if it was added.
+    :param new: The wanted value, None if it was removed.
+    """
+
+    server: str = dataclasses.field()
+    path: tuple[str, ...] = dataclasses.field()
+    kind: str = dataclasses.field()
+    old: T.Any = dataclasses.field(default=None)
+    new: T.Any = dataclasses.field(default=None)
+
+
+def diff_settings(
+    server: str,
+    old: T.Any,
+    new: T.Any,
+    _path: tuple[str, ...] = (),
+) -> list[SettingsChange]:
+    """
+    Compute the :class:`SettingsChange` list to turn ``old`` into ``new``.
+    Nested dicts are compared key by key, anything else by ``==``.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = list()
+        for key, value in old.items():
+            if key not in new:
+                changes.append(
+                    SettingsChange(server, _path + (key,), CHANGE_REMOVED, old=value)
+                )
+            else:
+                changes.extend(diff_settings(server, value, new[key], _path + (key,)))
+        for key, value in new.items():
+            if key not in old:
+                changes.append(
+                    SettingsChange(server, _path + (key,), CHANGE_ADDED, new=value)
+                )
+        return changes
+    if old == new and (
+        type(old) is type(new) or (isinstance(old, list) and isinstance(new, list))
+    ):
+        return []
+    return [SettingsChange(server, _path, CHANGE_CHANGED, old=old, new=new)]
+
+
+@dataclasses.dataclass(frozen=True)
+class McpPlan:
+    """
+    What :meth:`BaseMcpEnum.apply_plan` would change in a config, computed by
+    :meth:`BaseMcpEnum.plan` without any I/O.
+
+    A plan only depends on the wanted MCP set and on the current settings of
+    the managed servers, summarized by ``input_fingerprint``. So it can be
+    cached and reused for every config in the same state.
+
+    :param wanted: The names of the wanted MCP servers.
+    :param input_fingerprint: Fingerprint of the managed part of the config
+        the plan was computed from, None if it couldn't be computed.
+    :param add: Servers to add.
+    :param update: Servers to replace with the wanted settings.
+    :param remove: Servers to remove.
+    :param unchanged: Managed servers that are already in the wanted state.
+    :param diff: The settings level changes of the updated servers.
+    :param settings: The wanted settings of the added and updated servers,
+        read only.
+    """
+
+    wanted: frozenset[str] = dataclasses.field()
+    input_fingerprint: T.Optional[str] = dataclasses.field()
+    add: tuple[str, ...] = dataclasses.field(default=())
+    update: tuple[str, ...] = dataclasses.field(default=())
+    remove: tuple[str, ...] = dataclasses.field(default=())
+    unchanged: tuple[str, ...] = dataclasses.field(default=())
+    diff: tuple[SettingsChange, ...] = dataclasses.field(default=())
+    settings: T.Mapping[str, dict[str, T.Any]] = dataclasses.field(
+        default_factory=lambda: types.MappingProxyType({}),
+        repr=False,
+        compare=False,
+    )
+
+    @property
+    def changed(self) -> bool:
+        """
+        True if applying the plan changes the configuration.
+        """
+        return bool(self.add or self.update or self.remove)
+
+    def __bool__(self) -> bool:
+        return self.changed
+
+    def execute(self, config: dict[str, T.Any]) -> bool:
+        """
+        Apply the plan to a config dictionary in place. The caller must make
+        sure ``config`` is in the state the plan was computed from.
+
+        The added and updated settings are the frozen settings of the
+        :class:`Mcp`, shared and not copied. Use :func:`copy.deepcopy` on
+        them before modifying them in place.
+
+        :return: True if the configuration was changed.
+        """
+        if not self.changed:
+            return False
+        mcp_servers = config.get("mcpServers")
+        if mcp_servers is None:
+            mcp_servers = config["mcpServers"] = {}
+        # the settings are immutable, so they are shared, not copied
+        mcp_servers.update(self.settings)
+        for name in self.remove:
+            mcp_servers.pop(name, None)
+        return True
+
+
+def _get_plan_input_fingerprint(
+    mcp_servers: T.Optional[dict[str, T.Any]],
+    names: T.Iterable[str],
+) -> T.Optional[str]:
+    """
+    Fingerprint the current settings of the managed servers. Returns None if
+    they are not plain JSON.
+    """
+    if mcp_servers is None:
+        managed = None
+    else:
+        # ``dict.get`` bypasses the lazy wrapping of a ``ConfigDocument``
+        get = dict.get
+        managed = {
+            name: get(mcp_servers, name) for name in names if name in mcp_servers
+        }
+    try:
+        # version 2 doesn't use back references, so the output doesn't
+        # depend on object identity or reference counts
+        data = marshal.dumps(managed, 2)
+    except ValueError:
+        # e.g. the frozen settings of an ``Mcp`` were put in the config
+        try:
+            data = marshal.dumps(_copy_json(managed), 2)
+        except ValueError:
+            return None
+    return hashlib.sha256(data).hexdigest()
+
+
+PLAN_CACHE_SIZE = 1024
+
+
+class _PlanCache:
+    """
+    A thread safe LRU mapping of ``(wanted, input_fingerprint)`` to
+    :class:`McpPlan`.
+    """
+
+    def __init__(self, maxsize: int = PLAN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict[tuple[frozenset[str], str], McpPlan] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: tuple[frozenset[str], str]) -> T.Optional[McpPlan]:
+        with self._lock:
+            plan = self._data.get(key)
+            if plan is not None:
+                self._data.move_to_end(key)
+            return plan
+
+    def put(self, key: tuple[frozenset[str], str], plan: McpPlan):
+        with self._lock:
+            self._data[key] = plan
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ConflictError(Exception):
+    """
+    Raised when the config file was changed by someone else between the read
+    and the write of an optimistic read-modify-write.
+    """
+
+
+CONCURRENCY_LOCK = "lock"
+CONCURRENCY_OPTIMISTIC = "optimistic"
+
+
+def _copy_json(obj: T.Any) -> T.Any:
+    """
+    Deep copy a JSON compatible object, much faster than :func:`copy.deepcopy`.
+    """
+    if isinstance(obj, dict):
+        return {k: _copy_json(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_copy_json(v) for v in obj]
+    else:
+        return obj
+
+
+T_STAT_KEY = tuple[int, int, int]
+
+
+def _get_stat_key(st: os.stat_result) -> T_STAT_KEY:
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ReadCache:
+    """
+    A thread safe LRU cache of parsed config files.
+
+    Each entry is validated by ``(st_mtime_ns, st_size, st_ino)`` of the file,
+    so a read of an unchanged file costs a single ``stat`` call and no parsing.
+    Entries are stored as :mod:`marshal` snapshots, loading one is a single
+    C call that is faster than both JSON parsing and a Python deep copy.
+    One cache can be shared by many :class:`ClaudeDesktopConfig` objects.
+
+    :param maxsize: Maximum number of files to keep in the cache.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[T_STAT_KEY, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __reduce__(self):
+        # a lock can't be pickled, e.g. when sent to a process pool,
+        # the copy starts empty
+        return (self.__class__, (self.maxsize,))
+
+    def get(self, path: Path) -> T.Optional[dict[str, T.Any]]:
+        """
+        Return a copy of the cached config if the file hasn't changed since
+        it was cached, otherwise None.
+        """
+        res = self._get(path)
+        return None if res is None else res[0]
+
+    def _get(self, path: Path) -> T.Optional[tuple[dict[str, T.Any], T_STAT_KEY]]:
+        key = os.fspath(path)
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        try:
+            stat_key = _get_stat_key(os.stat(key))
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+        if stat_key != entry[0]:
+            return None
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+        return marshal.loads(entry[1]), stat_key
+
+    def put(
+        self,
+        path: Path,
+        stat_key: T_STAT_KEY,
+        config: dict[str, T.Any],
+    ):
+        """
+        Store a private copy of ``config`` for the file at the given stat state.
+        """
+        key = os.fspath(path)
+        try:
+            entry = (stat_key, marshal.dumps(config))
+        except ValueError:
+            # e.g. the frozen settings of an ``Mcp`` were put in the config
+            try:
+                entry = (stat_key, marshal.dumps(_copy_json(config)))
+            except ValueError:  # not a plain JSON object
+                self.invalidate(path)
+                return
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, path: T.Optional[Path] = None):
+        """
+        Drop the entry of the given path, or every entry if path is None.
+        """
+        with self._lock:
+            if path is None:
+                self._data.clear()
+            else:
+                self._data.pop(os.fspath(path), None)
+
+
+def _acquire_file_lock(
+    fd: int,
+    timeout: T.Optional[float],
+    poll_interval: float,
+    path: Path,
+):
+    if IS_WINDOWS:  # pragma: no cover
+        import msvcrt
+
+        def try_lock() -> bool:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                return False
+
+    else:
+        import fcntl
+
+        if timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+
+        def try_lock() -> bool:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not try_lock():
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"can't acquire lock on {path}")
+        time.sleep(poll_interval)
+
+
+def _release_file_lock(fd: int):
+    if IS_WINDOWS:  # pragma: no cover
+        import msvcrt
+
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+_umask_lock = threading.Lock()
+
+
+def _get_umask() -> int:
+    """
+    The umask of the process. There is no call to read it without setting
+    it, so it is read from ``/proc`` when possible.
+    """
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"Umask:"):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    with _umask_lock:
+        umask = os.umask(0o022)
+        os.umask(umask)
+    return umask
+
+
+def _copy_owner(path: str, st: os.stat_result):
+    """
+    Give ``path`` the owner and group of ``st``, best effort: only root can
+    give a file away, other users keep their own files.
+    """
+    try:
+        os.chown(path, st.st_uid, st.st_gid)
+    except PermissionError:  # pragma: no cover
+        pass
+
+
+#: Files smaller than this are read in full by ``ClaudeDesktopConfig(lazy=True)``,
+#: scanning them costs about as much as parsing them
+LAZY_READ_MIN_SIZE = 64 * 1024
+
+#: Files at least this large are memory-mapped by ``ClaudeDesktopConfig.read``
+#: when the codec can parse a buffer, smaller ones are read, mapping them
+#: costs more than the copy it saves
+MMAP_READ_MIN_SIZE = 256 * 1024
+
+
 @dataclasses.dataclass
 class ClaudeDesktopConfig:
-    path: Path = dataclasses.field(default=get_default_claude_desktop_config_path())
+    """
+    :param path: The path of the ``claude_desktop_config.json`` file.
+    :param cache: Optional :class:`ReadCache` to skip re-parsing unchanged files.
+    :param codec: The JSON backend, see :mod:`claude_desktop_config.codec`.
+        By default ``orjson`` is used if installed, otherwise :mod:`json`.
+    :param minimal_edit: Documents returned by ``read(track=True)`` remember
+        the byte offsets of each entry, and writing them back only serializes
+        the dirty top level entries and ``mcpServers`` entries. Every other
+        byte of the file, including its formatting, is kept as is. See
+        :mod:`claude_desktop_config.source_map`.
+    :param lazy: Like ``minimal_edit``, but ``read(track=True)`` only parses
+        ``mcpServers`` and returns a
+        :attr:`~claude_desktop_config.document.ConfigDocument.partial`
+        document, the rest of the file is parsed on first access. Reading
+        and reconciling MCP servers in a large file costs about the size of
+        ``mcpServers``, not the size of the file. Files smaller than
+        :data:`LAZY_READ_MIN_SIZE` are read in full.
+    :param snapshots: Optional
+        :class:`~claude_desktop_config.snapshot.SnapshotStore` where the
+        current content of the file is saved before each write.
+    :param journal: Optional :class:`~claude_desktop_config.journal.Journal`
+        where each write is recorded, with the fingerprints of the file
+        before and after, before the file is touched. With a journal,
+        :meth:`BaseMcpEnum.apply` always writes atomically, so an
+        interrupted write never leaves a file that is neither.
+    """
 
-    def read(self) -> dict[str, T.Any]:
+    path: Path = dataclasses.field(default_factory=get_default_claude_desktop_config_path)
+    cache: T.Optional[ReadCache] = dataclasses.field(
+        default=None,
+        repr=False,
+        compare=False,
+    )
+    codec: JsonCodec = dataclasses.field(
+        default_factory=get_default_codec,
+        repr=False,
+        compare=False,
+    )
+    minimal_edit: bool = dataclasses.field(default=False)
+    lazy: bool = dataclasses.field(default=False)
+    snapshots: T.Optional["SnapshotStore"] = dataclasses.field(
+        default=None,
+        repr=False,
+        compare=False,
+    )
+    journal: T.Optional["Journal"] = dataclasses.field(
+        default=None,
+        repr=False,
+        compare=False,
+    )
+    # the stat key of the last file written through this object, taken from
+    # the written file, see ``_after_write``
+    _written_stat_key: T.Optional[T_STAT_KEY] = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+        compare=False,
+    )
+
+    def read(self, track: bool = False) -> dict[str, T.Any]:
         """
         Read the configuration from the file.
+
+        :param track: Return a :class:`~claude_desktop_config.document.ConfigDocument`
+            that records its mutations, so :meth:`write` knows what changed
+            without comparing the whole document. With ``lazy``, it is a
+            partial document where only ``mcpServers`` is parsed.
         """
-        return json.loads(self.path.read_text(encoding="utf-8"))
+        if track and self.lazy:
+            return self._read_lazy()
+        if track and self.minimal_edit:
+            with open(self.path, "rb") as f:
+                stat_key = _get_stat_key(os.fstat(f.fileno()))
+                data = self._read_file(f)
+            return self._make_document(data, stat_key)
+        config, stat_key = self._read()
+        if track:
+            return ConfigDocument(config, path=self.path, stat_key=stat_key)
+        return config
+
+    def _read_lazy(self) -> ConfigDocument:
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            stat_key = _get_stat_key(st)
+            if st.st_size < LAZY_READ_MIN_SIZE:
+                return self._make_document(self._read_file(f), stat_key)
+            import mmap
+
+            # the file is scanned in place, only "mcpServers" is copied
+            with metrics.phase(metrics.PHASE_READ):
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            metrics.count(metrics.COUNTER_BYTES_READ, st.st_size)
+            with mm:
+                with metrics.phase(metrics.PHASE_PARSE):
+                    res = parse_lazy(mm)
+                if res is None:
+                    return self._make_document(mm[:], stat_key)
+        servers, source = res
+        source.path = self.path
+        source.stat_key = stat_key
+        return ConfigDocument(
+            {"mcpServers": servers},
+            path=self.path,
+            source=source,
+            stat_key=stat_key,
+        )
 
-    def write(self, config: dict[str, T.Any]):
+    def _make_document(
+        self,
+        data: bytes,
+        stat_key: T.Optional[T_STAT_KEY],
+        lazy: bool = False,
+    ) -> ConfigDocument:
+        if lazy and len(data) >= LAZY_READ_MIN_SIZE:
+            with metrics.phase(metrics.PHASE_PARSE):
+                res = parse_lazy(data)
+            if res is not None:
+                servers, source = res
+                source.path = self.path
+                source.stat_key = stat_key
+                source.data = data
+                return ConfigDocument(
+                    {"mcpServers": servers},
+                    path=self.path,
+                    source=source,
+                    stat_key=stat_key,
+                )
+        with metrics.phase(metrics.PHASE_PARSE):
+            config, source = parse_with_source_map(data.decode("utf-8"))
+        if source is not None:
+            source.stat_key = stat_key
+        return ConfigDocument(
+            config,
+            path=self.path,
+            source=source,
+            stat_key=stat_key,
+        )
+
+    def _read(self) -> tuple[dict[str, T.Any], T_STAT_KEY]:
+        """
+        :return: The config and the stat key of the file it was read from.
+        """
+        if self.cache is not None:
+            res = self.cache._get(self.path)
+            if res is not None:
+                return res
+        with open(self.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            config = self._load_file(f, st)
+        stat_key = _get_stat_key(st)
+        if self.cache is not None:
+            self.cache.put(self.path, stat_key, config)
+        return config, stat_key
+
+    def _load_file(self, f: T.BinaryIO, st: os.stat_result) -> dict[str, T.Any]:
+        """
+        Parse an open config file. A large file is memory-mapped and handed
+        to the codec as a :class:`memoryview`, without a copy to ``bytes``,
+        if the codec supports it.
+        """
+        if st.st_size >= MMAP_READ_MIN_SIZE and self.codec.accepts_buffer:
+            import mmap
+
+            try:
+                with metrics.phase(metrics.PHASE_READ):
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # pragma: no cover
+                # truncated since the stat
+                return self._loads(self._read_file(f))
+            metrics.count(metrics.COUNTER_BYTES_READ, st.st_size)
+            with mm:
+                # the view must be released before the map is closed
+                with memoryview(mm) as view:
+                    return self._loads(view)
+        return self._loads(self._read_file(f))
+
+    # the collectors are checked inline on the hot paths of small files,
+    # it is much cheaper than entering a no-op ``metrics.phase``
+    def _read_file(self, f: T.BinaryIO) -> bytes:
+        if not metrics._collectors:
+            return f.read()
+        with metrics.phase(metrics.PHASE_READ):
+            data = f.read()
+        metrics.count(metrics.COUNTER_BYTES_READ, len(data))
+        return data
+
+    def _loads(self, data: T.Union[bytes, memoryview]) -> dict[str, T.Any]:
+        if not metrics._collectors:
+            return self.codec.loads(data)
+        with metrics.phase(metrics.PHASE_PARSE):
+            return self.codec.loads(data)
+
+    def write(
+        self,
+        config: dict[str, T.Any],
+        atomic: bool = False,
+        fsync_dir: bool = False,
+    ) -> bool:
         """
         Write the configuration to the file.
+
+        :param config: The configuration dictionary to write.
+        :param atomic: If True, skip the write when the file already has the
+            exact same content, otherwise write a temp file in the same
+            directory, fsync it and rename it into place. A crash never leaves
+            a truncated config behind, and an unchanged file keeps its mtime.
+            A symlinked config keeps its symlink, the target is replaced, and
+            the new file keeps the mode and, when allowed, the owner of the
+            old one.
+        :param fsync_dir: Also fsync the parent directory after the rename so
+            the rename itself survives a power loss. Only used when ``atomic``
+            is True, and ignored on Windows.
+
+        :return: True if the file was physically written, False if the write
+            was skipped because the content is identical, or because
+            ``config`` is a :class:`~claude_desktop_config.document.ConfigDocument`
+            read from this file that has no recorded mutation, and the file
+            wasn't changed since it was read.
+
+        :raises ConflictError: If ``config`` is a
+            :attr:`~claude_desktop_config.document.ConfigDocument.partial`
+            document and its file was changed since it was read.
         """
-        self.path.write_text(json.dumps(config, indent=4), encoding="utf-8")
+        if self._is_unchanged_document(config):
+            metrics.count(metrics.COUNTER_WRITES_SKIPPED)
+            return False
+        with metrics.phase(metrics.PHASE_SERIALIZE):
+            data, source = self._dumps(config)
+        if self.snapshots is not None:
+            self.snapshots.snapshot(self.path)
+        if self.journal is not None:
+            # the content before the change is not at hand, ``apply`` and
+            # ``update`` avoid this extra read
+            self.journal.intend(
+                self.path,
+                read_fingerprint(self.path),
+                get_fingerprint(data),
+            )
+        if atomic:
+            written, stat_key = self._write_atomic(data, fsync_dir=fsync_dir)
+        else:
+            with metrics.phase(metrics.PHASE_WRITE):
+                with open(self.path, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    stat_key = _get_stat_key(os.fstat(f.fileno()))
+            metrics.count(metrics.COUNTER_BYTES_WRITTEN, len(data))
+            written = True
+        if self.journal is not None:
+            self.journal.done(self.path)
+        self._after_write(config, source, stat_key)
+        return written
 
+    def _is_unchanged_document(self, config: dict[str, T.Any]) -> bool:
+        """
+        True if ``config`` is a clean document of this file, and the file is
+        still the one it was read from.
+        """
+        if not isinstance(config, ConfigDocument):
+            return False
+        if config.dirty or config.path != self.path or config.stat_key is None:
+            return False
+        try:
+            return _get_stat_key(os.stat(self.path)) == config.stat_key
+        except FileNotFoundError:
+            return False
 
-@dataclasses.dataclass
-class Mcp:
-    name: str = dataclasses.field()
-    settings: dict[str, T.Any] = dataclasses.field()
+    def _dumps(
+        self,
+        config: dict[str, T.Any],
+    ) -> tuple[bytes, T.Optional[SourceMap]]:
+        """
+        Serialize the config, splicing the dirty entries of a document read
+        with ``minimal_edit`` into its original text when possible.
+
+        :return: The bytes to write and their source map, if any.
+        """
+        source = getattr(config, "source", None)
+        if source is not None and source.partial:
+            if config.path == self.path:
+                res = splice_servers(
+                    source,
+                    source.read(),
+                    dict.get(config, "mcpServers"),
+                    config.dirty_paths,
+                    lambda value: self.codec.dumps(value).decode("utf-8"),
+                )
+                if res is not None:
+                    return res
+            config.load()
+            source = config.source
+        if source is None or config.path != self.path:
+            return self.codec.dumps(config), None
+        if source.stat_key is not None:
+            # the file was changed by someone else since it was read, the
+            # offsets don't match its content anymore
+            try:
+                stat_key = _get_stat_key(os.stat(self.path))
+            except FileNotFoundError:
+                stat_key = None
+            if stat_key != source.stat_key:
+                return self.codec.dumps(config), None
+        res = splice(
+            source,
+            config,
+            config.dirty_paths,
+            lambda value: self.codec.dumps(value).decode("utf-8"),
+        )
+        if res is None:
+            return self.codec.dumps(config), None
+        text, source = res
+        return text.encode("utf-8"), source
+
+    def _after_write(
+        self,
+        config: dict[str, T.Any],
+        source: T.Union[SourceMap, LazySourceMap, None],
+        stat_key: T_STAT_KEY,
+    ):
+        """
+        :param stat_key: The stat key of the written file, taken from its
+            file descriptor. A ``stat`` of the path after the write could
+            see the file of another writer, and cache our config under it.
+        """
+        self._written_stat_key = stat_key
+        is_document = isinstance(config, ConfigDocument)
+        if self.cache is not None:
+            if source is not None and source.partial:
+                # caching it would parse the whole document
+                self.cache.invalidate(self.path)
+            else:
+                self.cache.put(self.path, stat_key, config)
+        if is_document:
+            if source is not None:
+                source.stat_key = stat_key
+            config.stat_key = stat_key
+            config.path = self.path
+            config.source = source
+            config.mark_clean()
+
+    @property
+    def lock_path(self) -> Path:
+        """
+        The sidecar file used by :meth:`lock`. The config file itself can't
+        be locked because an atomic write replaces its inode.
+        """
+        return self.path.with_name(self.path.name + ".lock")
+
+    @contextlib.contextmanager
+    def lock(
+        self,
+        timeout: T.Optional[float] = None,
+        poll_interval: float = 0.01,
+    ) -> T.Iterator[None]:
+        """
+        Hold an exclusive advisory lock (``fcntl.flock``, or ``msvcrt.locking``
+        on Windows) on :attr:`lock_path`. Only other processes and threads
+        that also use this lock are blocked.
+
+        :param timeout: Raise :class:`TimeoutError` if the lock can't be
+            acquired within this many seconds, ``None`` waits forever.
+        :param poll_interval: Seconds between two attempts when ``timeout``
+            is given.
+        """
+        fd = self._open_lock_file()
+        try:
+            _acquire_file_lock(fd, timeout, poll_interval, self.lock_path)
+            try:
+                yield
+            finally:
+                _release_file_lock(fd)
+        finally:
+            os.close(fd)
+
+    def _open_lock_file(self) -> int:
+        """
+        Open :attr:`lock_path`, create it if needed. A new lock file gets the
+        owner of the config file, so a lock file created by a root
+        provisioning job doesn't lock the user out. An existing lock file the
+        process can't write is opened read-only, locking it still works.
+        """
+        while True:
+            try:
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                pass
+            else:
+                if not IS_WINDOWS:
+                    try:
+                        _copy_owner(self.lock_path, os.stat(self.path))
+                    except FileNotFoundError:
+                        pass
+                return fd
+            try:
+                return os.open(self.lock_path, os.O_RDWR)
+            except PermissionError:
+                return os.open(self.lock_path, os.O_RDONLY)
+            except FileNotFoundError:  # pragma: no cover
+                # removed in between, create it again
+                continue
+
+    def update(
+        self,
+        mutate: T.Callable[[dict[str, T.Any]], T.Any],
+        concurrency: str = CONCURRENCY_LOCK,
+        fsync_dir: bool = False,
+        lock_timeout: T.Optional[float] = None,
+        retries: int = 10,
+        backoff: float = 0.01,
+        max_backoff: float = 1.0,
+        track: bool = False,
+    ) -> bool:
+        """
+        Concurrency safe read-modify-write. ``mutate`` is called with the
+        freshly read config and changes it in place, the result is written
+        atomically only if something changed.
+
+        - ``concurrency="lock"``: the whole read-modify-write runs under
+          :meth:`lock`.
+        - ``concurrency="optimistic"``: the file is read and mutated without
+          lock. Right before the rename, the sha256 of the file is compared
+          with the one that was read, under :meth:`lock` so the check and the
+          rename are atomic for other users of this method. On mismatch the
+          read-modify-write is retried from scratch with exponential backoff
+          and jitter. ``mutate`` may be called more than once, so it must not
+          have other side effects.
+
+        :param mutate: Function that changes the config in place.
+        :param concurrency: ``"lock"`` or ``"optimistic"``.
+        :param fsync_dir: See :meth:`write`.
+        :param lock_timeout: See ``timeout`` of :meth:`lock`.
+        :param retries: Max number of retries of the optimistic mode,
+            :class:`ConflictError` is raised after that.
+        :param backoff: Initial delay in seconds between two retries.
+        :param max_backoff: Max delay in seconds between two retries.
+        :param track: Pass a :class:`~claude_desktop_config.document.ConfigDocument`
+            to ``mutate`` and use its recorded mutations to know whether
+            something changed, instead of a snapshot and a deep compare.
+
+        :return: True if the file was written.
+        """
+        return self._run_concurrent(
+            lambda check: self._read_modify_write(mutate, fsync_dir, check, track),
+            concurrency,
+            lock_timeout=lock_timeout,
+            retries=retries,
+            backoff=backoff,
+            max_backoff=max_backoff,
+        )
+
+    def _run_concurrent(
+        self,
+        attempt: T.Callable[[bool], bool],
+        concurrency: str,
+        lock_timeout: T.Optional[float] = None,
+        retries: int = 10,
+        backoff: float = 0.01,
+        max_backoff: float = 1.0,
+    ) -> bool:
+        """
+        Run one read-modify-write ``attempt`` with the ``concurrency`` mode of
+        :meth:`update`. ``attempt`` is called with True when it must check
+        that the file didn't change before its rename.
+        """
+        if concurrency == CONCURRENCY_LOCK:
+            with self.lock(timeout=lock_timeout):
+                return attempt(False)
+        elif concurrency == CONCURRENCY_OPTIMISTIC:
+            delay = backoff
+            for i in range(retries + 1):
+                try:
+                    return attempt(True)
+                except ConflictError:
+                    if i == retries:
+                        raise
+                    import random  # only needed under contention
+
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+                    delay = min(delay * 2, max_backoff)
+        else:
+            raise ValueError(f"unknown concurrency mode {concurrency!r}")
+
+    def _read_modify_write(
+        self,
+        mutate: T.Callable[[dict[str, T.Any]], T.Any],
+        fsync_dir: bool,
+        check: bool,
+        track: bool,
+    ) -> bool:
+        with open(self.path, "rb") as f:
+            original = self._read_file(f)
+        if track and (self.minimal_edit or self.lazy):
+            # the file can't change under the lock, and a concurrent change
+            # fails the compare-and-swap, no need to check the stat key
+            config = self._make_document(original, None, lazy=self.lazy)
+            mutate(config)
+            changed = config.dirty
+        elif track:
+            config = ConfigDocument(self._loads(original), path=self.path)
+            mutate(config)
+            changed = config.dirty
+        else:
+            config = self._loads(original)
+            before = _copy_json(config)
+            mutate(config)
+            changed = config != before
+        if not changed:
+            metrics.count(metrics.COUNTER_WRITES_SKIPPED)
+            return False
+        with metrics.phase(metrics.PHASE_SERIALIZE):
+            data, source = self._dumps(config)
+        written, stat_key = self._replace(original, data, fsync_dir, check)
+        self._after_write(config, source, stat_key)
+        return written
+
+    def _rewrite(
+        self,
+        transform: T.Callable[[bytes], T.Optional[bytes]],
+        fsync_dir: bool,
+        check: bool,
+    ) -> bool:
+        """
+        Like :meth:`_read_modify_write`, but on the raw content of the file,
+        ``transform`` returns the new content or None if nothing changes.
+        """
+        with open(self.path, "rb") as f:
+            original = self._read_file(f)
+        with metrics.phase(metrics.PHASE_SERIALIZE):
+            data = transform(original)
+        if data is None:
+            metrics.count(metrics.COUNTER_WRITES_SKIPPED)
+            return False
+        written, self._written_stat_key = self._replace(
+            original, data, fsync_dir, check
+        )
+        if self.cache is not None:
+            self.cache.invalidate(self.path)
+        return written
+
+    def _replace(
+        self,
+        original: bytes,
+        data: bytes,
+        fsync_dir: bool,
+        check: bool,
+    ) -> tuple[bool, T_STAT_KEY]:
+        """
+        Atomically replace the ``original`` content of the file with ``data``,
+        saving a snapshot and recording the change in the journal first.
+
+        :return: See :meth:`_write_atomic_file`.
+        """
+        expected_sha256 = hashlib.sha256(original).hexdigest() if check else None
+        if self.snapshots is not None:
+            self.snapshots.snapshot(self.path, data=original)
+        if self.journal is not None:
+            self.journal.intend(
+                self.path,
+                expected_sha256 or get_fingerprint(original),
+                get_fingerprint(data),
+            )
+        res = self._write_atomic(
+            data,
+            fsync_dir=fsync_dir,
+            expected_sha256=expected_sha256,
+        )
+        if self.journal is not None:
+            self.journal.done(self.path)
+        return res
+
+    @contextlib.contextmanager
+    def session(
+        self,
+        atomic: bool = True,
+        fsync_dir: bool = False,
+        lock: bool = False,
+        track: bool = False,
+    ) -> T.Iterator[dict[str, T.Any]]:
+        """
+        Read the configuration once, let the caller mutate it any number of
+        times, then write it back once at exit only if something changed.
+        If an exception is raised inside the block, the changes are discarded.
+
+        Usage example:
+
+        .. code-block:: python
+
+            with cdc.session() as config:
+                enable_mcp_server(config, "server1", {"command": "cmd1"})
+                disable_mcp_server(config, "server2")
+
+        :param atomic: See :meth:`write`.
+        :param fsync_dir: See :meth:`write`.
+        :param lock: Hold :meth:`lock` for the whole session.
+        :param track: Yield a :class:`~claude_desktop_config.document.ConfigDocument`
+            and write only if it has recorded mutations. This avoids a
+            snapshot and a deep compare of the whole config, but any
+            mutation counts, even one that sets an equal value.
+        """
+        with self.lock() if lock else contextlib.nullcontext():
+            if track:
+                config = self.read(track=True)
+                yield config
+                changed = config.dirty
+            else:
+                config = self.read()
+                before = _copy_json(config)
+                yield config
+                changed = config != before
+            if changed:
+                self.write(config, atomic=atomic, fsync_dir=fsync_dir)
+            else:
+                metrics.count(metrics.COUNTER_WRITES_SKIPPED)
+
+    def _write_atomic(
+        self,
+        data: bytes,
+        fsync_dir: bool,
+        expected_sha256: T.Optional[str] = None,
+    ) -> tuple[bool, T_STAT_KEY]:
+        with metrics.phase(metrics.PHASE_WRITE):
+            written, stat_key = self._write_atomic_file(
+                data, fsync_dir, expected_sha256
+            )
+        if written:
+            metrics.count(metrics.COUNTER_BYTES_WRITTEN, len(data))
+        else:
+            metrics.count(metrics.COUNTER_WRITES_SKIPPED)
+        return written, stat_key
+
+    def _write_atomic_file(
+        self,
+        data: bytes,
+        fsync_dir: bool,
+        expected_sha256: T.Optional[str],
+    ) -> tuple[bool, T_STAT_KEY]:
+        """
+        :return: True if the file was written, False if it already had this
+            content, and the stat key of the file with this content.
+        """
+        # replace the target of a symlink, not the symlink itself
+        path = Path(os.path.realpath(self.path))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        if expected_sha256 is not None:
+            # the file must still be the one that was read, even when it
+            # already has the new content: a concurrent writer that made the
+            # same change from the same version doesn't include ours
+            current, stat_key = self._read_current(path)
+            if hashlib.sha256(current).hexdigest() != expected_sha256:
+                raise ConflictError(f"{self.path} was changed concurrently")
+            if current == data:
+                return False, stat_key
+        # compare the size first, only read the file when it may be identical
+        elif st is not None and st.st_size == len(data):
+            current, stat_key = self._read_current(path)
+            if current == data:
+                return False, stat_key
+
+        dir_parent = path.parent
+        fd, tmp_path = tempfile.mkstemp(
+            dir=dir_parent,
+            prefix=f".{path.name}.",
+            suffix=".tmp",
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                # a rename keeps the mtime, the size and the inode
+                stat_key = _get_stat_key(os.fstat(f.fileno()))
+            if st is not None:
+                # e.g. a fleet run as root must keep the files of each user
+                # writable by that user, chown clears the setuid bits so it
+                # goes first
+                if not IS_WINDOWS:
+                    _copy_owner(tmp_path, st)
+                os.chmod(tmp_path, st.st_mode & 0o7777)
+            else:
+                # a new file gets the mode of ``open``, not the 0600 of mkstemp
+                os.chmod(tmp_path, 0o666 & ~_get_umask())
+            if expected_sha256 is None:
+                os.replace(tmp_path, path)
+            else:
+                # compare-and-swap, the lock is only held for the check and
+                # the rename, not for the read and the mutation
+                with self.lock():
+                    current, _ = self._read_current(path)
+                    if hashlib.sha256(current).hexdigest() != expected_sha256:
+                        raise ConflictError(f"{self.path} was changed concurrently")
+                    os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:  # pragma: no cover
+                pass
+            raise
+
+        if fsync_dir and not IS_WINDOWS:  # pragma: no branch
+            dir_fd = os.open(dir_parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return True, stat_key
+
+    def _read_current(self, path: Path) -> tuple[bytes, T.Optional[T_STAT_KEY]]:
+        try:
+            with open(path, "rb") as f:
+                stat_key = _get_stat_key(os.fstat(f.fileno()))
+                return f.read(), stat_key
+        except FileNotFoundError:
+            return b"", None
 
 
 class BaseMcpEnum(enum.Enum):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # the state of each enum class is stored on the class, not in a
+        # global registry, so a generated class is freed with its state
+        cls._mcp_index = None
+        cls._plan_cache = _PlanCache()
+        cls._profiles = dict()
+        cls._fragment_cache = _FragmentCache()
+
     @classmethod
-    def apply(
+    def _get_mcp_index(cls) -> dict[str, "BaseMcpEnum"]:
+        """
+        Return the ``{mcp_name: enum_member}`` mapping of this enum class
+        in definition order. It is computed once per enum class.
+        """
+        mcp_index = cls._mcp_index
+        if mcp_index is None:
+            # members may not exist yet in ``__init_subclass__``
+            mcp_index = {mcp_enum.value.name: mcp_enum for mcp_enum in cls}
+            cls._mcp_index = mcp_index
+        return mcp_index
+
+    @classmethod
+    def _get_plan_cache(cls) -> _PlanCache:
+        """
+        Return the plan cache of this enum class.
+        """
+        return cls._plan_cache
+
+    @classmethod
+    def _get_profiles(cls) -> dict[str, McpProfile]:
+        """
+        Return the ``{name: profile}`` mapping of this enum class.
+        """
+        return cls._profiles
+
+    @classmethod
+    def _get_fragment_cache(cls) -> _FragmentCache:
+        """
+        Return the serialized ``mcpServers`` objects of profile switches of
+        this enum class.
+        """
+        return cls._fragment_cache
+
+    @classmethod
+    def _get_wanted_names(
+        cls,
+        wanted_mcps: T.Iterable["BaseMcpEnum"],
+    ) -> frozenset[str]:
+        # members of other enum classes are ignored. ``isinstance`` and
+        # ``_value_`` are much cheaper than hashing the members into a set
+        # and than the ``value`` property
+        return frozenset(
+            mcp_enum._value_.name
+            for mcp_enum in wanted_mcps
+            if isinstance(mcp_enum, cls)
+        )
+
+    @classmethod
+    def _make_plan(
         cls,
-        wanted_mcps: T.Union[set["BaseMcpEnum"], list["BaseMcpEnum"]],
+        wanted: frozenset[str],
+        mcp_servers: T.Optional[dict[str, T.Any]],
+        input_fingerprint: T.Optional[str],
+    ) -> McpPlan:
+        mcp_servers = {} if mcp_servers is None else mcp_servers
+        add, update, remove, unchanged = list(), list(), list(), list()
+        diff = list()
+        settings = dict()
+        compared = 0
+        for name, mcp_enum in cls._get_mcp_index().items():
+            if name in wanted:
+                mcp = mcp_enum.value
+                if name not in mcp_servers:
+                    add.append(name)
+                    settings[name] = mcp.settings
+                    continue
+                compared += 1
+                if _is_same_settings(mcp_servers[name], mcp.settings, mcp.fingerprint):
+                    unchanged.append(name)
+                else:
+                    update.append(name)
+                    settings[name] = mcp.settings
+                    diff.extend(diff_settings(name, mcp_servers[name], mcp.settings))
+            elif name in mcp_servers:
+                remove.append(name)
+            else:
+                unchanged.append(name)
+        metrics.count(metrics.COUNTER_SERVERS_COMPARED, compared)
+        return McpPlan(
+            wanted=wanted,
+            input_fingerprint=input_fingerprint,
+            add=tuple(add),
+            update=tuple(update),
+            remove=tuple(remove),
+            unchanged=tuple(unchanged),
+            diff=tuple(diff),
+            settings=types.MappingProxyType(settings),
+        )
+
+    @classmethod
+    def _plan(
+        cls,
+        wanted: frozenset[str],
+        config: dict[str, T.Any],
+        input_fingerprint: T.Optional[str] = None,
+    ) -> McpPlan:
+        mcp_servers = config.get("mcpServers")
+        if input_fingerprint is None:
+            input_fingerprint = _get_plan_input_fingerprint(
+                mcp_servers, cls._get_mcp_index()
+            )
+        if input_fingerprint is None:
+            return cls._make_plan(wanted, mcp_servers, None)
+        key = (wanted, input_fingerprint)
+        cache = cls._get_plan_cache()
+        plan = cache.get(key)
+        if plan is None:
+            plan = cls._make_plan(wanted, mcp_servers, input_fingerprint)
+            cache.put(key, plan)
+        elif metrics._collectors:
+            metrics.count(metrics.COUNTER_PLANS_CACHED)
+        return plan
+
+    @classmethod
+    def plan(
+        cls,
+        wanted_mcps: T.Iterable["BaseMcpEnum"],
+        config: dict[str, T.Any],
+    ) -> McpPlan:
+        """
+        Compute what :meth:`apply` would change in the config, without I/O and
+        without modifying ``config``.
+
+        Plans are cached per enum class by wanted MCP set and by the
+        fingerprint of the managed servers in ``config``, so for many configs
+        in the same state the plan is computed once.
+
+        :param wanted_mcps: A set of MCPs that should be enabled.
+        :param config: The configuration dictionary.
+
+        :return: An immutable :class:`McpPlan`.
+        """
+        return cls._plan(cls._get_wanted_names(wanted_mcps), config)
+
+    @classmethod
+    def apply_plan(
+        cls,
+        plan: McpPlan,
         cdc: ClaudeDesktopConfig,
+        concurrency: T.Optional[str] = None,
     ) -> bool:
         """
-        Apply the MCP configuration to the Claude Desktop Config.
+        Apply a plan from :meth:`plan` to the Claude Desktop Config.
 
-        This method should be overridden by subclasses to define Mcp Enumerations.
+        If the file is not in the state the plan was computed from anymore,
+        the plan is recomputed for the same wanted MCP set.
 
-        :param wanted_mcps: A set of MCPs that should be enabled.
+        :param plan: The plan to apply.
         :param cdc: An instance of ClaudeDesktopConfig to read and write the configuration.
+        :param concurrency: See :meth:`apply`.
 
         :return: True if the configuration was changed, False if it was unchanged.
         """
-        config = cdc.read()
-        flag_list = list()
-        for mcp_enum in cls:
-            if mcp_enum in wanted_mcps:
-                flag = enable_mcp_server(
-                    config,
-                    name=mcp_enum.value.name,
-                    settings=mcp_enum.value.settings,
-                )
-            else:
-                flag = disable_mcp_server(
-                    config,
-                    name=mcp_enum.value.name,
+
+        def mutate(config: dict[str, T.Any]) -> bool:
+            with metrics.phase(metrics.PHASE_PLAN):
+                input_fingerprint = _get_plan_input_fingerprint(
+                    config.get("mcpServers"), cls._get_mcp_index()
                 )
+                if (
+                    input_fingerprint is None
+                    or input_fingerprint != plan.input_fingerprint
+                ):
+                    current_plan = cls._plan(plan.wanted, config, input_fingerprint)
+                else:
+                    current_plan = plan
+            return current_plan.execute(config)
 
-            flag_list.append(flag)
+        return cls._run(mutate, cdc, concurrency)
 
-        if any(flag_list):
+    @classmethod
+    def _run(
+        cls,
+        mutate: T.Callable[[dict[str, T.Any]], bool],
+        cdc: ClaudeDesktopConfig,
+        concurrency: T.Optional[str],
+    ) -> bool:
+        if concurrency is not None:
+            # the plan already knows what changed, no need for a snapshot
+            return cdc.update(mutate, concurrency=concurrency, track=True)
+        if cdc.journal is not None:
+            # the journal needs the content before the change, read it once
+            return cdc._read_modify_write(
+                mutate,
+                fsync_dir=False,
+                check=False,
+                track=True,
+            )
+        config = cdc.read(track=cdc.minimal_edit or cdc.lazy)
+        if mutate(config):
             cdc.write(config)
             return True
+        if metrics._collectors:
+            metrics.count(metrics.COUNTER_WRITES_SKIPPED)
         return False
+
+    @classmethod
+    def apply(
+        cls,
+        wanted_mcps: T.Iterable["BaseMcpEnum"],
+        cdc: ClaudeDesktopConfig,
+        concurrency: T.Optional[str] = None,
+    ) -> bool:
+        """
+        Apply the MCP configuration to the Claude Desktop Config.
+
+        This method should be overridden by subclasses to define Mcp Enumerations.
+
+        :param wanted_mcps: A set of MCPs that should be enabled.
+        :param cdc: An instance of ClaudeDesktopConfig to read and write the configuration.
+        :param concurrency: ``None`` for a plain read and write, ``"lock"`` or
+            ``"optimistic"`` to protect the read-modify-write against other
+            writers, see :meth:`ClaudeDesktopConfig.update`.
+
+        :return: True if the configuration was changed, False if it was unchanged.
+        """
+        wanted = cls._get_wanted_names(wanted_mcps)
+
+        def mutate(config: dict[str, T.Any]) -> bool:
+            if not metrics._collectors:
+                return cls._plan(wanted, config).execute(config)
+            with metrics.phase(metrics.PHASE_PLAN):
+                plan = cls._plan(wanted, config)
+            return plan.execute(config)
+
+        return cls._run(mutate, cdc, concurrency)
+
+    @classmethod
+    async def apply_async(
+        cls,
+        wanted_mcps: T.Iterable["BaseMcpEnum"],
+        cdc: ClaudeDesktopConfig,
+        concurrency: T.Optional[str] = None,
+        executor: T.Optional["concurrent.futures.Executor"] = None,
+    ) -> bool:
+        """
+        Async version of :meth:`apply`. The whole read-plan-write runs in
+        ``executor``, so the event loop is never blocked by file I/O.
+
+        :param executor: The executor to run in, ``None`` means the default
+            executor of the running loop, a bounded thread pool.
+
+        :return: True if the configuration was changed, False if it was unchanged.
+        """
+        # imported here, asyncio is slow to import
+        import asyncio
+
+        wanted_mcps = frozenset(wanted_mcps)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor,
+            functools.partial(cls.apply, wanted_mcps, cdc, concurrency),
+        )
+
+    @classmethod
+    def register_profile(
+        cls,
+        name: str,
+        wanted_mcps: T.Iterable["BaseMcpEnum"],
+    ) -> McpProfile:
+        """
+        Register a named MCP set, to switch config files to it with
+        :meth:`switch_profile`. The ``mcpServers`` objects of the switches
+        between the registered profiles are serialized now, see
+        :mod:`claude_desktop_config.profile`.
+
+        :param name: The name of the profile, registering it again replaces it.
+        :param wanted_mcps: The MCPs that should be enabled in this profile.
+        """
+        profile = McpProfile(name=name, wanted=cls._get_wanted_names(wanted_mcps))
+        profiles = cls._get_profiles()
+        profiles[name] = profile
+        codec = get_default_codec()
+        _precompute_fragments(
+            cls,
+            profiles.values(),
+            cls._get_fragment_cache(),
+            lambda value: codec.dumps(value).decode("utf-8"),
+        )
+        return profile
+
+    @classmethod
+    def switch_profile(
+        cls,
+        name: str,
+        cdc: ClaudeDesktopConfig,
+        concurrency: T.Optional[str] = None,
+    ) -> bool:
+        """
+        Apply the MCP set of a registered profile, with the same result as
+        :meth:`apply`. The new ``mcpServers`` object is spliced into the file
+        and every other byte is kept as is. It is serialized once per
+        distinct current ``mcpServers`` object, so switching many files
+        between a few profiles costs a scan of the file, a cache lookup and
+        an atomic write. Files where ``mcpServers`` can't be located without
+        a full parse are applied with :meth:`apply`.
+
+        :param name: The name of the profile.
+        :param cdc: The config file to switch, always written atomically.
+        :param concurrency: See :meth:`apply`.
+
+        :return: True if the configuration was changed, False if it was unchanged.
+
+        :raises ValueError: If no profile has this name.
+        """
+        profile = cls._get_profiles().get(name)
+        if profile is None:
+            raise ValueError(f"unknown profile {name!r}")
+        transform = functools.partial(
+            _splice_profile,
+            cls,
+            profile.wanted,
+            cls._get_fragment_cache(),
+            lambda value: cdc.codec.dumps(value).decode("utf-8"),
+        )
+        try:
+            if concurrency is None:
+                return cdc._rewrite(transform, fsync_dir=False, check=False)
+            return cdc._run_concurrent(
+                lambda check: cdc._rewrite(transform, fsync_dir=False, check=check),
+                concurrency,
+            )
+        except _NotSpliceable:
+            mcp_index = cls._get_mcp_index()
+            wanted_mcps = [mcp_index[mcp_name] for mcp_name in profile.wanted]
+            return cls.apply(wanted_mcps, cdc, concurrency=concurrency)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+A write-ahead journal of batch applies, to resume a batch that was killed
+partway through instead of running it again.
+
+The journal is an append-only file of JSON lines:
+
+- a ``batch`` record with the enum class, the wanted MCP names and the config
+  files of the batch, written by :func:`~claude_desktop_config.batch.apply_many`.
+- an ``intent`` record with the path, the sha256 of the file before the
+  change and the sha256 of the content about to be written. It is durable
+  before the file is touched.
+- a ``done`` record once the file is written, or once the batch found it
+  already up to date.
+
+Appends are buffered and fsynced in groups: a thread that needs its intent
+on disk flushes the intents of every other thread with the same fsync, so
+concurrent workers share the fsyncs instead of adding one per file. A
+``done`` record is never waited for, it goes to disk with the next group. A
+lost ``done`` record only means the file is checked again on resume.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import Journal, apply_many, resume_many
+
+    with Journal("/var/lib/mcp/batch.journal") as journal:
+        apply_many(MyMcpServers, wanted_mcps, paths, journal=journal)
+
+    # after a crash, only the files that were not done are applied again
+    resume_many(MyMcpServers, "/var/lib/mcp/batch.journal")
+"""
+
+import typing as T
+import os
+import json
+import hashlib
+import threading
+import dataclasses
+from pathlib import Path
+
+RECORD_BATCH = "batch"
+RECORD_INTENT = "intent"
+RECORD_DONE = "done"
+
+
+def get_fingerprint(data: T.Optional[bytes]) -> T.Optional[str]:
+    """
+    The fingerprint of a file content stored in the journal, None for a
+    file that doesn't exist.
+    """
+    return None if data is None else hashlib.sha256(data).hexdigest()
+
+
+def read_fingerprint(path: Path) -> T.Optional[str]:
+    """
+    The fingerprint of the current content of a file.
+    """
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        data = None
+    return get_fingerprint(data)
+
+
+def _to_str(path: Path) -> str:
+    # records of the same file must match whatever the working directory
+    return str(Path(path).absolute())
+
+
+@dataclasses.dataclass(frozen=True)
+class JournalEntry:
+    """
+    An intended change of a config file.
+
+    :param path: The config file.
+    :param before: The fingerprint of the file before the change, None if it
+        didn't exist.
+    :param after: The fingerprint of the content being written.
+    """
+
+    path: Path = dataclasses.field()
+    before: T.Optional[str] = dataclasses.field()
+    after: str = dataclasses.field()
+
+    def is_applied(self) -> bool:
+        """
+        True if the file has the content this change was writing.
+        """
+        return read_fingerprint(self.path) == self.after
+
+
+@dataclasses.dataclass
+class JournalState:
+    """
+    What a journal says about its latest batch.
+
+    :param enum: The ``module:qualname`` of the enum class of the batch,
+        None if the journal has no batch.
+    :param wanted: The names of the wanted MCPs of the batch.
+    :param unfinished: The config files of the batch without a ``done``
+        record, in batch order.
+    :param interrupted: The changes that started without a ``done`` record.
+        Their file may or may not have been written.
+    """
+
+    enum: T.Optional[str] = dataclasses.field(default=None)
+    wanted: list[str] = dataclasses.field(default_factory=list)
+    unfinished: list[Path] = dataclasses.field(default_factory=list)
+    interrupted: list[JournalEntry] = dataclasses.field(default_factory=list)
+
+
+class Journal:
+    """
+    An append-only journal file, safe to share between threads.
+
+    :param path: The journal file, created if it doesn't exist. New records
+        are appended to the existing ones.
+    """
+
+    def __init__(self, path: T.Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab")
+        if self._file.tell() and not self._ends_with_newline():
+            # end the line truncated by a crash, or the next record is lost
+            self._file.write(b"\n")
+        self._cond = threading.Condition()
+        self._buffer: list[bytes] = list()
+        # sequence numbers of the last appended and the last fsynced records
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _append(self, record: dict[str, T.Any], durable: bool):
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._cond:
+            self._buffer.append(line)
+            self._appended += 1
+            if durable:
+                self._wait_synced(self._appended)
+
+    def _wait_synced(self, seq: int):
+        # group commit, called with the condition held. The first waiting
+        # thread writes and fsyncs everything buffered so far, the others
+        # wait for it, then one of them flushes what was appended meanwhile
+        while self._synced < seq:
+            if self._syncing:
+                self._cond.wait()
+                continue
+            self._syncing = True
+            lines, self._buffer = self._buffer, list()
+            target = self._appended
+            self._cond.release()
+            try:
+                self._file.write(b"".join(lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except BaseException:
+                self._cond.acquire()
+                # the next flush writes them again, a duplicate record is
+                # harmless, a missing intent is not
+                self._buffer[:0] = lines
+                self._syncing = False
+                self._cond.notify_all()
+                raise
+            self._cond.acquire()
+            self._synced = target
+            self._syncing = False
+            self._cond.notify_all()
+
+    def sync(self):
+        """
+        Write and fsync every buffered record.
+        """
+        with self._cond:
+            self._wait_synced(self._appended)
+
+    def close(self):
+        """
+        Sync the journal and close the file.
+        """
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+
+    def begin(
+        self,
+        enum: str,
+        wanted: T.Iterable[str],
+        paths: T.Iterable[Path],
+    ):
+        """
+        Record the start of a batch, the previous batches of the journal are
+        no longer considered by :meth:`read`.
+        """
+        record = {
+            "type": RECORD_BATCH,
+            "enum": enum,
+            "wanted": sorted(wanted),
+            "paths": [_to_str(path) for path in paths],
+        }
+        self._append(record, durable=True)
+
+    def intend(self, path: Path, before: T.Optional[str], after: str):
+        """
+        Record a change of a config file, return once it is on disk.
+        """
+        record = {
+            "type": RECORD_INTENT,
+            "path": _to_str(path),
+            "before": before,
+            "after": after,
+        }
+        self._append(record, durable=True)
+
+    def done(self, path: Path):
+        """
+        Record that a config file was written, or needed no change. The
+        record is buffered.
+        """
+        self._append({"type": RECORD_DONE, "path": _to_str(path)}, durable=False)
+
+    @classmethod
+    def read(cls, path: T.Union[str, Path]) -> JournalState:
+        """
+        Read the state of the latest batch of a journal file. A missing file
+        is an empty journal, and a truncated last line, from a crash during
+        an append, is ignored.
+        """
+        try:
+            lines = Path(path).read_bytes().splitlines()
+        except FileNotFoundError:
+            return JournalState()
+        state = JournalState()
+        unfinished: dict[str, None] = dict()
+        intents: dict[str, JournalEntry] = dict()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            type_ = record["type"]
+            if type_ == RECORD_INTENT:
+                intents[record["path"]] = JournalEntry(
+                    path=Path(record["path"]),
+                    before=record["before"],
+                    after=record["after"],
+                )
+            elif type_ == RECORD_DONE:
+                unfinished.pop(record["path"], None)
+                intents.pop(record["path"], None)
+            elif type_ == RECORD_BATCH:
+                state.enum = record["enum"]
+                state.wanted = record["wanted"]
+                unfinished = dict.fromkeys(record["paths"])
+                intents.clear()
+        state.unfinished = [Path(p) for p in unfinished]
+        state.interrupted = list(intents.values())
+        return state
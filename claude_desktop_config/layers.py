@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""
+Layered MCP server settings, e.g. a company base, a team layer and user
+overrides, merged into the ``mcpServers`` entries one config should have.
+
+Rules, from the first layer to the last:
+
+- A server that a layer defines for the first time is added.
+- A server that a later layer defines again is overridden according to the
+  mode of that layer. :data:`MODE_REPLACE` replaces its whole settings.
+  :data:`MODE_MERGE` merges the settings into the previous ones with the
+  JSON Merge Patch rules of RFC 7386: objects are merged key by key, a
+  ``None`` value removes the key, anything else replaces the previous value.
+  The settings of a new server are merged into an empty object.
+- A server whose settings are ``None`` in a layer is removed, in any mode,
+  and stays removed unless a later layer defines it again. A removed server
+  is deleted from the config, servers that no layer mentions are left alone.
+
+Every layer has a fingerprint of its content, and merges are memoized by
+the fingerprints of the layers, including the merge of every leading
+subset of the layers. Ten thousand users who share the company and team
+layers merge them once, then only merge their own overrides on top.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import Layer, merge_layers
+    from claude_desktop_config.layers import MODE_MERGE
+
+    company = Layer.from_enum(CompanyMcpServers)
+    team = Layer({"github": {"env": {"GITHUB_ORG": "data"}}}, mode=MODE_MERGE)
+    for cdc in cdcs:
+        merged = merge_layers([company, team, user_overrides[cdc.path]])
+        cdc.update(merged.execute)
+"""
+
+import typing as T
+import hashlib
+import weakref
+import threading
+import dataclasses
+from collections import OrderedDict
+
+from . import metrics
+from .impl import (
+    fingerprint_settings,
+    FrozenDict,
+    freeze_json,
+    McpChangeSet,
+    apply_mcp_changes,
+    BaseMcpEnum,
+)
+
+#: A server defined again replaces the previous settings
+MODE_REPLACE = "replace"
+#: A server defined again is merged into the previous settings, RFC 7386
+MODE_MERGE = "merge"
+
+MODES = (MODE_REPLACE, MODE_MERGE)
+
+
+def _get_settings_fingerprint(settings: T.Any) -> str:
+    # the fingerprint of interned settings is computed once, see ``Mcp``
+    try:
+        return settings._fingerprint
+    except AttributeError:
+        fingerprint = fingerprint_settings(settings)
+        if isinstance(settings, FrozenDict):
+            settings._fingerprint = fingerprint
+        return fingerprint
+
+
+@dataclasses.dataclass(frozen=True)
+class Layer:
+    """
+    The MCP server settings of one layer, immutable. Build shared layers
+    once and reuse them, their fingerprint is computed when they are created.
+
+    :param servers: The settings of each server by name, ``None`` removes
+        the server.
+    :param mode: :data:`MODE_REPLACE` or :data:`MODE_MERGE`, how the
+        servers defined by a previous layer are overridden.
+    """
+
+    servers: T.Mapping[str, T.Optional[T.Mapping[str, T.Any]]] = dataclasses.field()
+    mode: str = dataclasses.field(default=MODE_REPLACE)
+    fingerprint: str = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.mode not in MODES:
+            raise ValueError(f"unknown layer mode {self.mode!r}")
+        servers = freeze_json(dict(self.servers))
+        sha256 = hashlib.sha256(self.mode.encode("utf-8"))
+        for name in sorted(servers):
+            settings = servers[name]
+            if settings is None:
+                fingerprint = "-"
+            else:
+                fingerprint = _get_settings_fingerprint(settings)
+            sha256.update(f"\n{name}\n{fingerprint}".encode("utf-8"))
+        object.__setattr__(self, "servers", servers)
+        object.__setattr__(self, "fingerprint", sha256.hexdigest())
+
+    @classmethod
+    def from_enum(
+        cls,
+        mcp_enum_class: T.Type[BaseMcpEnum],
+        wanted_mcps: T.Optional[T.Iterable[BaseMcpEnum]] = None,
+    ) -> "Layer":
+        """
+        A layer with the MCP servers of an enum class, in replace mode.
+
+        :param wanted_mcps: The members to add, the other members are removed.
+            All members are added by default.
+        """
+        if wanted_mcps is None:
+            wanted = None
+        else:
+            wanted = mcp_enum_class._get_wanted_names(wanted_mcps)
+        servers = dict()
+        for name, mcp_enum in mcp_enum_class._get_mcp_index().items():
+            if wanted is None or name in wanted:
+                servers[name] = mcp_enum.value.settings
+            else:
+                servers[name] = None
+        return cls(servers=servers)
+
+
+T_LAYER_LIKE = T.Union[
+    Layer,
+    T.Type[BaseMcpEnum],
+    T.Mapping[str, T.Optional[T.Mapping[str, T.Any]]],
+]
+
+
+def _to_layer(layer: T_LAYER_LIKE) -> Layer:
+    if isinstance(layer, Layer):
+        return layer
+    if isinstance(layer, type) and issubclass(layer, BaseMcpEnum):
+        return _get_enum_layer(layer)
+    return Layer(servers=layer)
+
+
+# enum classes are immutable, their layer is built once. A layer doesn't
+# refer to its class, so a generated class is still freed
+_enum_layers: "weakref.WeakKeyDictionary[type, Layer]" = weakref.WeakKeyDictionary()
+
+
+def _get_enum_layer(mcp_enum_class: T.Type[BaseMcpEnum]) -> Layer:
+    layer = _enum_layers.get(mcp_enum_class)
+    if layer is None:
+        layer = Layer.from_enum(mcp_enum_class)
+        _enum_layers[mcp_enum_class] = layer
+    return layer
+
+
+@dataclasses.dataclass(frozen=True)
+class MergedLayers:
+    """
+    The merge of a list of layers, immutable and shared by every caller that
+    merges the same layers.
+
+    :param servers: The settings of each server by name, deeply frozen, see
+        :func:`~claude_desktop_config.impl.freeze_json`.
+    :param removed: The servers removed by a layer and not defined again.
+    :param fingerprints: The :func:`~claude_desktop_config.impl.fingerprint_settings`
+        of each server by name.
+    """
+
+    servers: T.Mapping[str, T.Mapping[str, T.Any]] = dataclasses.field()
+    removed: frozenset[str] = dataclasses.field(default=frozenset())
+    fingerprints: T.Mapping[str, str] = dataclasses.field(
+        default_factory=FrozenDict,
+        repr=False,
+        compare=False,
+    )
+
+    def execute(self, config: dict[str, T.Any]) -> McpChangeSet:
+        """
+        Make the ``mcpServers`` of a config dictionary match the merge, in
+        place, with :func:`~claude_desktop_config.impl.apply_mcp_changes`.
+        Usable as the ``mutate`` function of
+        :meth:`~claude_desktop_config.impl.ClaudeDesktopConfig.update`.
+
+        :return: A :class:`~claude_desktop_config.impl.McpChangeSet`, it is
+            truthy if the configuration was changed.
+        """
+        return apply_mcp_changes(
+            config,
+            enable=self.servers,
+            disable=self.removed,
+            fingerprints=self.fingerprints,
+        )
+
+
+_EMPTY = MergedLayers(servers=FrozenDict())
+
+
+def _merge_patch(target: T.Any, patch: T.Any) -> T.Any:
+    """
+    Apply a JSON Merge Patch (RFC 7386) to ``target``, without modifying it.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else dict()
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge_patch(result.get(key), value)
+    return result
+
+
+def _merge(merged: MergedLayers, layer: Layer) -> MergedLayers:
+    servers = dict(merged.servers)
+    removed = set(merged.removed)
+    for name, settings in layer.servers.items():
+        if settings is None:
+            servers.pop(name, None)
+            removed.add(name)
+            continue
+        removed.discard(name)
+        if layer.mode == MODE_MERGE:
+            settings = freeze_json(_merge_patch(servers.get(name), settings))
+        servers[name] = settings
+    return MergedLayers(
+        servers=FrozenDict(servers),
+        removed=frozenset(removed),
+        fingerprints=FrozenDict(
+            (name, _get_settings_fingerprint(settings))
+            for name, settings in servers.items()
+        ),
+    )
+
+
+MERGE_CACHE_SIZE = 4096
+
+
+class _MergeCache:
+    """
+    A thread safe LRU mapping of a tuple of layer fingerprints to the
+    :class:`MergedLayers` of these layers.
+    """
+
+    def __init__(self, maxsize: int = MERGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict[tuple[str, ...], MergedLayers] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: tuple[str, ...]) -> T.Optional[MergedLayers]:
+        with self._lock:
+            merged = self._data.get(key)
+            if merged is not None:
+                self._data.move_to_end(key)
+            return merged
+
+    def put(self, key: tuple[str, ...], merged: MergedLayers):
+        with self._lock:
+            self._data[key] = merged
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_merge_cache = _MergeCache()
+
+
+def merge_layers(layers: T.Iterable[T_LAYER_LIKE]) -> MergedLayers:
+    """
+    Merge layers, from the lowest to the highest priority, see the rules of
+    :mod:`claude_desktop_config.layers`.
+
+    Merges are memoized by the fingerprints of the layers. Only the layers
+    after the longest already merged leading subset are merged, so callers
+    that share their first layers share their merge.
+
+    :param layers: :class:`Layer` objects, :class:`BaseMcpEnum` subclasses
+        whose members are all added, or ``{name: settings}`` mappings in
+        replace mode. A mapping is frozen and fingerprinted on every call,
+        pass a :class:`Layer` for the layers shared by many calls.
+    """
+    layers = [_to_layer(layer) for layer in layers]
+    key = tuple(layer.fingerprint for layer in layers)
+    # the longest leading subset that was already merged
+    start, merged = 0, _EMPTY
+    for i in range(len(key), 0, -1):
+        cached = _merge_cache.get(key[:i])
+        if cached is not None:
+            start, merged = i, cached
+            break
+    if start and metrics._collectors:
+        metrics.count(metrics.COUNTER_MERGES_CACHED)
+    for i in range(start, len(key)):
+        merged = _merge(merged, layers[i])
+        _merge_cache.put(key[: i + 1], merged)
+    return merged
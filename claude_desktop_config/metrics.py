@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""
+Instrumentation of the hot paths: per phase durations and counters of
+``ClaudeDesktopConfig.read`` / ``write`` and ``BaseMcpEnum.apply``.
+
+Nothing is recorded unless a collector is installed with :func:`instrument`.
+Collectors are process wide, so the worker threads of
+:func:`~claude_desktop_config.batch.apply_many` and of the async API are
+recorded too. Worker processes are not.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import instrument, apply_many
+
+    with instrument() as stats:
+        apply_many(MyMcpServers, wanted_mcps, paths)
+    print(stats.summary())
+    # phase          count      total        p50        p95        p99
+    # read             100    2.531ms    0.002ms    0.003ms    0.006ms
+    # parse            100    0.096ms    0.001ms    0.001ms    0.004ms
+    # plan             100    0.536ms    0.004ms    0.008ms    0.017ms
+    # serialize        100    0.530ms    0.005ms    0.008ms    0.012ms
+    # write            100    9.820ms    0.011ms    0.103ms    2.502ms
+    # bytes_read=3900 bytes_written=13400 plans_cached=99 servers_compared=1
+
+A custom collector, e.g. to forward the measures to statsd, implements the
+:class:`Collector` interface.
+"""
+
+import typing as T
+import sys
+import time
+import threading
+import contextlib
+
+#: Reading the open file, or mapping it in memory
+PHASE_READ = "read"
+#: Parsing JSON
+PHASE_PARSE = "parse"
+#: Comparing the managed MCP servers with the wanted ones in ``BaseMcpEnum``
+PHASE_PLAN = "plan"
+#: Serializing JSON, or splicing the dirty entries of a document
+PHASE_SERIALIZE = "serialize"
+#: Writing the file, including the temp file, fsync and rename of atomic writes
+PHASE_WRITE = "write"
+
+PHASES = (PHASE_READ, PHASE_PARSE, PHASE_PLAN, PHASE_SERIALIZE, PHASE_WRITE)
+
+COUNTER_BYTES_READ = "bytes_read"
+COUNTER_BYTES_WRITTEN = "bytes_written"
+#: Managed servers whose current settings were compared with the wanted ones
+COUNTER_SERVERS_COMPARED = "servers_compared"
+#: Reused plans, whose servers didn't need to be compared again
+COUNTER_PLANS_CACHED = "plans_cached"
+#: Profile switches that reused an already serialized ``mcpServers`` object
+COUNTER_FRAGMENTS_CACHED = "fragments_cached"
+#: Layer merges that reused a memoized merge of all or of the leading layers
+COUNTER_MERGES_CACHED = "merges_cached"
+#: Writes avoided because nothing changed
+COUNTER_WRITES_SKIPPED = "writes_skipped"
+
+
+class Collector:
+    """
+    Receive the measures of the instrumented code. Subclass it and override
+    both methods. They are called from any thread and must be thread safe.
+    """
+
+    def record(self, phase: str, seconds: float):  # pragma: no cover
+        """
+        Called at the end of each phase with its duration.
+        """
+
+    def count(self, name: str, value: int):  # pragma: no cover
+        """
+        Called to increment a counter.
+        """
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = round(pct / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def _get_phase_sort_key(phase: str) -> tuple[int, str]:
+    return (PHASES.index(phase) if phase in PHASES else len(PHASES), phase)
+
+
+class MetricsAggregator(Collector):
+    """
+    The built-in :class:`Collector`, keeps every duration to report
+    percentiles per phase, and the total of every counter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: dict[str, list[float]] = dict()
+        self.counters: dict[str, int] = dict()
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            durations = self.durations.get(phase)
+            if durations is None:
+                durations = self.durations[phase] = list()
+            durations.append(seconds)
+
+    def count(self, name: str, value: int):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def percentiles(
+        self,
+        phase: str,
+        pcts: T.Iterable[float] = (50, 95, 99),
+    ) -> tuple[float, ...]:
+        """
+        The percentiles of the durations of a phase, in seconds.
+        """
+        with self._lock:
+            durations = sorted(self.durations.get(phase, ()))
+        return tuple(percentile(durations, pct) for pct in pcts)
+
+    def summary(self) -> str:
+        """
+        A table of count, total, p50, p95 and p99 per phase, and the counters.
+        """
+        with self._lock:
+            durations = {
+                phase: sorted(values) for phase, values in self.durations.items()
+            }
+            counters = dict(self.counters)
+        lines = [
+            f"{'phase':<12} {'count':>7} {'total':>10} "
+            f"{'p50':>10} {'p95':>10} {'p99':>10}"
+        ]
+        # known phases in pipeline order, then the others
+        for phase in sorted(durations, key=_get_phase_sort_key):
+            values = durations[phase]
+            p50, p95, p99 = (percentile(values, pct) for pct in (50, 95, 99))
+            lines.append(
+                f"{phase:<12} {len(values):>7} "
+                f"{sum(values) * 1000:8.3f}ms "
+                f"{p50 * 1000:8.3f}ms {p95 * 1000:8.3f}ms {p99 * 1000:8.3f}ms"
+            )
+        if counters:
+            lines.append(
+                " ".join(f"{name}={value}" for name, value in sorted(counters.items()))
+            )
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self.durations.clear()
+            self.counters.clear()
+
+
+# the installed collectors, an empty tuple when instrumentation is disabled
+_collectors: tuple[Collector, ...] = ()
+_collectors_lock = threading.Lock()
+
+
+class _NoopPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NOOP_PHASE = _NoopPhase()
+
+
+class _Phase:
+    __slots__ = ("_collectors", "_name", "_start")
+
+    def __init__(self, collectors: tuple[Collector, ...], name: str):
+        self._collectors = collectors
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        for collector in self._collectors:
+            collector.record(self._name, seconds)
+
+
+def phase(name: str) -> T.ContextManager[None]:
+    """
+    Time the ``with`` block as one occurrence of a phase. A shared no-op
+    context manager is returned when instrumentation is disabled.
+    """
+    if not _collectors:
+        return _NOOP_PHASE
+    return _Phase(_collectors, name)
+
+
+def count(name: str, value: int = 1):
+    """
+    Increment a counter of every installed collector.
+    """
+    for collector in _collectors:
+        collector.count(name, value)
+
+
+@contextlib.contextmanager
+def instrument(
+    collector: T.Optional[Collector] = None,
+    print_summary: bool = False,
+) -> T.Iterator[Collector]:
+    """
+    Install a collector for the duration of the ``with`` block. Nested
+    blocks add their collector to the installed ones.
+
+    :param collector: The collector to install, a new
+        :class:`MetricsAggregator` by default.
+    :param print_summary: Print :meth:`MetricsAggregator.summary` to stderr
+        at the end of the block.
+
+    :return: The installed collector.
+    """
+    global _collectors
+
+    if collector is None:
+        collector = MetricsAggregator()
+    with _collectors_lock:
+        _collectors = _collectors + (collector,)
+    try:
+        yield collector
+    finally:
+        with _collectors_lock:
+            collectors = list(_collectors)
+            collectors.remove(collector)
+            _collectors = tuple(collectors)
+        if print_summary and isinstance(collector, MetricsAggregator):
+            print(collector.summary(), file=sys.stderr)
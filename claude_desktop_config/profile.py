@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Named MCP profiles, to switch config files between a few fixed MCP sets
+without parsing, planning and serializing them every time.
+
+The new ``mcpServers`` object of a switch only depends on the profile, on
+the current ``mcpServers`` object and on its indentation, everything else
+in the file is copied as is. So the new object is serialized once per
+distinct current object and cached. A switch then locates ``mcpServers``
+in the raw bytes, looks up its replacement, splices it in and renames the
+new file into place. The replacements between every pair of profiles, as
+written by this library, are serialized ahead of time when a profile is
+registered.
+
+Usage example:
+
+.. code-block:: python
+
+    MyMcpServers.register_profile("minimal", [MyMcpServers.filesystem])
+    MyMcpServers.register_profile("dev", [MyMcpServers.filesystem, MyMcpServers.github])
+
+    MyMcpServers.switch_profile("dev", cdc)
+"""
+
+import typing as T
+import threading
+import dataclasses
+from collections import OrderedDict
+
+from . import metrics
+from .source_map import T_DUMPS, locate_servers, parse_lazy, splice_servers
+
+if T.TYPE_CHECKING:  # pragma: no cover
+    from .impl import BaseMcpEnum
+
+
+@dataclasses.dataclass(frozen=True)
+class McpProfile:
+    """
+    A named MCP set of a :class:`~claude_desktop_config.impl.BaseMcpEnum`,
+    see :meth:`~claude_desktop_config.impl.BaseMcpEnum.register_profile`.
+
+    :param name: The name of the profile.
+    :param wanted: The names of its MCP servers.
+    """
+
+    name: str = dataclasses.field()
+    wanted: frozenset[str] = dataclasses.field()
+
+
+FRAGMENT_CACHE_SIZE = 1024
+
+T_FRAGMENT_KEY = tuple[frozenset[str], str, bytes]
+
+_MISSING = object()
+
+
+class _FragmentCache:
+    """
+    A thread safe LRU mapping of ``(wanted, indent, current mcpServers
+    bytes)`` to the new ``mcpServers`` bytes, None if nothing changes.
+    """
+
+    def __init__(self, maxsize: int = FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict[T_FRAGMENT_KEY, T.Optional[bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: T_FRAGMENT_KEY) -> T.Any:
+        with self._lock:
+            fragment = self._data.get(key, _MISSING)
+            if fragment is not _MISSING:
+                self._data.move_to_end(key)
+            return fragment
+
+    def put(self, key: T_FRAGMENT_KEY, fragment: T.Optional[bytes]):
+        with self._lock:
+            self._data[key] = fragment
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _NotSpliceable(Exception):
+    """
+    The ``mcpServers`` object of the file can't be located without a full
+    parse, the switch falls back to :meth:`BaseMcpEnum.apply`.
+    """
+
+
+def _make_fragment(
+    mcp_enum_class: T.Type["BaseMcpEnum"],
+    wanted: frozenset[str],
+    data: bytes,
+    dumps: T_DUMPS,
+) -> T.Optional[bytes]:
+    res = parse_lazy(data)
+    if res is None:
+        raise _NotSpliceable
+    servers, source = res
+    config = {"mcpServers": servers}
+    plan = mcp_enum_class._plan(wanted, config)
+    if not plan.execute(config):
+        return None
+    dirty_paths = [
+        ("mcpServers", name) for name in plan.add + plan.update + plan.remove
+    ]
+    _, new_source = splice_servers(source, data, servers, dirty_paths, dumps)
+    return new_source.text.encode("utf-8")
+
+
+def _splice_profile(
+    mcp_enum_class: T.Type["BaseMcpEnum"],
+    wanted: frozenset[str],
+    cache: _FragmentCache,
+    dumps: T_DUMPS,
+    data: bytes,
+) -> T.Optional[bytes]:
+    """
+    The new content of a config switched to the ``wanted`` MCP set, None if
+    it is already in that state.
+
+    :raises _NotSpliceable: If ``mcpServers`` can't be located.
+    """
+    res = locate_servers(data)
+    if res is None:
+        raise _NotSpliceable
+    value_start, value_end, indent = res
+    key = (wanted, indent, bytes(data[value_start:value_end]))
+    fragment = cache.get(key)
+    if fragment is _MISSING:
+        fragment = _make_fragment(mcp_enum_class, wanted, data, dumps)
+        cache.put(key, fragment)
+    elif metrics._collectors:
+        metrics.count(metrics.COUNTER_FRAGMENTS_CACHED)
+    if fragment is None:
+        return None
+    return b"".join([data[:value_start], fragment, data[value_end:]])
+
+
+def _precompute_fragments(
+    mcp_enum_class: T.Type["BaseMcpEnum"],
+    profiles: T.Iterable[McpProfile],
+    cache: _FragmentCache,
+    dumps: T_DUMPS,
+):
+    """
+    Serialize the switch to every profile from a file with no MCP server,
+    and from a file in any other profile as this library writes it.
+    """
+    profiles = list(profiles)
+    mcp_index = mcp_enum_class._get_mcp_index()
+    states = [{}]
+    for profile in profiles:
+        states.append(
+            {
+                name: mcp_enum.value.settings
+                for name, mcp_enum in mcp_index.items()
+                if name in profile.wanted
+            }
+        )
+    for servers in states:
+        data = dumps({"mcpServers": servers}).encode("utf-8")
+        for profile in profiles:
+            _splice_profile(mcp_enum_class, profile.wanted, cache, dumps, data)
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+
+"""
+A content-addressed store of config file snapshots, taken before each write.
+
+Each distinct file content is stored once, compressed with :mod:`zlib`, under
+its sha256 (a blob). The history of a config file is a small append-only
+log of ``(time, sha256)`` references to blobs. Thousands of profiles in the
+same state share one blob, taking a snapshot of a content that is already
+stored costs a hash and a one line append, and restoring any snapshot reads
+a single blob.
+
+Layout of the store directory::
+
+    blobs/ab/cdef...   # zlib compressed content, named by its sha256
+    refs/0123...       # one log per config file, named by the sha256 of its path
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import ClaudeDesktopConfig, SnapshotStore
+
+    store = SnapshotStore("/var/lib/mcp/snapshots")
+    cdc = ClaudeDesktopConfig(snapshots=store)
+    cdc.write(config)  # the previous content is saved first
+    store.restore(store.history(cdc.path)[-1])  # undo
+    store.prune(max_age=30 * 86400, max_count=20)
+"""
+
+import typing as T
+import os
+import time
+import zlib
+import hashlib
+import tempfile
+import dataclasses
+from pathlib import Path
+
+from .impl import ClaudeDesktopConfig
+
+
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    """
+    A reference to the content of a config file at some point in time.
+
+    :param path: The config file.
+    :param time_ns: When the snapshot was taken, in nanoseconds since the epoch.
+    :param sha256: The sha256 of the content, the name of its blob.
+    """
+
+    path: Path = dataclasses.field()
+    time_ns: int = dataclasses.field()
+    sha256: str = dataclasses.field()
+
+
+def _get_ref_name(path: Path) -> str:
+    return hashlib.sha256(os.fsencode(path)).hexdigest()
+
+
+def _write_synced(f: T.BinaryIO, data: bytes):
+    # a backup must be on disk before the config write it protects, which
+    # is fsynced too
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+@dataclasses.dataclass
+class SnapshotStore:
+    """
+    :param root: The directory of the store, created on first use.
+    :param compress_level: The :mod:`zlib` level of new blobs.
+
+    Taking snapshots is safe from many threads and processes, but
+    :meth:`prune` must not run while snapshots are taken, a snapshot of a
+    blob that is being pruned could lose its content.
+    """
+
+    root: Path = dataclasses.field()
+    compress_level: int = dataclasses.field(default=6)
+
+    def __post_init__(self):
+        self.root = Path(self.root)
+
+    @property
+    def dir_blobs(self) -> Path:
+        return self.root / "blobs"
+
+    @property
+    def dir_refs(self) -> Path:
+        return self.root / "refs"
+
+    def _get_blob_path(self, sha256: str) -> Path:
+        return self.dir_blobs / sha256[:2] / sha256[2:]
+
+    def _get_ref_path(self, path: Path) -> Path:
+        return self.dir_refs / _get_ref_name(path)
+
+    def _put_blob(self, sha256: str, data: bytes):
+        path = self._get_blob_path(sha256)
+        try:
+            # a compressed blob is never empty, an empty one was left by a
+            # power loss before blobs were fsynced, it is written again
+            if path.stat().st_size:
+                return
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                _write_synced(f, zlib.compress(data, self.compress_level))
+            # a concurrent writer of the same blob wrote the same content
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def read(self, snapshot: Snapshot) -> bytes:
+        """
+        The content of a snapshot.
+        """
+        return zlib.decompress(self._get_blob_path(snapshot.sha256).read_bytes())
+
+    def snapshot(
+        self,
+        path: T.Union[str, Path],
+        data: T.Optional[bytes] = None,
+    ) -> T.Optional[Snapshot]:
+        """
+        Save the current content of a config file.
+
+        Nothing is added if it is the same as the latest snapshot of the file.
+
+        :param path: The config file.
+        :param data: Its content, if it was already read.
+
+        :return: The new or latest snapshot, None if the file doesn't exist.
+        """
+        path = Path(path).absolute()
+        if data is None:
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                return None
+        sha256 = hashlib.sha256(data).hexdigest()
+        ref_path = self._get_ref_path(path)
+        latest = self._read_latest(ref_path, path)
+        if latest is not None and latest.sha256 == sha256:
+            return latest
+        self._put_blob(sha256, data)
+        snapshot = Snapshot(path=path, time_ns=time.time_ns(), sha256=sha256)
+        line = f"{snapshot.time_ns} {sha256}\n".encode("ascii")
+        if latest is None and self._create_log(ref_path, path, line):
+            return snapshot
+        # a single small append is atomic with O_APPEND
+        fd = os.open(ref_path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return snapshot
+
+    def _create_log(self, ref_path: Path, path: Path, line: bytes) -> bool:
+        """
+        Create the log of a config file, unless another process did. The
+        first line of a log is the path of the config file.
+        """
+        ref_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=ref_path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                _write_synced(f, os.fsencode(path) + b"\n" + line)
+            # unlike a rename, a link fails if the log exists, and the log
+            # never appears without its first line
+            os.link(tmp_path, ref_path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+
+    def _read_latest(self, ref_path: Path, path: Path) -> T.Optional[Snapshot]:
+        # only the end of the log is read, a line is at most 85 bytes
+        try:
+            with open(ref_path, "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - 256))
+                tail = f.read()
+        except FileNotFoundError:
+            return None
+        time_ns, sha256 = tail.splitlines()[-1].decode("ascii").split(" ")
+        return Snapshot(path=path, time_ns=int(time_ns), sha256=sha256)
+
+    def _read_log(self, ref_path: Path) -> tuple[Path, list[Snapshot]]:
+        lines = ref_path.read_bytes().splitlines()
+        path = Path(os.fsdecode(lines[0]))
+        snapshots = list()
+        for line in lines[1:]:
+            time_ns, sha256 = line.decode("ascii").split(" ")
+            snapshots.append(Snapshot(path=path, time_ns=int(time_ns), sha256=sha256))
+        return path, snapshots
+
+    def history(self, path: T.Union[str, Path]) -> list[Snapshot]:
+        """
+        The snapshots of a config file, oldest first.
+        """
+        path = Path(path).absolute()
+        try:
+            return self._read_log(self._get_ref_path(path))[1]
+        except FileNotFoundError:
+            return []
+
+    def paths(self) -> list[Path]:
+        """
+        The config files that have snapshots.
+        """
+        if not self.dir_refs.exists():
+            return []
+        return [self._read_log(ref_path)[0] for ref_path in self._iter_ref_paths()]
+
+    def _iter_ref_paths(self) -> T.Iterator[Path]:
+        # names starting with a dot are temp files
+        for ref_path in self.dir_refs.iterdir():
+            if not ref_path.name.startswith("."):
+                yield ref_path
+
+    def restore(self, snapshot: Snapshot, fsync_dir: bool = False) -> bool:
+        """
+        Atomically replace the config file with the content of a snapshot.
+        The cost doesn't depend on the number of snapshots.
+
+        :param snapshot: A snapshot from :meth:`history` or :meth:`snapshot`.
+        :param fsync_dir: See :meth:`ClaudeDesktopConfig.write`.
+
+        :return: True if the file was written, False if it already had this
+            content.
+        """
+        cdc = ClaudeDesktopConfig(path=snapshot.path)
+        written, _ = cdc._write_atomic(self.read(snapshot), fsync_dir=fsync_dir)
+        return written
+
+    def prune(
+        self,
+        max_age: T.Optional[float] = None,
+        max_count: T.Optional[int] = None,
+        now_ns: T.Optional[int] = None,
+    ) -> int:
+        """
+        Remove the snapshots older than ``max_age`` seconds, and all but the
+        ``max_count`` latest snapshots of each file. Then remove the blobs
+        that no snapshot refers to anymore.
+
+        :param now_ns: The reference time of ``max_age``, now by default.
+
+        :return: The number of removed snapshots.
+        """
+        if not self.dir_refs.exists():
+            return 0
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        min_time_ns = None if max_age is None else now_ns - int(max_age * 1e9)
+        removed = 0
+        referenced = set()
+        for ref_path in self._iter_ref_paths():
+            path, snapshots = self._read_log(ref_path)
+            kept = snapshots
+            if max_count is not None:
+                kept = kept[-max_count:] if max_count > 0 else []
+            if min_time_ns is not None:
+                kept = [s for s in kept if s.time_ns >= min_time_ns]
+            if len(kept) != len(snapshots):
+                removed += len(snapshots) - len(kept)
+                self._write_log(ref_path, path, kept)
+            referenced.update(s.sha256 for s in kept)
+        if self.dir_blobs.exists():
+            for dir_prefix in self.dir_blobs.iterdir():
+                for blob_path in dir_prefix.iterdir():
+                    name = blob_path.name
+                    if name.startswith("."):
+                        continue
+                    if dir_prefix.name + name not in referenced:
+                        blob_path.unlink()
+        return removed
+
+    def _write_log(self, ref_path: Path, path: Path, snapshots: list[Snapshot]):
+        if not snapshots:
+            ref_path.unlink()
+            return
+        lines = [os.fsencode(path)]
+        lines.extend(f"{s.time_ns} {s.sha256}".encode("ascii") for s in snapshots)
+        fd, tmp_path = tempfile.mkstemp(dir=ref_path.parent, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            _write_synced(f, b"\n".join(lines) + b"\n")
+        os.replace(tmp_path, ref_path)
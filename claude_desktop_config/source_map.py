@@ -0,0 +1,638 @@
+# -*- coding: utf-8 -*-
+
+"""
+Minimal-edit writing of config files.
+
+The config is parsed with the offsets of every top level entry and of every
+``mcpServers`` entry. When a :class:`~claude_desktop_config.document.ConfigDocument`
+is written back, only the entries it marked as dirty are serialized again,
+every other byte of the file, including the user's formatting, is copied
+through untouched. The cost of a write follows the size of the change, not
+the size of the file.
+
+A lazy read goes further: it scans the raw bytes of the file up to the end
+of ``mcpServers``, parses only that object, and keeps the byte range of
+everything else. The rest of the document is parsed on first access, and
+is copied back byte for byte when only ``mcpServers`` changed.
+
+Usage example:
+
+.. code-block:: python
+
+    from claude_desktop_config.api import ClaudeDesktopConfig, enable_mcp_server
+
+    cdc = ClaudeDesktopConfig(minimal_edit=True)
+    with cdc.session(track=True) as config:
+        enable_mcp_server(config, "github", {"command": "npx"})
+
+    cdc = ClaudeDesktopConfig(lazy=True)
+    with cdc.session(track=True) as config:
+        # only "mcpServers" is parsed
+        enable_mcp_server(config, "github", {"command": "npx"})
+"""
+
+import typing as T
+import os
+import re
+import sys
+import json
+import dataclasses
+from pathlib import Path
+
+from .document import T_PATH
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+T_DUMPS = T.Callable[[T.Any], str]
+
+
+@dataclasses.dataclass
+class EntrySpan:
+    """
+    Offsets of a ``"key": value`` entry of a JSON object.
+
+    :param start: Offset of the opening quote of the key.
+    :param value_start: Offset of the first character of the value.
+    :param end: Offset right after the last character of the value.
+    """
+
+    start: int = dataclasses.field()
+    value_start: int = dataclasses.field()
+    end: int = dataclasses.field()
+
+
+@dataclasses.dataclass
+class ObjectSpan:
+    """
+    Offsets of a JSON object and of its entries, in file order.
+
+    :param open: Offset of ``{``.
+    :param close: Offset of ``}``.
+    """
+
+    open: int = dataclasses.field()
+    close: int = dataclasses.field()
+    entries: dict[str, EntrySpan] = dataclasses.field(default_factory=dict)
+
+    def shift(self, delta: int) -> "ObjectSpan":
+        return ObjectSpan(
+            open=self.open + delta,
+            close=self.close + delta,
+            entries={
+                key: EntrySpan(
+                    span.start + delta, span.value_start + delta, span.end + delta
+                )
+                for key, span in self.entries.items()
+            },
+        )
+
+
+@dataclasses.dataclass
+class SourceMap:
+    """
+    The text of a config file and the offsets of its entries.
+
+    :param text: The decoded file content.
+    :param root: The top level object.
+    :param servers: The ``mcpServers`` object, None if there is none.
+    :param stat_key: The stat key of the file when it was read, None if
+        unknown. A splice is only valid on the exact same file content.
+    """
+
+    partial: T.ClassVar[bool] = False
+
+    text: str = dataclasses.field(repr=False)
+    root: ObjectSpan = dataclasses.field()
+    servers: T.Optional[ObjectSpan] = dataclasses.field(default=None)
+    stat_key: T.Optional[tuple[int, int, int]] = dataclasses.field(default=None)
+
+
+@dataclasses.dataclass
+class LazySourceMap:
+    """
+    The location of ``mcpServers`` in a config file that was read lazily,
+    everything around it is left unparsed.
+
+    :param path: The config file.
+    :param value_start: Byte offset of the ``mcpServers`` object.
+    :param value_end: Byte offset right after the ``mcpServers`` object.
+    :param text: The decoded ``mcpServers`` object.
+    :param servers: The offsets of its entries, relative to ``text``.
+    :param indent: The indentation of the line where ``mcpServers`` starts.
+    :param stat_key: The stat key of the file when it was read, None if
+        unknown. The unparsed bytes are read again from the file when
+        needed, and only if it still has this stat key.
+    :param data: The content of the file, if it is kept in memory.
+    """
+
+    partial: T.ClassVar[bool] = True
+
+    path: Path = dataclasses.field()
+    value_start: int = dataclasses.field()
+    value_end: int = dataclasses.field()
+    text: str = dataclasses.field(repr=False)
+    servers: ObjectSpan = dataclasses.field()
+    indent: str = dataclasses.field(default="")
+    stat_key: T.Optional[tuple[int, int, int]] = dataclasses.field(default=None)
+    data: T.Optional[bytes] = dataclasses.field(default=None, repr=False)
+
+    def read(self) -> bytes:
+        """
+        The content of the file this map was made from.
+
+        :raises ConflictError: If the file was changed since it was read.
+        """
+        if self.data is not None:
+            return self.data
+        # imported here, ``impl`` imports this module
+        from .impl import ConflictError, _get_stat_key
+
+        try:
+            with open(self.path, "rb") as f:
+                stat_key = _get_stat_key(os.fstat(f.fileno()))
+                if self.stat_key is None or stat_key == self.stat_key:
+                    return f.read()
+        except FileNotFoundError:
+            pass
+        raise ConflictError(f"{self.path} was changed since it was read")
+
+    def load(self) -> tuple[dict[str, T.Any], T.Optional[SourceMap]]:
+        """
+        Parse the whole file.
+
+        :return: The config and its :class:`SourceMap`.
+        """
+        config, source = parse_with_source_map(self.read().decode("utf-8"))
+        if source is not None:
+            source.stat_key = self.stat_key
+        return config, source
+
+
+class _Unsupported(Exception):
+    """
+    The text can't be mapped, e.g. duplicated keys, parse it the usual way.
+    """
+
+
+_scanner = None
+
+
+def _get_scanner():
+    global _scanner
+    if _scanner is None:
+        from json.scanner import make_scanner
+
+        _scanner = make_scanner(json.JSONDecoder())
+    return _scanner
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _parse_object(
+    text: str,
+    pos: int,
+    parse_value: T.Callable[[str, str, int], tuple[T.Any, int]],
+) -> tuple[dict[str, T.Any], ObjectSpan, int]:
+    """
+    Parse the object starting at ``text[pos] == "{"``, ``parse_value(key,
+    text, pos)`` parses the value of each entry.
+
+    :return: The object, its span, and the offset right after it.
+    """
+    obj = dict()
+    entries = dict()
+    i = _skip_whitespace(text, pos + 1)
+    if text[i : i + 1] == "}":
+        return obj, ObjectSpan(pos, i, entries), i + 1
+    while True:
+        if text[i : i + 1] != '"':
+            raise _Unsupported
+        key, j = json.decoder.scanstring(text, i + 1)
+        j = _skip_whitespace(text, j)
+        if text[j : j + 1] != ":":
+            raise _Unsupported
+        j = _skip_whitespace(text, j + 1)
+        value, end = parse_value(key, text, j)
+        if key in entries:
+            raise _Unsupported
+        entries[key] = EntrySpan(i, j, end)
+        obj[key] = value
+        k = _skip_whitespace(text, end)
+        c = text[k : k + 1]
+        if c == ",":
+            i = _skip_whitespace(text, k + 1)
+        elif c == "}":
+            return obj, ObjectSpan(pos, k, entries), k + 1
+        else:
+            raise _Unsupported
+
+
+def _scan_value(key: str, text: str, pos: int) -> tuple[T.Any, int]:
+    try:
+        return _get_scanner()(text, pos)
+    except StopIteration:
+        raise _Unsupported
+
+
+def parse_with_source_map(
+    text: str,
+) -> tuple[dict[str, T.Any], T.Optional[SourceMap]]:
+    """
+    Parse a config and map the offsets of its top level entries and of its
+    ``mcpServers`` entries. Values are parsed by the C scanner of :mod:`json`.
+
+    :return: The config, and its :class:`SourceMap` or None if the text
+        can't be mapped (not an object, duplicated keys, invalid JSON...).
+    """
+    servers = list()
+
+    def parse_value(key: str, text: str, pos: int) -> tuple[T.Any, int]:
+        if key == "mcpServers" and text[pos : pos + 1] == "{":
+            value, span, end = _parse_object(text, pos, _scan_value)
+            servers.append(span)
+            return value, end
+        return _scan_value(key, text, pos)
+
+    try:
+        pos = _skip_whitespace(text, 0)
+        if text[pos : pos + 1] != "{":
+            raise _Unsupported
+        config, root, end = _parse_object(text, pos, parse_value)
+        if _skip_whitespace(text, end) != len(text):
+            raise _Unsupported
+    except (_Unsupported, ValueError, IndexError):
+        # let ``json`` parse it, or raise the usual error
+        return json.loads(text), None
+    return config, SourceMap(
+        text=text,
+        root=root,
+        servers=servers[-1] if servers else None,
+    )
+
+
+_WHITESPACE_BYTES = re.compile(rb"[ \t\n\r]*")
+_STRING_BYTES = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# an escaped ASCII letter, e.g. ``"\u006dcpServers"``
+_ESCAPED_LETTER_BYTES = re.compile(rb"\\u00[4-7]")
+
+#: Values nested deeper than this are not skipped, the file is parsed in full
+SKIP_MAX_DEPTH = 16
+
+_skip_value = None
+
+
+def _get_skip_value() -> T.Callable[[bytes, int], T.Optional[re.Match]]:
+    """
+    A regex that matches one JSON value without parsing it. Strings are
+    matched as a whole, so brackets in strings are ignored, and containers
+    are matched up to :data:`SKIP_MAX_DEPTH` levels. The value is not
+    validated, that happens when it is parsed.
+    """
+    global _skip_value
+    if _skip_value is None:
+        # possessive quantifiers never backtrack, about twice as fast
+        q = b"*+" if sys.version_info >= (3, 11) else b"*"
+        other = rb'[^\[\]{}"]' + q
+        string = rb'"[^"\\]' + q + rb'(?:\\.[^"\\]' + q + b")" + q + b'"'
+        container = None
+        for _ in range(SKIP_MAX_DEPTH):
+            item = string if container is None else string + b"|" + container
+            body = other + b"(?:(?:" + item + b")" + other + b")" + q
+            container = rb"[\[{]" + body + rb"[\]}]"
+        scalar = rb'[^\[\]{}",\s]+'
+        _skip_value = re.compile(
+            b"(?:" + container + b"|" + string + b"|" + scalar + b")"
+        ).match
+    return _skip_value
+
+
+def locate_servers(data: bytes) -> T.Optional[tuple[int, int, str]]:
+    """
+    Find the top level ``mcpServers`` object of a config without parsing
+    anything. The entries before it are skipped with :func:`_get_skip_value`,
+    the entries after it are not scanned at all, a single substring search
+    makes sure ``mcpServers`` is not repeated there. ``data`` can be any
+    buffer, e.g. a :mod:`mmap`.
+
+    :return: The byte offsets of the object and right after it, and the
+        indentation of the line where ``mcpServers`` starts. None if the file
+        must be parsed in full, e.g. there is no ``mcpServers`` object at the
+        top level.
+    """
+    skip = _get_skip_value()
+    ws = _WHITESPACE_BYTES.match
+    pos = ws(data, 0).end()
+    if data[pos : pos + 1] != b"{":
+        return None
+    pos = ws(data, pos + 1).end()
+    while True:
+        match = _STRING_BYTES.match(data, pos)
+        if match is None:
+            return None
+        key_start = pos
+        key = json.loads(match.group(0))
+        pos = ws(data, match.end()).end()
+        if data[pos : pos + 1] != b":":
+            return None
+        pos = ws(data, pos + 1).end()
+        if key == "mcpServers":
+            break
+        match = skip(data, pos)
+        if match is None:
+            return None
+        pos = ws(data, match.end()).end()
+        if data[pos : pos + 1] != b",":
+            # end of the document, no "mcpServers"
+            return None
+        pos = ws(data, pos + 1).end()
+
+    value_start = pos
+    if data[pos : pos + 1] != b"{":
+        return None
+    match = skip(data, pos)
+    if match is None:
+        return None
+    value_end = match.end()
+
+    # the closing brace of the document is its last non whitespace byte
+    close = len(data) - 1
+    while close > value_end and data[close] in b" \t\n\r":
+        close -= 1
+    pos = ws(data, value_end).end()
+    if pos == close:
+        if data[close] != ord("}"):
+            return None
+    elif data[pos : pos + 1] != b"," or data[close] != ord("}"):
+        return None
+    elif data.find(b'"mcpServers"', pos) != -1:
+        # maybe a duplicated key, the last one would win
+        return None
+    elif (
+        # a single byte search is much faster than the regex
+        data.find(b"\\", pos) != -1
+        and _ESCAPED_LETTER_BYTES.search(data, pos) is not None
+    ):
+        # maybe a duplicated key written with escapes
+        return None
+
+    line_start = data.rfind(b"\n", 0, key_start) + 1
+    indent = ws(data, line_start, key_start).group(0).decode("ascii")
+    return value_start, value_end, indent
+
+
+def parse_lazy(data: bytes) -> T.Optional[tuple[dict[str, T.Any], LazySourceMap]]:
+    """
+    Parse only the ``mcpServers`` object of a config, found with
+    :func:`locate_servers`.
+
+    :return: The ``mcpServers`` object and its :class:`LazySourceMap` whose
+        ``path`` is not set yet, or None if the file must be parsed in full,
+        e.g. there is no ``mcpServers`` object at the top level.
+    """
+    res = locate_servers(data)
+    if res is None:
+        return None
+    value_start, value_end, indent = res
+    try:
+        text = data[value_start:value_end].decode("utf-8")
+        servers, span, end = _parse_object(text, 0, _scan_value)
+    except (_Unsupported, ValueError, IndexError):
+        return None
+    if end != len(text):
+        return None
+    return servers, LazySourceMap(
+        path=None,
+        value_start=value_start,
+        value_end=value_end,
+        text=text,
+        servers=span,
+        indent=indent,
+    )
+
+
+def _indent_of(text: str, pos: int) -> str:
+    """
+    The whitespace between the start of the line and ``pos``.
+    """
+    line_start = text.rfind("\n", 0, pos) + 1
+    return _WHITESPACE.match(text, line_start, pos).group(0)
+
+
+class _Builder:
+    """
+    Concatenate pieces of text and track the offset of the end.
+    """
+
+    def __init__(self):
+        self.parts: list[str] = list()
+        self.pos = 0
+
+    def add(self, s: str):
+        self.parts.append(s)
+        self.pos += len(s)
+
+    def emit_object(
+        self,
+        text: str,
+        span: ObjectSpan,
+        obj: dict[str, T.Any],
+        dirty_keys: T.Container[str],
+        indent: str,
+        dumps: T_DUMPS,
+        emit_nested: T.Optional[T.Callable[[str, EntrySpan, str], bool]] = None,
+    ) -> ObjectSpan:
+        """
+        Write ``obj``, copying the original text of the entries that are not
+        dirty and reusing the original whitespace between entries.
+
+        :param indent: The indentation of the line where the object starts.
+        :param emit_nested: Called for dirty entries that exist in the
+            original text, may write the value itself and return True.
+        """
+        old_entries = list(span.entries.values())
+        if old_entries:
+            first, last = old_entries[0], old_entries[-1]
+            lead = text[span.open + 1 : first.start]
+            trail = text[last.end : span.close]
+            if len(old_entries) >= 2:
+                sep = text[first.end : old_entries[1].start]
+            else:
+                sep = "," + lead
+            child_indent = _indent_of(text, first.start) if "\n" in lead else ""
+        else:
+            child_indent = indent + "    "
+            lead = "\n" + child_indent
+            sep = ",\n" + child_indent
+            trail = "\n" + indent
+
+        new_span = ObjectSpan(open=self.pos, close=-1)
+        self.add("{")
+        if obj:
+            self.add(lead)
+        elif not old_entries:
+            # keep an empty object as it was, e.g. ``{ }``
+            self.add(text[span.open + 1 : span.close])
+        for n, (key, value) in enumerate(obj.items()):
+            if n:
+                self.add(sep)
+            start = self.pos
+            old = span.entries.get(key)
+            if old is not None and key not in dirty_keys:
+                self.add(text[old.start : old.end])
+                value_start = start + old.value_start - old.start
+            elif old is not None and emit_nested is not None:
+                self.add(text[old.start : old.value_start])
+                value_start = self.pos
+                if not emit_nested(key, old, child_indent):
+                    self.add(dumps(value).replace("\n", "\n" + child_indent))
+            else:
+                self.add(json.dumps(key))
+                self.add(": ")
+                value_start = self.pos
+                self.add(dumps(value).replace("\n", "\n" + child_indent))
+            new_span.entries[key] = EntrySpan(start, value_start, self.pos)
+        if obj:
+            self.add(trail)
+        new_span.close = self.pos
+        self.add("}")
+        return new_span
+
+
+def splice(
+    source: SourceMap,
+    config: dict[str, T.Any],
+    dirty_paths: T.Iterable[T_PATH],
+    dumps: T_DUMPS,
+) -> T.Optional[tuple[str, SourceMap]]:
+    """
+    Produce the new text of a config whose original text is ``source.text``,
+    serializing only the entries under ``dirty_paths`` with ``dumps``.
+
+    :param dumps: Serialize a value with 4 spaces indentation, as
+        ``json.dumps(value, indent=4)``.
+
+    :return: The new text and its source map, or None if a minimal edit is
+        not possible, e.g. the whole document was replaced.
+    """
+    dirty_keys = set()
+    dirty_servers = set()
+    servers_replaced = False
+    for path in dirty_paths:
+        if not path:
+            return None
+        dirty_keys.add(path[0])
+        if path[0] == "mcpServers":
+            if len(path) == 1:
+                servers_replaced = True
+            else:
+                dirty_servers.add(path[1])
+
+    text = source.text
+    builder = _Builder()
+    builder.add(text[: source.root.open])
+    new_servers = list()
+
+    def emit_nested(key: str, old: EntrySpan, indent: str) -> bool:
+        value = config[key]
+        if (
+            key != "mcpServers"
+            or servers_replaced
+            or source.servers is None
+            or not isinstance(value, dict)
+        ):
+            return False
+        span = builder.emit_object(
+            text, source.servers, value, dirty_servers, indent, dumps
+        )
+        new_servers.append(span)
+        return True
+
+    root = builder.emit_object(
+        text,
+        source.root,
+        config,
+        dirty_keys,
+        "",
+        dumps,
+        emit_nested=emit_nested,
+    )
+    builder.add(text[source.root.close + 1 :])
+
+    if new_servers:
+        servers = new_servers[0]
+    elif (
+        source.servers is not None
+        and "mcpServers" in root.entries
+        and "mcpServers" not in dirty_keys
+    ):
+        # copied as is, only moved
+        delta = root.entries["mcpServers"].value_start - source.servers.open
+        servers = source.servers.shift(delta)
+    else:
+        servers = None
+    new_text = "".join(builder.parts)
+    if servers is None and isinstance(config.get("mcpServers"), dict):
+        # serialized in full, map it so the next write can splice entries,
+        # it costs about as much as serializing it did
+        value_start = root.entries["mcpServers"].value_start
+        _, servers, _ = _parse_object(new_text, value_start, _scan_value)
+    return new_text, SourceMap(text=new_text, root=root, servers=servers)
+
+
+class _All:
+    """
+    Contains everything.
+    """
+
+    def __contains__(self, item) -> bool:
+        return True
+
+
+def splice_servers(
+    source: LazySourceMap,
+    data: bytes,
+    servers: T.Any,
+    dirty_paths: T.Iterable[T_PATH],
+    dumps: T_DUMPS,
+) -> T.Optional[tuple[bytes, LazySourceMap]]:
+    """
+    Produce the new content of a lazily read config whose original content
+    is ``data``, when only ``mcpServers`` changed. Every byte outside of the
+    ``mcpServers`` object is copied as is.
+
+    :param servers: The new ``mcpServers`` object.
+    :param dumps: See :func:`splice`.
+
+    :return: The new content and its :class:`LazySourceMap`, or None if
+        something else than ``mcpServers`` changed.
+    """
+    if not isinstance(servers, dict):
+        return None
+    dirty_servers = set()
+    for path in dirty_paths:
+        if not path or path[0] != "mcpServers":
+            return None
+        elif len(path) == 1:
+            dirty_servers = _All()
+            break
+        dirty_servers.add(path[1])
+
+    builder = _Builder()
+    span = builder.emit_object(
+        source.text, source.servers, servers, dirty_servers, source.indent, dumps
+    )
+    text = "".join(builder.parts)
+    value = text.encode("utf-8")
+    new_data = b"".join(
+        [data[: source.value_start], value, data[source.value_end :]]
+    )
+    return new_data, LazySourceMap(
+        path=source.path,
+        value_start=source.value_start,
+        value_end=source.value_start + len(value),
+        text=text,
+        servers=span,
+        indent=source.indent,
+    )
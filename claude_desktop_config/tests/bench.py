@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tiny benchmark harness used by the load tests in ``tests_load``.
+
+It measures per call latency percentiles, throughput and peak memory,
+writes the results as JSON, and compares them with a stored baseline.
+"""
+
+import typing as T
+import gc
+import json
+import time
+import statistics
+import tracemalloc
+import dataclasses
+from pathlib import Path
+
+from ..metrics import percentile
+
+
+@dataclasses.dataclass
+class BenchResult:
+    """
+    :param name: Unique benchmark name, used as the key in the baseline.
+    :param repeat: Number of timed calls.
+    :param ops_per_call: Number of operations done by one call, e.g. files
+        processed, used to compute the throughput.
+    :param bytes_per_call: Number of bytes processed by one call, if relevant.
+    """
+
+    name: str = dataclasses.field()
+    repeat: int = dataclasses.field()
+    ops_per_call: int = dataclasses.field()
+    bytes_per_call: int = dataclasses.field()
+    mean: float = dataclasses.field()
+    p50: float = dataclasses.field()
+    p95: float = dataclasses.field()
+    p99: float = dataclasses.field()
+    ops_per_sec: float = dataclasses.field()
+    mb_per_sec: float = dataclasses.field()
+    peak_memory: int = dataclasses.field()
+
+    def to_dict(self) -> dict[str, T.Any]:
+        return dataclasses.asdict(self)
+
+    def summary(self) -> str:
+        return (
+            f"{self.name:<48} "
+            f"p50={self.p50 * 1000:10.3f}ms "
+            f"p95={self.p95 * 1000:10.3f}ms "
+            f"p99={self.p99 * 1000:10.3f}ms "
+            f"{self.ops_per_sec:12.1f} ops/s "
+            f"{self.mb_per_sec:9.1f} MB/s "
+            f"peak={self.peak_memory / 1_000_000:8.2f}MB"
+        )
+
+
+def run_bench(
+    name: str,
+    func: T.Callable[[], T.Any],
+    repeat: int = 10,
+    warmup: int = 1,
+    ops_per_call: int = 1,
+    bytes_per_call: int = 0,
+    setup: T.Optional[T.Callable[[], T.Any]] = None,
+) -> BenchResult:
+    """
+    Call ``func`` ``repeat`` times and measure it.
+
+    The peak memory is measured with :mod:`tracemalloc` on one extra call,
+    so the tracing overhead doesn't affect the timings.
+
+    :param setup: Optional function called before every call, not timed.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+
+    latencies = list()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    mean = statistics.mean(latencies)
+    return BenchResult(
+        name=name,
+        repeat=repeat,
+        ops_per_call=ops_per_call,
+        bytes_per_call=bytes_per_call,
+        mean=mean,
+        p50=percentile(latencies, 50),
+        p95=percentile(latencies, 95),
+        p99=percentile(latencies, 99),
+        ops_per_sec=(ops_per_call * repeat / total) if total else 0.0,
+        mb_per_sec=(bytes_per_call * repeat / total / 1_000_000) if total else 0.0,
+        peak_memory=peak_memory,
+    )
+
+
+@dataclasses.dataclass
+class Regression:
+    name: str = dataclasses.field()
+    metric: str = dataclasses.field()
+    baseline: float = dataclasses.field()
+    current: float = dataclasses.field()
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.metric} {self.current:.6g} "
+            f"vs baseline {self.baseline:.6g} "
+            f"(+{(self.current / self.baseline - 1) * 100:.0f}%)"
+        )
+
+
+@dataclasses.dataclass
+class BenchReport:
+    """
+    Collect :class:`BenchResult` of a load test run.
+    """
+
+    results: dict[str, BenchResult] = dataclasses.field(default_factory=dict)
+
+    def add(self, result: BenchResult) -> BenchResult:
+        self.results[result.name] = result
+        return result
+
+    def to_dict(self) -> dict[str, T.Any]:
+        return {name: res.to_dict() for name, res in sorted(self.results.items())}
+
+    def dump(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=4))
+
+    def compare(
+        self,
+        baseline: dict[str, dict[str, T.Any]],
+        tolerance: float = 0.5,
+        metrics: T.Iterable[str] = ("p50", "peak_memory"),
+    ) -> list[Regression]:
+        """
+        Compare with a baseline loaded from a previous :meth:`dump`.
+
+        A metric regresses when it is more than ``tolerance`` (0.5 = 50%)
+        above the baseline. Benchmarks missing from either side are ignored.
+        """
+        regressions = list()
+        for name, res in sorted(self.results.items()):
+            if name not in baseline:
+                continue
+            for metric in metrics:
+                old = baseline[name][metric]
+                new = getattr(res, metric)
+                if old > 0 and new > old * (1 + tolerance):
+                    regressions.append(
+                        Regression(name=name, metric=metric, baseline=old, current=new)
+                    )
+        return regressions
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import typing as T
+import json
+from pathlib import Path
+
 from ..paths import dir_project_root, dir_htmlcov
 from ..vendor.pytest_cov_helper import (
     run_unit_test as _run_unit_test,
@@ -30,3 +34,22 @@ def run_cov_test(
         preview=preview,
         is_folder=is_folder,
     )
+
+
+def make_configs(
+    dir_root: Path,
+    n: int,
+    as_str: bool = False,
+) -> list[T.Union[Path, str]]:
+    """
+    Create ``n`` empty config files, one per fake user home in ``dir_root``.
+
+    :param as_str: Return the paths as ``str`` instead of ``Path``.
+    """
+    paths = list()
+    for i in range(n):
+        path = dir_root / f"user_{i}" / "claude_desktop_config.json"
+        path.parent.mkdir(parents=True)
+        path.write_text(json.dumps({}, indent=4))
+        paths.append(str(path) if as_str else path)
+    return paths
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+"""
+A long-running watcher that re-applies the desired MCP state to config files
+that drifted, e.g. because a user or another tool edited them by hand.
+
+On Linux it subscribes to ``inotify`` events of the parent directories (via
+:mod:`ctypes`, no extra dependency), so it sleeps in ``select`` and uses no
+CPU while nothing changes. Elsewhere it falls back to polling ``stat``.
+
+Usage example:
+
+.. code-block:: python
+
+    import threading
+    from claude_desktop_config.api import McpDriftWatcher
+
+    watcher = McpDriftWatcher(
+        mcp_enum_class=MyMcpServers,
+        wanted_mcps=[MyMcpServers.filesystem, MyMcpServers.github],
+        cdcs=list_of_config_paths,
+    )
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    ...
+    watcher.stop()
+"""
+
+import typing as T
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import dataclasses
+
+from .impl import BaseMcpEnum, _get_stat_key
+from .batch import ApplyResult, T_CDC_LIKE, _to_cdc, _apply_one
+
+BACKEND_AUTO = "auto"
+BACKEND_INOTIFY = "inotify"
+BACKEND_POLL = "poll"
+
+
+def _stat_key_or_none(path: str):
+    try:
+        return _get_stat_key(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+class PollingBackend:
+    """
+    Detect changes by comparing ``(st_mtime_ns, st_size, st_ino)`` of every
+    watched file every ``interval`` seconds.
+    """
+
+    def __init__(self, paths: T.Iterable[str], interval: float = 2.0):
+        self.interval = interval
+        self._stat_keys = {path: _stat_key_or_none(path) for path in paths}
+        self._interrupted = threading.Event()
+
+    def wait(self, timeout: T.Optional[float] = None) -> set[str]:
+        """
+        Block until at least one file changed or ``timeout`` seconds passed,
+        return the changed paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            interval = self.interval
+            if deadline is not None:
+                interval = max(0.0, min(interval, deadline - time.monotonic()))
+            if self._interrupted.wait(interval):
+                self._interrupted.clear()
+                return set()
+            changed = set()
+            for path, stat_key in self._stat_keys.items():
+                new_stat_key = _stat_key_or_none(path)
+                if new_stat_key != stat_key:
+                    self._stat_keys[path] = new_stat_key
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+
+    def interrupt(self):
+        """
+        Make a blocking :meth:`wait` return now, thread safe.
+        """
+        self._interrupted.set()
+
+    def close(self):
+        pass
+
+
+# see ``man 7 inotify``
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+# the flags of ``inotify_init1`` are the ``open`` ones, missing on Windows
+IN_NONBLOCK = getattr(os, "O_NONBLOCK", 0)
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+
+
+class InotifyBackend:
+    """
+    Detect changes with Linux ``inotify``. One watch is added per parent
+    directory, so atomic rename-into-place writes are seen as well.
+    All parent directories must exist.
+    """
+
+    def __init__(self, paths: T.Iterable[str]):
+        if not sys.platform.startswith("linux"):  # pragma: no cover
+            raise OSError("inotify is only available on Linux")
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:  # pragma: no cover
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+
+        self._paths = set(paths)
+        # watch descriptor -> directory, directory -> {file name: path}
+        self._wd_to_dir: dict[int, str] = dict()
+        self._dir_to_names: dict[str, dict[str, str]] = dict()
+        try:
+            for path in self._paths:
+                dirname, basename = os.path.split(path)
+                self._dir_to_names.setdefault(dirname, dict())[basename] = path
+            for dirname in self._dir_to_names:
+                wd = libc.inotify_add_watch(
+                    self._fd, os.fsencode(dirname), _WATCH_MASK
+                )
+                if wd < 0:
+                    e = ctypes.get_errno()
+                    raise OSError(e, os.strerror(e), dirname)
+                self._wd_to_dir[wd] = dirname
+        except BaseException:
+            self.close()
+            raise
+
+    def wait(self, timeout: T.Optional[float] = None) -> set[str]:
+        """
+        Block until at least one file changed or ``timeout`` seconds passed,
+        return the changed paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select(
+                [self._fd, self._wakeup_r], [], [], remaining
+            )
+            if self._wakeup_r in readable:
+                try:
+                    while os.read(self._wakeup_r, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                return set()
+            if not readable:
+                return set()
+            changed = self._read_events()
+            if changed:
+                return changed
+
+    def _read_events(self) -> set[str]:
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise  # pragma: no cover
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:  # pragma: no cover
+                    changed.update(self._paths)
+                    continue
+                names = self._dir_to_names.get(self._wd_to_dir.get(wd))
+                if names:
+                    path = names.get(os.fsdecode(name))
+                    if path is not None:
+                        changed.add(path)
+        return changed
+
+    def interrupt(self):
+        """
+        Make a blocking :meth:`wait` return now, thread safe.
+        """
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except OSError:  # pragma: no cover
+            pass
+
+    def close(self):
+        for fd in (self._fd, self._wakeup_r, self._wakeup_w):
+            try:
+                os.close(fd)
+            except OSError:  # pragma: no cover
+                pass
+
+
+@dataclasses.dataclass
+class McpDriftWatcher:
+    """
+    Watch many config files and re-apply the wanted MCP set to those that
+    drifted.
+
+    Bursts of events are debounced, and only files whose
+    ``(st_mtime_ns, st_size, st_ino)`` differs from the state the watcher
+    last saw are re-applied, so the watcher never reacts to its own writes.
+
+    :param mcp_enum_class: The :class:`~claude_desktop_config.impl.BaseMcpEnum`
+        subclass that defines all managed MCP servers.
+    :param wanted_mcps: The MCPs that should be enabled on every file.
+    :param cdcs: Config file paths or ``ClaudeDesktopConfig`` objects to watch.
+    :param debounce: Wait until no new event arrived for this many seconds
+        before re-applying.
+    :param max_delay: Re-apply at the latest this many seconds after the
+        first event, even if events keep coming.
+    :param poll_interval: Seconds between two scans of the polling backend.
+    :param backend: ``"inotify"``, ``"poll"``, or ``"auto"`` to use inotify
+        when available and polling otherwise.
+    :param on_result: Optional callback called with the
+        :class:`~claude_desktop_config.batch.ApplyResult` of every re-apply.
+    """
+
+    mcp_enum_class: T.Type[BaseMcpEnum] = dataclasses.field()
+    wanted_mcps: T.Iterable[BaseMcpEnum] = dataclasses.field()
+    cdcs: T.Iterable[T_CDC_LIKE] = dataclasses.field()
+    debounce: float = dataclasses.field(default=0.5)
+    max_delay: float = dataclasses.field(default=5.0)
+    poll_interval: float = dataclasses.field(default=2.0)
+    backend: str = dataclasses.field(default=BACKEND_AUTO)
+    on_result: T.Optional[T.Callable[[ApplyResult], T.Any]] = dataclasses.field(
+        default=None
+    )
+
+    def __post_init__(self):
+        self.wanted_mcps = frozenset(self.wanted_mcps)
+        self._cdcs = dict()
+        for cdc in self.cdcs:
+            cdc = _to_cdc(cdc)
+            self._cdcs[os.path.abspath(cdc.path)] = cdc
+        # path -> the stat key of the file the last time we reconciled it
+        self._last_seen: dict[str, T.Any] = dict()
+        self._stop = threading.Event()
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def paths(self) -> list[str]:
+        return list(self._cdcs)
+
+    def _make_backend(self):
+        if self.backend in (BACKEND_AUTO, BACKEND_INOTIFY):
+            try:
+                return InotifyBackend(self._cdcs)
+            except (OSError, AttributeError):
+                if self.backend == BACKEND_INOTIFY:
+                    raise
+        elif self.backend != BACKEND_POLL:
+            raise ValueError(f"unknown backend {self.backend!r}")
+        return PollingBackend(self._cdcs, interval=self.poll_interval)
+
+    def reconcile(self, paths: T.Optional[T.Iterable[str]] = None) -> list[ApplyResult]:
+        """
+        Re-apply the wanted MCP set to the given paths (default all watched
+        paths) whose stat key changed since the last reconcile.
+
+        :return: The :class:`~claude_desktop_config.batch.ApplyResult` of
+            every file that was actually re-applied.
+        """
+        paths = self._cdcs if paths is None else paths
+        results = list()
+        with self._lock:
+            for path in paths:
+                stat_key = _stat_key_or_none(path)
+                if path in self._last_seen and self._last_seen[path] == stat_key:
+                    continue
+                cdc = self._cdcs[path]
+                res = _apply_one((self.mcp_enum_class, self.wanted_mcps, cdc))
+                # record the file we wrote so its event is ignored, not a stat
+                # after the write, it could be the edit of someone else
+                self._last_seen[path] = res.stat_key if res.changed else stat_key
+                results.append(res)
+                if self.on_result is not None:
+                    self.on_result(res)
+        return results
+
+    def run(self, reconcile_on_start: bool = True):
+        """
+        Watch until :meth:`stop` is called. Blocking, run it in a thread if
+        needed.
+
+        :param reconcile_on_start: Apply the wanted MCP set to every watched
+            file before watching.
+        """
+        backend = self._make_backend()
+        self._backend = backend
+        try:
+            if reconcile_on_start:
+                self.reconcile()
+            while not self._stop.is_set():
+                changed = backend.wait(None)
+                if not changed:
+                    continue
+                first_event = time.monotonic()
+                deadline = first_event + self.debounce
+                while not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    more = backend.wait(remaining)
+                    if more:
+                        changed |= more
+                        deadline = min(
+                            time.monotonic() + self.debounce,
+                            first_event + self.max_delay,
+                        )
+                if self._stop.is_set():
+                    break
+                self.reconcile(changed)
+        finally:
+            self._backend = None
+            backend.close()
+
+    def stop(self):
+        """
+        Stop a running :meth:`run`, thread safe.
+        """
+        self._stop.set()
+        backend = self._backend
+        if backend is not None:
+            backend.interrupt()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.aio import AsyncClaudeDesktopConfig
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+    mcp_2 = Mcp(name="mcp_2", settings={"command": "npx", "args": ["mcp2"]})
+
+
+def make_acdc(tmp_path, **kwargs) -> AsyncClaudeDesktopConfig:
+    path = tmp_path / "claude_desktop_config.json"
+    path.write_text(json.dumps({"mcpServers": {}, "theme": "dark"}, indent=4))
+    return AsyncClaudeDesktopConfig(cdc=ClaudeDesktopConfig(path=path), **kwargs)
+
+
+class TestAsyncClaudeDesktopConfig:
+    def test_read_write(self, tmp_path):
+        acdc = make_acdc(tmp_path)
+        assert acdc.path == tmp_path / "claude_desktop_config.json"
+
+        async def main():
+            config = await acdc.read()
+            config["theme"] = "light"
+            assert await acdc.write(config, atomic=True) is True
+            assert await acdc.write(config, atomic=True) is False
+            doc = await acdc.read(track=True)
+            assert doc.dirty is False
+            return doc
+
+        doc = asyncio.run(main())
+        assert doc["theme"] == "light"
+
+    def test_update(self, tmp_path):
+        acdc = make_acdc(tmp_path)
+
+        def mutate(config):
+            config["mcpServers"]["github"] = {"command": "npx"}
+
+        async def main():
+            assert await acdc.update(mutate) is True
+            assert await acdc.update(mutate) is False
+
+        asyncio.run(main())
+        assert acdc.cdc.read()["mcpServers"] == {"github": {"command": "npx"}}
+
+    def test_session(self, tmp_path):
+        acdc = make_acdc(tmp_path)
+        path = acdc.path
+
+        async def main():
+            async with acdc.session() as config:
+                config["theme"] = "light"
+            assert acdc.cdc.read()["theme"] == "light"
+
+            mtime = path.stat().st_mtime_ns
+            async with acdc.session() as config:
+                pass
+            async with acdc.session(track=True) as doc:
+                _ = doc["theme"]
+            assert path.stat().st_mtime_ns == mtime
+
+            async with acdc.session(track=True) as doc:
+                doc["theme"] = "dark"
+            assert acdc.cdc.read()["theme"] == "dark"
+
+        asyncio.run(main())
+
+    def test_executor(self, tmp_path):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            acdc = make_acdc(tmp_path, executor=executor)
+            config = asyncio.run(acdc.read())
+        assert config["theme"] == "dark"
+
+
+class TestApplyAsync:
+    def test(self, tmp_path):
+        cdc = make_acdc(tmp_path).cdc
+
+        async def main():
+            return [
+                await McpEnum.apply_async([McpEnum.mcp_1], cdc),
+                await McpEnum.apply_async(iter([McpEnum.mcp_1]), cdc),
+            ]
+
+        assert asyncio.run(main()) == [True, False]
+        assert list(cdc.read()["mcpServers"]) == ["mcp_1"]
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.aio",
+        preview=False,
+    )
@@ -1,15 +1,113 @@
 # -*- coding: utf-8 -*-
 
+import sys
+import subprocess
+
 from claude_desktop_config import api
 
+# import time budget in microseconds, measured with ``python -X importtime``
+IMPORT_TIME_BUDGET_TOTAL = 200_000
+IMPORT_TIME_BUDGET_OWN = 50_000
+# modules that are slow to import and must only be imported on first use
+LAZY_MODULES = ["multiprocessing", "concurrent.futures", "orjson", "asyncio"]
+
 
 def test():
     _ = api
+    _ = api.fingerprint_settings
     _ = api.enable_mcp_server
     _ = api.disable_mcp_server
+    _ = api.McpChangeSet
+    _ = api.apply_mcp_changes
+    _ = api.SettingsChange
+    _ = api.diff_settings
+    _ = api.McpPlan
+    _ = api.ConflictError
+    _ = api.ReadCache
     _ = api.ClaudeDesktopConfig
+    _ = api.FrozenDict
+    _ = api.FrozenList
+    _ = api.freeze_json
     _ = api.Mcp
     _ = api.BaseMcpEnum
+    _ = api.JsonCodec
+    _ = api.StdlibJsonCodec
+    _ = api.OrjsonCodec
+    _ = api.ConfigDocument
+    _ = api.SourceMap
+    _ = api.parse_with_source_map
+    _ = api.LazySourceMap
+    _ = api.parse_lazy
+    _ = api.ApplyResult
+    _ = api.apply_many
+    _ = api.apply_many_async
+    _ = api.resume_many
+    _ = api.McpDriftWatcher
+    _ = api.DiscoveryCache
+    _ = api.discover_claude_desktop_configs
+    _ = api.Collector
+    _ = api.MetricsAggregator
+    _ = api.instrument
+    _ = api.Snapshot
+    _ = api.SnapshotStore
+    _ = api.AsyncClaudeDesktopConfig
+    _ = api.JournalEntry
+    _ = api.JournalState
+    _ = api.Journal
+    _ = api.McpProfile
+    _ = api.Layer
+    _ = api.MergedLayers
+    _ = api.merge_layers
+
+
+def _measure_import_time() -> tuple[int, int]:
+    code = "; ".join(
+        [
+            "import sys",
+            "import claude_desktop_config.api",
+            f"print([m for m in {LAZY_MODULES!r} if m in sys.modules])",
+        ]
+    )
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert res.stdout.strip() == "[]"
+
+    total = None
+    own = 0
+    for line in res.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        if not self_time.strip().isdigit():
+            continue
+        name = name.strip()
+        if name.startswith("claude_desktop_config"):
+            own += int(self_time)
+        if name == "claude_desktop_config.api":
+            total = int(cumulative)
+    assert total is not None
+    return total, own
+
+
+def test_import_without_posix_flags():
+    # e.g. on Windows, the os module has no O_NONBLOCK and no O_CLOEXEC
+    code = (
+        "import os; del os.O_NONBLOCK; del os.O_CLOEXEC; "
+        "import claude_desktop_config.api"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_import_time():
+    # best of 3 runs, a single run is too noisy on a busy machine
+    measures = [_measure_import_time() for _ in range(3)]
+    assert min(total for total, _ in measures) < IMPORT_TIME_BUDGET_TOTAL
+    assert min(own for _, own in measures) < IMPORT_TIME_BUDGET_OWN
 
 
 if __name__ == "__main__":
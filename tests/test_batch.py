@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from claude_desktop_config.tests.helper import make_configs
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.batch import (
+    ApplyResult,
+    apply_many,
+    apply_many_async,
+    STATUS_CHANGED,
+    STATUS_UNCHANGED,
+    STATUS_ERROR,
+)
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(
+        name="mcp_1",
+        settings={"command": "npx", "args": ["-y", "mcp-remote", "https://mcp1"]},
+    )
+    mcp_2 = Mcp(
+        name="mcp_2",
+        settings={"command": "npx", "args": ["-y", "mcp-remote", "https://mcp2"]},
+    )
+
+
+class TestApplyResult:
+    def test_status(self):
+        assert ApplyResult(path=Path("a"), changed=True).status == STATUS_CHANGED
+        assert ApplyResult(path=Path("a")).status == STATUS_UNCHANGED
+        assert (
+            ApplyResult(path=Path("a"), error=ValueError()).status == STATUS_ERROR
+        )
+
+
+class TestApplyMany:
+    def test_thread_pool(self, tmp_path):
+        paths = make_configs(tmp_path, 5)
+        results = apply_many(McpEnum, [McpEnum.mcp_1], paths, max_workers=3)
+        assert [res.path for res in results] == paths
+        assert all(res.status == STATUS_CHANGED for res in results)
+        for path in paths:
+            config = ClaudeDesktopConfig(path=path).read()
+            assert list(config["mcpServers"]) == ["mcp_1"]
+
+        # second run is a no-op
+        results = apply_many(McpEnum, [McpEnum.mcp_1], paths, max_workers=3)
+        assert all(res.status == STATUS_UNCHANGED for res in results)
+
+    def test_bad_file_does_not_abort_batch(self, tmp_path):
+        paths = make_configs(tmp_path, 3)
+        paths[1].write_text("{not json")
+        missing = tmp_path / "missing" / "claude_desktop_config.json"
+        cdcs = [ClaudeDesktopConfig(path=p) for p in paths] + [missing]
+        results = apply_many(McpEnum, {McpEnum.mcp_2}, cdcs)
+        assert [res.status for res in results] == [
+            STATUS_CHANGED,
+            STATUS_ERROR,
+            STATUS_CHANGED,
+            STATUS_ERROR,
+        ]
+        assert isinstance(results[1].error, ValueError)
+        assert isinstance(results[3].error, FileNotFoundError)
+
+    def test_process_pool(self, tmp_path):
+        paths = make_configs(tmp_path, 4)
+        results = apply_many(
+            McpEnum,
+            [McpEnum.mcp_1, McpEnum.mcp_2],
+            paths,
+            max_workers=2,
+            use_process=True,
+            chunksize=2,
+        )
+        assert all(res.status == STATUS_CHANGED for res in results)
+        config = ClaudeDesktopConfig(path=paths[-1]).read()
+        assert set(config["mcpServers"]) == {"mcp_1", "mcp_2"}
+
+
+def collect(agen) -> list[ApplyResult]:
+    async def main():
+        return [res async for res in agen]
+
+    return asyncio.run(main())
+
+
+class TestApplyManyAsync:
+    def test_apply(self, tmp_path):
+        paths = make_configs(tmp_path, 5)
+        results = collect(
+            apply_many_async(McpEnum, [McpEnum.mcp_1], paths, max_concurrency=2)
+        )
+        assert sorted(res.path for res in results) == paths
+        assert all(res.status == STATUS_CHANGED for res in results)
+        for path in paths:
+            config = ClaudeDesktopConfig(path=path).read()
+            assert list(config["mcpServers"]) == ["mcp_1"]
+
+        results = collect(apply_many_async(McpEnum, [McpEnum.mcp_1], paths))
+        assert all(res.status == STATUS_UNCHANGED for res in results)
+
+    def test_errors_are_captured(self, tmp_path):
+        paths = make_configs(tmp_path, 2)
+        paths[0].write_text("{not json")
+        results = collect(apply_many_async(McpEnum, [McpEnum.mcp_2], paths))
+        by_path = {res.path: res for res in results}
+        assert isinstance(by_path[paths[0]].error, ValueError)
+        assert by_path[paths[1]].status == STATUS_CHANGED
+
+    def test_streams_in_completion_order(self, tmp_path, monkeypatch):
+        paths = make_configs(tmp_path, 3)
+        slow = paths[0]
+        apply = McpEnum.apply.__func__
+
+        def slow_apply(cls, wanted_mcps, cdc, *args):
+            if cdc.path == slow:
+                time.sleep(0.2)
+            return apply(cls, wanted_mcps, cdc, *args)
+
+        monkeypatch.setattr(McpEnum, "apply", classmethod(slow_apply))
+        results = collect(apply_many_async(McpEnum, [McpEnum.mcp_1], paths))
+        assert [res.path for res in results] == paths[1:] + [slow]
+
+    def test_max_concurrency(self, tmp_path, monkeypatch):
+        paths = make_configs(tmp_path, 8)
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+        apply = McpEnum.apply.__func__
+
+        def counting_apply(cls, *args):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            try:
+                return apply(cls, *args)
+            finally:
+                with lock:
+                    running[0] -= 1
+
+        monkeypatch.setattr(McpEnum, "apply", classmethod(counting_apply))
+        results = collect(
+            apply_many_async(McpEnum, [McpEnum.mcp_1], paths, max_concurrency=3)
+        )
+        assert len(results) == 8
+        assert peak[0] == 3
+
+        with pytest.raises(ValueError):
+            collect(apply_many_async(McpEnum, [], paths, max_concurrency=0))
+
+    def test_break_cancels_pending(self, tmp_path):
+        paths = make_configs(tmp_path, 6)
+
+        async def main():
+            agen = apply_many_async(
+                McpEnum, [McpEnum.mcp_1], paths, max_concurrency=1
+            )
+            try:
+                async for res in agen:
+                    return res
+            finally:
+                await agen.aclose()
+
+        first = asyncio.run(main())
+        assert first.status == STATUS_CHANGED
+        changed = [path for path in paths if "mcp_1" in path.read_text()]
+        # the next file may have been started before the break
+        assert 1 <= len(changed) <= 2
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.batch",
+        preview=False,
+    )
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+
+import pytest
+
+from claude_desktop_config.codec import (
+    JsonCodec,
+    StdlibJsonCodec,
+    OrjsonCodec,
+    get_default_codec,
+    _reindent,
+)
+
+config = {
+    "mcpServers": {
+        "mcp_1": {
+            "command": "npx",
+            "args": ["-y", "mcp-remote", "https://mcp1.example.com/sse"],
+            "env": {"DEBUG": True, "PORT": 8080, "RATIO": 0.5, "NONE": None},
+        },
+        "mcp_2": {"command": "uvx", "args": [], "env": {}},
+    },
+    "nested": [[1, [2, [3, {"a": [{}]}]]]],
+    "unicode": "café 中文 \U0001f600 \x7f \t\n\"\\",
+}
+
+edge_cases = [
+    {},
+    [],
+    {"big_int": 2**70},
+    {1: "non str key"},
+    {"float": 1e16, "small": 1.5e-05, "neg": -2.5e-10},
+    {"text that looks like a number": ": 1e5"},
+    {"nan": float("nan"), "inf": [float("inf"), -float("inf")], "none": None},
+]
+
+
+class TestStdlibJsonCodec:
+    def test(self):
+        codec = StdlibJsonCodec()
+        data = codec.dumps(config)
+        assert data == json.dumps(config, indent=4).encode("utf-8")
+        assert codec.loads(data) == config
+
+
+class TestOrjsonCodec:
+    def test_byte_compatible(self):
+        pytest.importorskip("orjson")
+        codec = OrjsonCodec()
+        for obj in [config] + edge_cases:
+            data = codec.dumps(obj)
+            assert data == json.dumps(obj, indent=4).encode("utf-8")
+        assert codec.loads(codec.dumps(config)) == config
+        assert codec.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+    def test_pickle(self):
+        pytest.importorskip("orjson")
+        codec = pickle.loads(pickle.dumps(OrjsonCodec()))
+        assert codec.loads(b"{}") == {}
+
+
+def test_reindent():
+    assert _reindent(b'{\n  "a": [\n    1\n  ]\n}') == (
+        b'{\n    "a": [\n        1\n    ]\n}'
+    )
+
+
+def test_get_default_codec():
+    codec = get_default_codec()
+    assert isinstance(codec, JsonCodec)
+    assert get_default_codec() is codec
+
+    with pytest.raises(NotImplementedError):
+        JsonCodec().loads(b"{}")
+    with pytest.raises(NotImplementedError):
+        JsonCodec().dumps({})
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.codec",
+        preview=False,
+    )
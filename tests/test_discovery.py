@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import shutil
+from pathlib import Path
+
+import pytest
+
+from claude_desktop_config import discovery
+from claude_desktop_config.discovery import (
+    RELATIVE_PATH_LINUX,
+    RELATIVE_PATH_MACOS,
+    RELATIVE_PATH_WINDOWS,
+    get_relative_config_path,
+    get_default_home_roots,
+    iter_pwd_homes,
+    DiscoveryCache,
+    discover_claude_desktop_configs,
+)
+
+
+def make_homes(root: Path) -> list[Path]:
+    """
+    user_0, user_2 and user_4 have a config, user_1 only has ``.config``,
+    user_3 is empty.
+    """
+    homes = list()
+    for i in range(5):
+        home = root / f"user_{i}"
+        home.mkdir(parents=True)
+        if i == 1:
+            (home / ".config").mkdir()
+        elif i % 2 == 0:
+            path = home.joinpath(*RELATIVE_PATH_LINUX)
+            path.parent.mkdir(parents=True)
+            path.write_text("{}")
+        homes.append(home)
+    (root / "not_a_home.txt").write_text("")
+    return homes
+
+
+def set_mtime(root: Path, seconds_ago: float):
+    """
+    Set the mtime of every directory under ``root`` in the past, out of the
+    racy window.
+    """
+    mtime_ns = time.time_ns() - int(seconds_ago * 1_000_000_000)
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(mtime_ns, mtime_ns))
+
+
+def discover(**kwargs) -> set[Path]:
+    kwargs.setdefault("relative_path", RELATIVE_PATH_LINUX)
+    return {cdc.path for cdc in discover_claude_desktop_configs(**kwargs)}
+
+
+def config_path(home: Path) -> Path:
+    return home.joinpath(*RELATIVE_PATH_LINUX)
+
+
+class CountCalls:
+    def __init__(self, monkeypatch, name: str):
+        self.count = 0
+        func = getattr(discovery, name)
+
+        def wrapper(*args, **kwargs):
+            self.count += 1
+            return func(*args, **kwargs)
+
+        monkeypatch.setattr(discovery, name, wrapper)
+
+
+def test_get_relative_config_path():
+    assert get_relative_config_path("linux") == RELATIVE_PATH_LINUX
+    assert get_relative_config_path("darwin") == RELATIVE_PATH_MACOS
+    assert get_relative_config_path("win32") == RELATIVE_PATH_WINDOWS
+    assert get_relative_config_path() == get_relative_config_path(
+        discovery.sys.platform
+    )
+    with pytest.raises(OSError):
+        get_relative_config_path("sunos5")
+
+
+def test_get_default_home_roots():
+    assert get_default_home_roots("linux") == ["/home"]
+    assert get_default_home_roots("darwin") == ["/Users"]
+    assert get_default_home_roots("win32")[0].endswith("Users")
+    with pytest.raises(OSError):
+        get_default_home_roots("sunos5")
+
+
+def test_iter_pwd_homes():
+    pytest.importorskip("pwd")
+    assert all(isinstance(home, str) for home in iter_pwd_homes())
+
+
+class TestDiscover:
+    def test_roots(self, tmp_path):
+        homes = make_homes(tmp_path / "home")
+        paths = discover(roots=[tmp_path / "home", tmp_path / "missing"])
+        assert paths == {config_path(homes[i]) for i in (0, 2, 4)}
+
+    def test_homes(self, tmp_path):
+        homes = make_homes(tmp_path / "home")
+        cdcs = list(
+            discover_claude_desktop_configs(
+                roots=[tmp_path / "home"],
+                homes=[homes[0], str(homes[0]), homes[1], tmp_path / "missing"],
+                relative_path=RELATIVE_PATH_LINUX,
+                max_workers=2,
+                chunksize=1,
+            )
+        )
+        # a home is yielded once, even if found twice
+        assert sorted(cdc.path for cdc in cdcs) == [
+            config_path(homes[i]) for i in (0, 2, 4)
+        ]
+
+    def test_pwd_homes_by_default(self, tmp_path, monkeypatch):
+        homes = make_homes(tmp_path / "home")
+        monkeypatch.setattr(discovery, "iter_pwd_homes", lambda: map(str, homes[:3]))
+        assert discover() == {config_path(homes[0]), config_path(homes[2])}
+
+    def test_executor(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+
+        homes = make_homes(tmp_path / "home")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert len(discover(homes=homes, executor=executor)) == 3
+            # the executor given by the caller is not shut down
+            assert executor.submit(lambda: 1).result() == 1
+
+    def test_stop_early(self, tmp_path):
+        make_homes(tmp_path / "home")
+        it = discover_claude_desktop_configs(
+            roots=[tmp_path / "home"],
+            relative_path=RELATIVE_PATH_LINUX,
+            cache=DiscoveryCache(),
+        )
+        assert next(it).path.name == "claude_desktop_config.json"
+        it.close()
+
+
+class TestDiscoveryCache:
+    def test_only_changes_are_rechecked(self, tmp_path, monkeypatch):
+        root = tmp_path / "home"
+        homes = make_homes(root)
+        set_mtime(root, 60)
+        cache = DiscoveryCache()
+        expected = {config_path(homes[i]) for i in (0, 2, 4)}
+        assert discover(roots=[root], cache=cache) == expected
+        assert cache.relative_path == RELATIVE_PATH_LINUX
+        assert len(cache.homes) == 5
+
+        # nothing changed, the root is not listed again and no home is probed
+        # below its cached directory
+        list_root = CountCalls(monkeypatch, "_list_root")
+        monkeypatch.setattr(discovery.os, "scandir", None)
+        stat_dir = CountCalls(monkeypatch, "_stat_dir")
+        assert discover(roots=[root], cache=cache) == expected
+        assert list_root.count == 1
+        assert stat_dir.count == 1 + 5
+        monkeypatch.undo()
+
+        # a new config file in user_1 and a deleted home
+        config_path(homes[1]).parent.mkdir()
+        config_path(homes[1]).write_text("{}")
+        shutil.rmtree(homes[0])
+        set_mtime(root, 30)
+        expected = {config_path(homes[i]) for i in (1, 2, 4)}
+        assert discover(roots=[root], cache=cache) == expected
+        assert homes[0].as_posix() not in cache.homes
+        assert len(cache.homes) == 4
+
+    def test_racy_mtime_is_not_cached(self, tmp_path):
+        root = tmp_path / "home"
+        make_homes(root)
+        cache = DiscoveryCache()
+        discover(roots=[root], cache=cache)
+        assert cache.roots[str(root)][0] is None
+        assert all(mtime_ns is None for _, mtime_ns, _ in cache.homes.values())
+
+    def test_relative_path_change_clears(self, tmp_path):
+        root = tmp_path / "home"
+        make_homes(root)
+        set_mtime(root, 60)
+        cache = DiscoveryCache()
+        discover(roots=[root], cache=cache)
+        assert discover(roots=[root], cache=cache, relative_path=("x.json",)) == set()
+        assert cache.relative_path == ("x.json",)
+        assert all(entry == (0, entry[1], False) for entry in cache.homes.values())
+
+    def test_dump_and_load(self, tmp_path):
+        root = tmp_path / "home"
+        homes = make_homes(root)
+        set_mtime(root, 60)
+        cache = DiscoveryCache()
+        discover(roots=[root], cache=cache)
+        path = tmp_path / "cache" / "discovery.json"
+        cache.dump(path)
+        loaded = DiscoveryCache.load(path)
+        assert loaded == cache
+        assert discover(roots=[root], cache=loaded) == {
+            config_path(homes[i]) for i in (0, 2, 4)
+        }
+
+        assert DiscoveryCache.load(tmp_path / "missing.json") == DiscoveryCache()
+        path.write_text("{not json")
+        assert DiscoveryCache.load(path) == DiscoveryCache()
+        path.write_text('{"version": 0}')
+        assert DiscoveryCache.load(path) == DiscoveryCache()
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.discovery",
+        preview=False,
+    )
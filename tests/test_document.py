@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+
+import pytest
+
+from claude_desktop_config.impl import (
+    ClaudeDesktopConfig,
+    ReadCache,
+    enable_mcp_server,
+    disable_mcp_server,
+    apply_mcp_changes,
+)
+from claude_desktop_config.document import ConfigDocument
+
+
+def make_doc() -> ConfigDocument:
+    return ConfigDocument(
+        {
+            "mcpServers": {
+                "a": {"command": "a", "args": ["x"], "env": {"K": "1"}},
+                "b": {"command": "b"},
+            },
+            "preferences": {"theme": "dark", "recent": [{"id": 1}]},
+        }
+    )
+
+
+class TestConfigDocument:
+    def test_clean(self):
+        doc = make_doc()
+        assert doc.dirty is False
+        assert doc["mcpServers"]["a"]["env"]["K"] == "1"
+        _ = list(doc.items()), list(doc["preferences"]["recent"])
+        assert json.loads(json.dumps(doc)) == doc
+        assert doc.dirty is False
+        assert doc.added_servers == doc.updated_servers == doc.removed_servers == set()
+
+    def test_nested_mutations(self):
+        doc = make_doc()
+        doc["mcpServers"]["a"]["env"]["K"] = "2"
+        doc["mcpServers"]["a"]["args"].append("y")
+        for item in doc["preferences"]["recent"]:
+            item["id"] = 2
+        del doc["preferences"]["theme"]
+        assert doc.dirty_paths == {
+            ("mcpServers", "a", "env", "K"),
+            ("mcpServers", "a", "args"),
+            ("preferences", "recent", 0, "id"),
+            ("preferences", "theme"),
+        }
+        assert doc.updated_servers == {"a"}
+        assert doc.added_servers == doc.removed_servers == set()
+
+        doc.mark_clean()
+        assert doc.dirty is False
+        doc["preferences"].update({"theme": "light"})
+        doc["preferences"].setdefault("font", "mono")
+        doc["preferences"].pop("missing", None)
+        assert doc.dirty_paths == {("preferences", "theme"), ("preferences", "font")}
+
+    def test_server_changes(self):
+        doc = make_doc()
+        assert enable_mcp_server(doc, "a", {"command": "a2"}) is True
+        assert enable_mcp_server(doc, "c", {"command": "c"}) is True
+        assert disable_mcp_server(doc, "b") is True
+        enable_mcp_server(doc, "d", {})
+        disable_mcp_server(doc, "d")
+        assert doc.added_servers == {"c"}
+        assert doc.updated_servers == {"a"}
+        assert doc.removed_servers == {"b"}
+
+        doc.mark_clean()
+        change_set = apply_mcp_changes(doc, enable={"c": {"command": "c"}})
+        assert not change_set
+        assert doc.dirty is False
+
+        doc["mcpServers"] = {"c": {"command": "c"}, "e": {}}
+        assert doc.added_servers == {"e"}
+        assert doc.updated_servers == {"c"}
+        assert doc.removed_servers == {"a"}
+
+    def test_pickle(self):
+        doc = make_doc()
+        doc["mcpServers"]["a"]["env"]["K"] = "2"
+        doc_copy = pickle.loads(pickle.dumps(doc))
+        assert doc_copy == doc
+        assert isinstance(doc_copy, ConfigDocument)
+        assert doc_copy.dirty is False
+        assert type(pickle.loads(pickle.dumps(doc["mcpServers"]))) is dict
+
+
+class TestClaudeDesktopConfigTracking:
+    def test_read_write(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {"a": {"command": "a"}}}))
+        cdc = ClaudeDesktopConfig(path=path, cache=ReadCache())
+        doc = cdc.read(track=True)
+        assert isinstance(doc, ConfigDocument)
+        assert doc.path == path
+
+        # clean document of an unchanged file, nothing to write
+        text = path.read_text()
+        assert cdc.write(doc) is False
+        assert path.read_text() == text
+
+        enable_mcp_server(doc, "b", {"command": "b"})
+        assert cdc.write(doc) is True
+        assert doc.dirty is False
+        assert cdc.read() == {
+            "mcpServers": {"a": {"command": "a"}, "b": {"command": "b"}}
+        }
+        # clean again after the write
+        assert cdc.write(doc) is False
+
+        # the file was changed since it was read, an explicit write wins
+        path.write_text("{}")
+        assert cdc.write(doc) is True
+        assert cdc.read() == doc
+        assert cdc.write(doc) is False
+
+        # a clean document written to another file is written
+        other = ClaudeDesktopConfig(path=tmp_path / "other.json")
+        assert other.write(doc) is True
+        assert other.read() == doc
+
+    @pytest.mark.parametrize("kwargs", [{}, {"minimal_edit": True}, {"lazy": True}])
+    def test_write_clean_document_of_changed_file(self, tmp_path, kwargs):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {"a": {"command": "a"}}}))
+        cdc = ClaudeDesktopConfig(path=path, **kwargs)
+        doc = cdc.read(track=True)
+        path.write_text(json.dumps({"theme": "dark"}))
+        assert cdc.write(doc) is True
+        assert json.loads(path.read_text()) == {"mcpServers": {"a": {"command": "a"}}}
+
+    def test_session_and_update(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {"a": {"command": "a"}}}))
+        cdc = ClaudeDesktopConfig(path=path)
+        writes = list()
+        write = cdc.write
+        cdc.write = lambda *args, **kwargs: writes.append(1) or write(*args, **kwargs)
+
+        with cdc.session(track=True) as config:
+            assert isinstance(config, ConfigDocument)
+            enable_mcp_server(config, "a", {"command": "a"})
+        assert writes == []
+        with cdc.session(track=True) as config:
+            config["mcpServers"]["a"]["command"] = "a2"
+        assert writes == [1]
+        assert cdc.read() == {"mcpServers": {"a": {"command": "a2"}}}
+
+        def mutate(config):
+            assert isinstance(config, ConfigDocument)
+            disable_mcp_server(config, "a")
+
+        assert cdc.update(mutate, track=True) is True
+        assert cdc.update(mutate, track=True) is False
+        assert cdc.read() == {"mcpServers": {}}
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.document",
+        preview=False,
+    )
@@ -1,16 +1,32 @@
 # -*- coding: utf-8 -*-
 
+import os
+import copy
 import json
+import pickle
+import textwrap
+import dataclasses
+import threading
 from pathlib import Path
 import pytest
+from claude_desktop_config import impl
 from claude_desktop_config.impl import (
+    ConflictError,
+    ReadCache,
     ClaudeDesktopConfig,
     Mcp,
     BaseMcpEnum,
+    McpChangeSet,
+    McpPlan,
+    SettingsChange,
+    diff_settings,
     enable_mcp_server,
     disable_mcp_server,
+    apply_mcp_changes,
+    fingerprint_settings,
     get_default_claude_desktop_config_path,
 )
+from claude_desktop_config.codec import StdlibJsonCodec, OrjsonCodec
 from claude_desktop_config.os_platform import IS_WINDOWS, IS_MACOS, IS_LINUX
 
 
@@ -48,6 +64,29 @@ class McpEnum(BaseMcpEnum):
     )
 
 
+class TestFingerprintSettings:
+    def test_canonical(self):
+        fp = fingerprint_settings({"command": "npx", "args": ["a", 1], "env": {}})
+        assert len(fp) == 64
+        # key order doesn't matter
+        assert fp == fingerprint_settings({"env": {}, "args": ["a", 1], "command": "npx"})
+        # integral floats and tuples are normalized
+        assert fp == fingerprint_settings({"command": "npx", "args": ("a", 1.0), "env": {}})
+        # unicode normalization form doesn't matter
+        assert fingerprint_settings({"caf\u00e9": "\u00e9"}) == fingerprint_settings(
+            {"cafe\u0301": "e\u0301"}
+        )
+        # order of list items does matter
+        assert fp != fingerprint_settings({"command": "npx", "args": [1, "a"], "env": {}})
+        assert fingerprint_settings({"a": 1.5}) != fingerprint_settings({"a": 1})
+        assert fingerprint_settings({"a": True}) != fingerprint_settings({"a": 1})
+
+    def test_stable(self):
+        assert fingerprint_settings({}) == (
+            "44136fa355b3678a1146ad16f7e8649e94fb4fc21fe77e8310c060f61caaff8a"
+        )
+
+
 class TestEnableMcpServer:
     def test_enable_new_server_no_mcpservers_key(self):
         """Test enabling a server when mcpServers key doesn't exist"""
@@ -107,6 +146,22 @@ class TestEnableMcpServer:
         }
 
 
+    def test_enable_existing_server_same_fingerprint(self):
+        """Test that settings with the same fingerprint are treated as unchanged"""
+        config = {"mcpServers": {"test_server": {"args": ["caf\u00e9"]}}}
+        settings = {"args": ["cafe\u0301"]}
+        result = enable_mcp_server(
+            config,
+            name="test_server",
+            settings=settings,
+            fingerprint=fingerprint_settings(settings),
+        )
+        assert result is False
+        assert config == {"mcpServers": {"test_server": {"args": ["caf\u00e9"]}}}
+        # without the fingerprint, it is a strict comparison
+        assert enable_mcp_server(config, "test_server", settings) is True
+
+
 class TestDisableMcpServer:
     def test_disable_existing_server(self):
         """Test disabling a server that exists"""
@@ -141,6 +196,71 @@ class TestDisableMcpServer:
         assert config == {"otherKey": "value"}
 
 
+class TestApplyMcpChanges:
+    def test_apply_changes(self):
+        config = {
+            "mcpServers": {
+                "same": {"command": "same"},
+                "old": {"command": "old"},
+                "to_remove": {"command": "to_remove"},
+            }
+        }
+        change_set = apply_mcp_changes(
+            config,
+            enable={
+                "same": {"command": "same"},
+                "old": {"command": "new"},
+                "new": {"command": "new"},
+            },
+            disable=["to_remove", "not_exists"],
+        )
+        assert change_set == McpChangeSet(
+            added=["new"],
+            updated=["old"],
+            removed=["to_remove"],
+            unchanged=["same", "not_exists"],
+        )
+        assert change_set.changed is True
+        assert bool(change_set) is True
+        assert config == {
+            "mcpServers": {
+                "same": {"command": "same"},
+                "old": {"command": "new"},
+                "new": {"command": "new"},
+            }
+        }
+
+        change_set = apply_mcp_changes(config, enable={"new": {"command": "new"}})
+        assert bool(change_set) is False
+        assert change_set.unchanged == ["new"]
+
+    def test_no_mcpservers_key(self):
+        config = {"otherKey": "value"}
+        change_set = apply_mcp_changes(config, disable=["a"])
+        assert change_set == McpChangeSet(unchanged=["a"])
+        assert config == {"otherKey": "value"}
+
+        change_set = apply_mcp_changes(config, enable={"a": {"command": "a"}})
+        assert change_set.added == ["a"]
+        assert config == {"otherKey": "value", "mcpServers": {"a": {"command": "a"}}}
+
+    def test_fingerprints(self):
+        config = {"mcpServers": {"a": {"args": ["caf\u00e9"]}}}
+        settings = {"args": ["cafe\u0301"]}
+        change_set = apply_mcp_changes(
+            config,
+            enable={"a": settings},
+            fingerprints={"a": fingerprint_settings(settings)},
+        )
+        assert change_set == McpChangeSet(unchanged=["a"])
+
+    def test_conflict(self):
+        config = {}
+        with pytest.raises(ValueError):
+            apply_mcp_changes(config, enable={"a": {}}, disable=["a"])
+        assert config == {}
+
+
 class TestClaudeDesktopConfig:
     def test_read_config(self):
         """Test reading configuration from file"""
@@ -166,11 +286,453 @@ class TestClaudeDesktopConfig:
         written_config = json.loads(path_test_claude_desktop_config_json.read_text())
         assert written_config == test_config
 
+    def test_write_atomic(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        cdc = ClaudeDesktopConfig(path=path)
+        config = {"mcpServers": {"a": {"command": "a"}}}
+        assert cdc.write(config, atomic=True, fsync_dir=True) is True
+        assert path.read_text() == json.dumps(config, indent=4)
+        path.chmod(0o640)
+        mtime_ns = path.stat().st_mtime_ns
+
+        # identical content, nothing is written and mtime is kept
+        assert cdc.write(config, atomic=True) is False
+        assert path.stat().st_mtime_ns == mtime_ns
+
+        # same size but different content
+        config["mcpServers"]["a"]["command"] = "b"
+        assert cdc.write(config, atomic=True) is True
+        assert cdc.read() == config
+        if not IS_WINDOWS:
+            assert path.stat().st_mode & 0o777 == 0o640
+        # no temp file left behind
+        assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+    @pytest.mark.skipif(IS_WINDOWS, reason="no unix file mode on Windows")
+    def test_write_atomic_new_file_mode(self, tmp_path):
+        umask = os.umask(0o027)
+        try:
+            assert impl._get_umask() == 0o027
+            path = tmp_path / "claude_desktop_config.json"
+            ClaudeDesktopConfig(path=path).write({}, atomic=True)
+            assert path.stat().st_mode & 0o777 == 0o640
+        finally:
+            os.umask(umask)
+        path = tmp_path / "plain.json"
+        ClaudeDesktopConfig(path=path).write({})
+        atomic_path = tmp_path / "atomic.json"
+        ClaudeDesktopConfig(path=atomic_path).write({}, atomic=True)
+        assert atomic_path.stat().st_mode == path.stat().st_mode
+
+    @pytest.mark.skipif(IS_WINDOWS, reason="symlinks need privileges on Windows")
+    def test_write_atomic_symlink(self, tmp_path):
+        target = tmp_path / "real" / "claude_desktop_config.json"
+        target.parent.mkdir()
+        target.write_text("{}")
+        path = tmp_path / "claude_desktop_config.json"
+        path.symlink_to(target)
+        cdc = ClaudeDesktopConfig(path=path)
+        for concurrency in [None, "optimistic"]:
+            config = {"mcpServers": {"a": {"command": str(concurrency)}}}
+            if concurrency is None:
+                assert cdc.write(config, atomic=True) is True
+            else:
+                assert cdc.update(lambda c: c.update(config), concurrency)
+            assert path.is_symlink()
+            assert json.loads(target.read_text()) == config
+        assert not list(tmp_path.glob("**/*.tmp"))
+
+    @pytest.mark.skipif(
+        IS_WINDOWS or os.geteuid() != 0,
+        reason="only root can give a file to another user",
+    )
+    def test_write_atomic_keeps_owner(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text("{}")
+        os.chown(path, 1234, 1234)
+        cdc = ClaudeDesktopConfig(path=path)
+        assert cdc.write({"mcpServers": {}}, atomic=True) is True
+        st = path.stat()
+        assert (st.st_uid, st.st_gid) == (1234, 1234)
+
+    def test_write_atomic_failure_keeps_original(self, tmp_path, monkeypatch):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text("{}")
+        cdc = ClaudeDesktopConfig(path=path)
+
+        def fsync(fd):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(impl.os, "fsync", fsync)
+        with pytest.raises(OSError):
+            cdc.write({"mcpServers": {}}, atomic=True)
+        assert path.read_text() == "{}"
+        assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+    def test_session(self, tmp_path, monkeypatch):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {"old": {"command": "old"}}}))
+        cdc = ClaudeDesktopConfig(path=path)
+        writes = list()
+        write = ClaudeDesktopConfig.write
+
+        def counted_write(self, *args, **kwargs):
+            writes.append(1)
+            return write(self, *args, **kwargs)
+
+        monkeypatch.setattr(ClaudeDesktopConfig, "write", counted_write)
+
+        with cdc.session() as config:
+            enable_mcp_server(config, "a", {"command": "a"})
+            enable_mcp_server(config, "b", {"command": "b"})
+            disable_mcp_server(config, "old")
+        assert len(writes) == 1
+        assert cdc.read() == {
+            "mcpServers": {"a": {"command": "a"}, "b": {"command": "b"}}
+        }
+
+        # nothing changed, nothing written
+        with cdc.session() as config:
+            enable_mcp_server(config, "a", {"command": "a"})
+        assert len(writes) == 1
+
+        # changes are discarded on error
+        with pytest.raises(ValueError):
+            with cdc.session() as config:
+                disable_mcp_server(config, "a")
+                raise ValueError
+        assert len(writes) == 1
+        assert "a" in cdc.read()["mcpServers"]
+
+    @pytest.mark.parametrize("concurrency", ["lock", "optimistic"])
+    def test_update_concurrent(self, tmp_path, concurrency):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {}}))
+        n_threads, n_updates = 4, 10
+
+        def worker(i):
+            cdc = ClaudeDesktopConfig(path=path, codec=StdlibJsonCodec())
+            for j in range(n_updates):
+                cdc.update(
+                    lambda config: enable_mcp_server(
+                        config, f"s{i}-{j}", {"command": "x"}
+                    ),
+                    concurrency=concurrency,
+                    retries=1000,
+                    backoff=0.001,
+                    max_backoff=0.01,
+                )
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        config = json.loads(path.read_text())
+        assert len(config["mcpServers"]) == n_threads * n_updates
+        # no temp file left behind
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_update_optimistic_retry(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {}}))
+        cdc = ClaudeDesktopConfig(path=path, cache=ReadCache())
+        calls = list()
+
+        def mutate(config):
+            calls.append(1)
+            if len(calls) == 1:  # someone else writes in between
+                path.write_text(json.dumps({"mcpServers": {"other": {}}}))
+            enable_mcp_server(config, "mine", {"command": "x"})
+
+        assert cdc.update(mutate, concurrency="optimistic", backoff=0) is True
+        assert len(calls) == 2
+        assert cdc.read() == {"mcpServers": {"other": {}, "mine": {"command": "x"}}}
+        assert cdc.update(mutate, concurrency="optimistic") is False
+
+        def always_conflict(config):
+            path.write_text(json.dumps({"mcpServers": {"n": len(calls)}}))
+            calls.append(1)
+            config["x"] = 1
+
+        with pytest.raises(ConflictError):
+            cdc.update(always_conflict, concurrency="optimistic", retries=2, backoff=0)
+        assert not list(tmp_path.glob("*.tmp"))
+
+        with pytest.raises(ValueError):
+            cdc.update(mutate, concurrency="invalid")
+
+    def test_update_optimistic_same_result(self, tmp_path):
+        # another writer makes the same change from the same version, ours
+        # must be redone on top of it, not dropped
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"n": 0}))
+        cdc = ClaudeDesktopConfig(path=path)
+        calls = list()
+
+        def increment(config):
+            if not calls:
+                ClaudeDesktopConfig(path=path).write({"n": config["n"] + 1})
+            calls.append(1)
+            config["n"] += 1
+
+        assert cdc.update(increment, concurrency="optimistic", backoff=0) is True
+        assert len(calls) == 2
+        assert cdc.read() == {"n": 2}
+
+    @pytest.mark.parametrize("concurrency", ["lock", "optimistic"])
+    def test_update_concurrent_counter(self, tmp_path, concurrency):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"n": 0}))
+        n_threads, n_updates = 8, 25
+
+        def increment(config):
+            config["n"] += 1
+
+        def worker():
+            cdc = ClaudeDesktopConfig(path=path, codec=StdlibJsonCodec())
+            for _ in range(n_updates):
+                assert cdc.update(
+                    increment,
+                    concurrency=concurrency,
+                    retries=1000,
+                    backoff=0.001,
+                    max_backoff=0.01,
+                )
+
+        threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert json.loads(path.read_text()) == {"n": n_threads * n_updates}
+
+    def test_lock_timeout(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {}}))
+        cdc = ClaudeDesktopConfig(path=path)
+        acquired, release = threading.Event(), threading.Event()
+
+        def hold():
+            with cdc.lock():
+                acquired.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait()
+        try:
+            with pytest.raises(TimeoutError):
+                with cdc.lock(timeout=0.05):
+                    pass
+        finally:
+            release.set()
+            thread.join()
+        with cdc.session(lock=True) as config:
+            enable_mcp_server(config, "a", {"command": "a"})
+        assert cdc.read() == {"mcpServers": {"a": {"command": "a"}}}
+
+    def test_lock_file_not_writable(self, tmp_path, monkeypatch):
+        # e.g. a lock file created by root before the owner of the config
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {}}))
+        cdc = ClaudeDesktopConfig(path=path)
+        cdc.lock_path.touch()
+        open_ = impl.os.open
+
+        def open_read_only(file, flags, *args):
+            # an existing file can't be opened for writing
+            if file == cdc.lock_path and flags & os.O_RDWR and not flags & os.O_EXCL:
+                raise PermissionError(13, "Permission denied", str(file))
+            return open_(file, flags, *args)
+
+        monkeypatch.setattr(impl.os, "open", open_read_only)
+        for concurrency in ["lock", "optimistic"]:
+            assert cdc.update(
+                lambda config: enable_mcp_server(config, concurrency, {}),
+                concurrency=concurrency,
+            )
+        assert list(cdc.read()["mcpServers"]) == ["lock", "optimistic"]
+
+    @pytest.mark.skipif(
+        IS_WINDOWS or os.geteuid() != 0,
+        reason="only root can give a file to another user",
+    )
+    def test_lock_file_owner(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text("{}")
+        os.chown(path, 1234, 1234)
+        cdc = ClaudeDesktopConfig(path=path)
+        with cdc.lock():
+            pass
+        st = cdc.lock_path.stat()
+        assert (st.st_uid, st.st_gid) == (1234, 1234)
+
     def test_default_path_initialization(self):
         """Test that ClaudeDesktopConfig uses default path when not specified"""
         cdc = ClaudeDesktopConfig()
         assert cdc.path == get_default_claude_desktop_config_path()
 
+    def test_default_path_follows_environment(self, tmp_path, monkeypatch):
+        """Test that the default path is resolved lazily from the environment"""
+        path = get_default_claude_desktop_config_path()
+        assert get_default_claude_desktop_config_path() is path
+
+        for key in ["HOME", "USERPROFILE", "APPDATA"]:
+            monkeypatch.setenv(key, str(tmp_path))
+        cdc = ClaudeDesktopConfig()
+        assert cdc.path == get_default_claude_desktop_config_path()
+        assert cdc.path != path
+        assert str(cdc.path).startswith(str(tmp_path))
+
+
+class CountingCodec(StdlibJsonCodec):
+    def __init__(self):
+        self.loads_calls = 0
+
+    def loads(self, data):
+        self.loads_calls += 1
+        return super().loads(data)
+
+
+class BufferCodec(StdlibJsonCodec):
+    accepts_buffer = True
+
+    def __init__(self):
+        self.loads_types = list()
+
+    def loads(self, data):
+        self.loads_types.append(type(data))
+        return super().loads(bytes(data))
+
+
+class TestReadMmap:
+    @pytest.mark.parametrize("cached", [False, True])
+    def test_read(self, tmp_path, monkeypatch, cached):
+        path = tmp_path / "claude_desktop_config.json"
+        config = {"mcpServers": {"a": {"command": "a"}}, "other": "x" * 1000}
+        path.write_text(json.dumps(config))
+        codec = BufferCodec()
+        cache = ReadCache() if cached else None
+        cdc = ClaudeDesktopConfig(path=path, codec=codec, cache=cache)
+
+        # small file, plain read
+        assert cdc.read() == config
+        monkeypatch.setattr(impl, "MMAP_READ_MIN_SIZE", 1000)
+        path.write_text(json.dumps(config, indent=4))
+        assert cdc.read() == config
+        assert codec.loads_types == [bytes, memoryview]
+
+        # a codec that can't parse a buffer always gets bytes
+        codec.accepts_buffer = False
+        path.write_text(json.dumps(config, indent=2))
+        assert cdc.read() == config
+        assert codec.loads_types == [bytes, memoryview, bytes]
+
+    def test_read_orjson(self, tmp_path, monkeypatch):
+        pytest.importorskip("orjson")
+        monkeypatch.setattr(impl, "MMAP_READ_MIN_SIZE", 0)
+        path = tmp_path / "claude_desktop_config.json"
+        config = {"mcpServers": {"a": {"command": "é"}}}
+        path.write_text(json.dumps(config))
+        cdc = ClaudeDesktopConfig(path=path, codec=OrjsonCodec())
+        assert cdc.read() == config
+        # the map is closed, the file can be replaced
+        cdc.write({}, atomic=True)
+        assert cdc.read() == {}
+
+
+class TestReadCache:
+    def test_read_hit_and_miss(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {"a": {"command": "a"}}}))
+        codec = CountingCodec()
+        cdc = ClaudeDesktopConfig(path=path, cache=ReadCache(), codec=codec)
+
+        config = cdc.read()
+        assert codec.loads_calls == 1
+        # mutating the returned dict must not leak into the cache
+        config["mcpServers"]["a"]["command"] = "changed"
+        assert cdc.read() == {"mcpServers": {"a": {"command": "a"}}}
+        assert codec.loads_calls == 1
+
+        # file changed on disk, the stat key no longer matches
+        path.write_text(json.dumps({"mcpServers": {}, "other": 1}))
+        assert cdc.read() == {"mcpServers": {}, "other": 1}
+        assert codec.loads_calls == 2
+
+    def test_write_refreshes_cache(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        codec = CountingCodec()
+        cdc = ClaudeDesktopConfig(path=path, cache=ReadCache(), codec=codec)
+        config = {"mcpServers": {"b": {"command": "b"}}}
+        cdc.write(config)
+        assert cdc.read() == config
+        assert codec.loads_calls == 0
+
+    @pytest.mark.parametrize("concurrency", [None, "lock", "optimistic"])
+    def test_write_concurrent_writer(self, tmp_path, monkeypatch, concurrency):
+        # another process writes right after our rename, our config must not
+        # be cached under the stat of its file
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text("{}")
+        cdc = ClaudeDesktopConfig(path=path, cache=ReadCache())
+        replace = impl.os.replace
+
+        def replace_then_write(src, dst):
+            replace(src, dst)
+            Path(dst).write_text(json.dumps({"other": 1}))
+
+        monkeypatch.setattr(impl.os, "replace", replace_then_write)
+        config = {"mine": 1}
+        if concurrency is None:
+            cdc.write(config, atomic=True)
+        else:
+            cdc.update(lambda c: c.update(config), concurrency=concurrency)
+        monkeypatch.setattr(impl.os, "replace", replace)
+        assert cdc.read() == {"other": 1}
+
+    def test_lru_and_invalidate(self, tmp_path):
+        cache = ReadCache(maxsize=2)
+        cdcs = list()
+        for i in range(3):
+            path = tmp_path / f"{i}.json"
+            path.write_text(json.dumps({"i": i}))
+            cdc = ClaudeDesktopConfig(path=path, cache=cache)
+            cdc.read()
+            cdcs.append(cdc)
+        assert len(cache) == 2
+        assert cache.get(cdcs[0].path) is None
+        assert cache.get(cdcs[2].path) == {"i": 2}
+
+        cache.invalidate(cdcs[2].path)
+        assert cache.get(cdcs[2].path) is None
+        assert len(cache) == 1
+        cache.invalidate()
+        assert len(cache) == 0
+
+    def test_pickle(self):
+        cache = ReadCache(maxsize=3)
+        cache.put(Path("a.json"), (1, 2, 3), {})
+        cache_copy = pickle.loads(pickle.dumps(cache))
+        assert cache_copy.maxsize == 3
+        assert len(cache_copy) == 0
+
+    def test_put_unsupported_object(self):
+        cache = ReadCache()
+        cache.put(Path("a.json"), (1, 2, 3), {})
+        cache.put(Path("a.json"), (1, 2, 4), {"a": object()})
+        assert len(cache) == 0
+
+    def test_deleted_file(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text("{}")
+        cache = ReadCache()
+        ClaudeDesktopConfig(path=path, cache=cache).read()
+        path.unlink()
+        assert cache.get(path) is None
+        assert len(cache) == 0
+
 
 class TestMcpDataclass:
     def test_mcp_creation(self):
@@ -180,9 +742,107 @@ class TestMcpDataclass:
         )
         assert mcp.name == "test_mcp"
         assert mcp.settings == {"command": "test", "args": ["arg1", "arg2"]}
+        assert mcp.fingerprint == fingerprint_settings(mcp.settings)
+        assert mcp.fingerprint is mcp.fingerprint
+
+    def test_mcp_frozen_and_hashable(self):
+        mcp = Mcp(name="a", settings={"command": "a", "args": ["x"]})
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            mcp.name = "b"
+        with pytest.raises(TypeError):
+            mcp.settings["command"] = "b"
+        with pytest.raises(TypeError):
+            mcp.settings["args"].append("y")
+        assert not hasattr(mcp, "__dict__")
+
+        same = Mcp(name="a", settings={"args": ("x",), "command": "a"})
+        assert same == mcp
+        assert hash(same) == hash(mcp)
+        assert len({mcp, same, Mcp(name="b", settings=mcp.settings)}) == 2
+        assert Mcp(name="a", settings={"command": "b"}) != mcp
+        assert pickle.loads(pickle.dumps(mcp)) == mcp
+        assert json.loads(json.dumps(mcp.settings)) == {"command": "a", "args": ["x"]}
+
+    def test_frozen_dict_hash(self):
+        a = impl.freeze_json({"x": 1, "y": {"z": [2]}})
+        b = impl.freeze_json({"y": {"z": [2]}, "x": 1})
+        assert a == b
+        assert hash(a) == hash(b)
+        assert b in {a}
+
+    def test_copy_frozen_settings(self):
+        mcp = Mcp(name="a", settings={"command": "a", "args": ["x"]})
+        settings = copy.copy(mcp.settings)
+        assert type(settings) is dict and settings == mcp.settings
+        settings = copy.deepcopy(mcp.settings)
+        assert type(settings) is dict and type(settings["args"]) is list
+        settings["args"].append("y")
+        assert mcp.settings["args"] == ["x"]
+        # pickling keeps them frozen
+        assert type(pickle.loads(pickle.dumps(mcp.settings))) is impl.FrozenDict
+
+    def test_migration_guide(self, tmp_path):
+        # the snippet of the release history, as written
+        text = (Path(__file__).parent.parent / "release-history.rst").read_text()
+        text = text[text.index("**Migration Guide**") :]
+        start = text.index(".. code-block:: python") + len(".. code-block:: python")
+        end = text.index("\n\n", text.index("append(", start))
+        snippet = textwrap.dedent(text[start:end].strip("\n"))
+
+        class McpEnum(BaseMcpEnum):
+            my_server = Mcp(name="my-server", settings={"command": "a", "args": []})
+
+        mcp = McpEnum.my_server.value
+        config = {}
+        McpEnum.plan([McpEnum.my_server], config).execute(config)
+        namespace = {"mcp": mcp, "config": config, "Mcp": Mcp}
+        exec(snippet, namespace)
+        assert namespace["new_mcp"].settings["env"] == {"DEBUG": "1"}
+        assert config["mcpServers"]["my-server"]["args"] == ["--verbose"]
+
+    def test_mcp_interned_settings(self):
+        args = ["-y", "mcp-remote"]
+        mcp_1 = Mcp(name="a", settings={"command": "npx", "args": list(args)})
+        mcp_2 = Mcp(name="b", settings={"command": "npx", "args": list(args)})
+        assert mcp_1.settings is mcp_2.settings
+        mcp_3 = Mcp(name="c", settings={"command": "uvx", "args": list(args)})
+        assert mcp_3.settings["args"] is mcp_1.settings["args"]
+        # equal values that are serialized differently are not merged
+        mcp_4 = Mcp(name="d", settings={"command": "npx", "args": [1]})
+        mcp_5 = Mcp(name="e", settings={"command": "npx", "args": [1.0]})
+        mcp_6 = Mcp(name="f", settings={"command": "npx", "args": [True]})
+        assert json.dumps(mcp_4.settings) == '{"command": "npx", "args": [1]}'
+        assert json.dumps(mcp_5.settings) == '{"command": "npx", "args": [1.0]}'
+        assert json.dumps(mcp_6.settings) == '{"command": "npx", "args": [true]}'
+
+    def test_frozen_settings_in_config(self, tmp_path):
+        """Frozen settings put in a config are written, cached and planned."""
+        path = tmp_path / "claude_desktop_config.json"
+        cdc = ClaudeDesktopConfig(path=path, cache=ReadCache())
+        config = {}
+        enable_mcp_server(config, "mcp_1", McpEnum.mcp_1.value.settings)
+        cdc.write(config)
+        assert len(cdc.cache) == 1
+        assert cdc.read() == config
+        assert McpEnum.plan([McpEnum.mcp_1], config).input_fingerprint is not None
+
+        # the settings put in the config by a plan are shared and immutable
+        config = {}
+        McpEnum.plan([McpEnum.mcp_1], config).execute(config)
+        assert config["mcpServers"]["mcp_1"] is McpEnum.mcp_1.value.settings
+        with pytest.raises(TypeError):
+            config["mcpServers"]["mcp_1"]["args"].append("x")
+        cdc.write(config)
+        assert cdc.read() == config
 
 
 class TestBaseMcpEnum:
+    def test_get_mcp_index(self):
+        index = McpEnum._get_mcp_index()
+        assert list(index) == ["mcp_1", "mcp_2", "mcp_3"]
+        assert index["mcp_2"] is McpEnum.mcp_2
+        assert McpEnum._get_mcp_index() is index
+
     def test_apply_enable_all_mcps(self):
         """Test applying all MCPs from enum"""
         reset_config()
@@ -265,6 +925,109 @@ class TestBaseMcpEnum:
         assert "mcp_2" not in config["mcpServers"]
         assert "mcp_3" in config["mcpServers"]
 
+    @pytest.mark.parametrize("concurrency", ["lock", "optimistic"])
+    def test_apply_with_concurrency(self, tmp_path, concurrency):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text(json.dumps({"mcpServers": {"mcp_2": {}}}))
+        cdc = ClaudeDesktopConfig(path=path)
+
+        wanted_mcps = [McpEnum.mcp_1]
+        assert McpEnum.apply(wanted_mcps, cdc, concurrency=concurrency) is True
+        assert cdc.read() == {"mcpServers": {"mcp_1": McpEnum.mcp_1.value.settings}}
+        assert McpEnum.apply(wanted_mcps, cdc, concurrency=concurrency) is False
+
+
+class TestDiffSettings:
+    def test(self):
+        old = {"command": "npx", "args": ["a"], "env": {"A": "1", "B": "2"}}
+        new = {"command": "npx", "args": ["b"], "env": {"A": "1", "C": "3"}}
+        assert diff_settings("s", old, new) == [
+            SettingsChange("s", ("args",), "changed", old=["a"], new=["b"]),
+            SettingsChange("s", ("env", "B"), "removed", old="2"),
+            SettingsChange("s", ("env", "C"), "added", new="3"),
+        ]
+        assert diff_settings("s", old, old) == []
+        assert diff_settings("s", {"a": 1}, {"a": True}) == [
+            SettingsChange("s", ("a",), "changed", old=1, new=True),
+        ]
+
+
+class TestMcpPlan:
+    def test_plan(self):
+        McpEnum._get_plan_cache().clear()
+        config = {
+            "mcpServers": {
+                "mcp_2": {"command": "old"},
+                "mcp_3": McpEnum.mcp_3.value.settings,
+                "other": {"command": "other"},
+            }
+        }
+        snapshot = json.dumps(config)
+        plan = McpEnum.plan([McpEnum.mcp_1, McpEnum.mcp_2], config)
+        assert json.dumps(config) == snapshot  # no side effect
+        assert plan.wanted == {"mcp_1", "mcp_2"}
+        assert plan.add == ("mcp_1",)
+        assert plan.update == ("mcp_2",)
+        assert plan.remove == ("mcp_3",)
+        assert plan.unchanged == ()
+        assert plan.changed is True
+        assert SettingsChange(
+            "mcp_2", ("command",), "changed", old="old", new="npx"
+        ) in plan.diff
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            plan.add = ()
+        with pytest.raises(TypeError):
+            plan.settings["mcp_1"] = {}
+
+        # same state, same wanted set, the cached plan is reused
+        other_config = json.loads(snapshot)
+        assert McpEnum.plan({McpEnum.mcp_2, McpEnum.mcp_1}, other_config) is plan
+        # unmanaged servers don't matter
+        other_config["mcpServers"]["other"] = {"command": "changed"}
+        assert McpEnum.plan([McpEnum.mcp_1, McpEnum.mcp_2], other_config) is plan
+        assert len(McpEnum._get_plan_cache()) == 1
+
+        assert plan.execute(config) is True
+        assert config["mcpServers"] == {
+            "mcp_2": McpEnum.mcp_2.value.settings,
+            "other": {"command": "other"},
+            "mcp_1": McpEnum.mcp_1.value.settings,
+        }
+        noop = McpEnum.plan([McpEnum.mcp_1, McpEnum.mcp_2], config)
+        assert noop.changed is False
+        assert noop.unchanged == ("mcp_1", "mcp_2", "mcp_3")
+        assert noop.execute(config) is False
+
+    def test_plan_without_mcp_servers(self):
+        assert McpEnum.plan([], {}) == McpPlan(
+            wanted=frozenset(),
+            input_fingerprint=McpEnum.plan([], {}).input_fingerprint,
+            unchanged=("mcp_1", "mcp_2", "mcp_3"),
+        )
+        config = {}
+        assert McpEnum.plan([McpEnum.mcp_1], config).execute(config) is True
+        assert config == {"mcpServers": {"mcp_1": McpEnum.mcp_1.value.settings}}
+
+    @pytest.mark.parametrize("concurrency", [None, "lock", "optimistic"])
+    def test_apply_plan(self, tmp_path, concurrency):
+        path_1 = tmp_path / "1.json"
+        path_2 = tmp_path / "2.json"
+        for path in [path_1, path_2]:
+            path.write_text(json.dumps({"mcpServers": {"mcp_2": {}}}))
+        cdc_1 = ClaudeDesktopConfig(path=path_1)
+        cdc_2 = ClaudeDesktopConfig(path=path_2)
+        wanted_mcps = [McpEnum.mcp_1]
+        plan = McpEnum.plan(wanted_mcps, cdc_1.read())
+        expected = {"mcpServers": {"mcp_1": McpEnum.mcp_1.value.settings}}
+        assert McpEnum.apply_plan(plan, cdc_1, concurrency=concurrency) is True
+        assert cdc_1.read() == expected
+
+        # a stale plan is recomputed
+        path_2.write_text(json.dumps({"mcpServers": {"mcp_3": {}}}))
+        assert McpEnum.apply_plan(plan, cdc_2, concurrency=concurrency) is True
+        assert cdc_2.read() == expected
+        assert McpEnum.apply_plan(plan, cdc_2, concurrency=concurrency) is False
+
 
 # Clean up test file after tests
 def teardown_module():
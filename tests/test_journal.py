@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from claude_desktop_config.tests.helper import make_configs
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.batch import (
+    apply_many,
+    apply_many_async,
+    resume_many,
+    STATUS_CHANGED,
+    STATUS_UNCHANGED,
+    STATUS_ERROR,
+)
+from claude_desktop_config.journal import (
+    get_fingerprint,
+    read_fingerprint,
+    JournalEntry,
+    JournalState,
+    Journal,
+)
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+    mcp_2 = Mcp(name="mcp_2", settings={"command": "npx", "args": ["mcp2"]})
+
+
+class OtherMcpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+
+
+ENUM_NAME = f"{__name__}:McpEnum"
+
+
+def read_records(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_bytes().splitlines()]
+
+
+def test_fingerprint(tmp_path):
+    path = tmp_path / "config.json"
+    assert read_fingerprint(path) is None
+    path.write_bytes(b"{}")
+    assert read_fingerprint(path) == get_fingerprint(b"{}")
+    assert get_fingerprint(None) is None
+
+
+class TestJournal:
+    def test_read(self, tmp_path):
+        path = tmp_path / "journal" / "batch.journal"
+        assert Journal.read(path) == JournalState()
+        a, b, c = tmp_path / "a.json", tmp_path / "b.json", tmp_path / "c.json"
+        with Journal(path) as journal:
+            journal.begin("mod:Old", ["x"], [a])
+            journal.begin(ENUM_NAME, ["mcp_2", "mcp_1"], [a, b, c])
+            journal.intend(a, None, "1")
+            journal.done(a)
+            journal.intend(b, "1", "2")
+            journal.done(c)
+        journal.close()
+        state = Journal.read(path)
+        assert state.enum == ENUM_NAME
+        assert state.wanted == ["mcp_1", "mcp_2"]
+        assert state.unfinished == [b]
+        assert state.interrupted == [JournalEntry(path=b, before="1", after="2")]
+
+        # a crash during an append leaves a truncated last line
+        with open(path, "ab") as f:
+            f.write(b'{"type":"done","pa')
+        assert Journal.read(path) == state
+        # new records are appended after it
+        with Journal(path) as journal:
+            journal.done(b)
+        assert Journal.read(path).unfinished == []
+
+    def test_relative_paths(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with Journal("batch.journal") as journal:
+            journal.begin(ENUM_NAME, [], [Path("a.json")])
+        assert Journal.read(tmp_path / "batch.journal").unfinished == [
+            tmp_path / "a.json"
+        ]
+
+    def test_durable_and_buffered(self, tmp_path):
+        path = tmp_path / "batch.journal"
+        journal = Journal(path)
+        journal.begin(ENUM_NAME, [], [tmp_path / "a.json"])
+        journal.done(tmp_path / "a.json")
+        # the intent is on disk, the done record is still buffered
+        assert len(read_records(path)) == 1
+        journal.intend(tmp_path / "a.json", None, "1")
+        assert len(read_records(path)) == 3
+        journal.done(tmp_path / "a.json")
+        journal.close()
+        journal.close()
+        assert len(read_records(path)) == 4
+
+    def test_group_fsync(self, tmp_path, monkeypatch):
+        path = tmp_path / "batch.journal"
+        journal = Journal(path)
+        fsyncs = list()
+        entered = threading.Event()
+        release = threading.Event()
+        fsync = os.fsync
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            if len(fsyncs) == 1:
+                entered.set()
+                release.wait(5)
+            fsync(fd)
+
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        paths = [tmp_path / f"{i}.json" for i in range(20)]
+        first = threading.Thread(target=journal.intend, args=(paths[0], None, "0"))
+        first.start()
+        entered.wait(5)
+        # these intents are appended while the first fsync runs, they all
+        # share the next one
+        threads = [
+            threading.Thread(target=journal.intend, args=(p, None, "1"))
+            for p in paths[1:]
+        ]
+        for thread in threads:
+            thread.start()
+        while len(journal._buffer) < len(threads):
+            time.sleep(0.001)
+        release.set()
+        for thread in [first, *threads]:
+            thread.join()
+        monkeypatch.undo()
+        journal.close()
+        assert len(fsyncs) == 2
+        assert len(read_records(path)) == 20
+
+    def test_failed_fsync_is_retried(self, tmp_path, monkeypatch):
+        path = tmp_path / "batch.journal"
+        journal = Journal(path)
+
+        def fail(fd):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(os, "fsync", fail)
+        with pytest.raises(OSError):
+            journal.begin(ENUM_NAME, [], [tmp_path / "a.json"])
+        monkeypatch.undo()
+        journal.intend(tmp_path / "a.json", None, "1")
+        journal.close()
+        state = Journal.read(path)
+        assert state.enum == ENUM_NAME
+        assert len(state.interrupted) == 1
+
+
+class TestClaudeDesktopConfigJournal:
+    def test_write(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        with Journal(tmp_path / "batch.journal") as journal:
+            cdc = ClaudeDesktopConfig(path=path, journal=journal)
+            cdc.write({"theme": "dark"})
+            before = path.read_bytes()
+            cdc.write({"theme": "light"}, atomic=True)
+        records = read_records(journal.path)
+        assert [r["type"] for r in records] == ["intent", "done"] * 2
+        assert records[0]["before"] is None
+        assert records[2]["before"] == get_fingerprint(before)
+        assert records[2]["after"] == read_fingerprint(path)
+
+    def test_apply(self, tmp_path):
+        path = make_configs(tmp_path, 1)[0]
+        original = path.read_bytes()
+        with Journal(tmp_path / "batch.journal") as journal:
+            cdc = ClaudeDesktopConfig(path=path, journal=journal)
+            assert McpEnum.apply([McpEnum.mcp_1], cdc) is True
+            assert McpEnum.apply([McpEnum.mcp_1], cdc) is False
+            assert McpEnum.apply([McpEnum.mcp_2], cdc, concurrency="lock") is True
+        records = read_records(journal.path)
+        # an unchanged file is not recorded by the config itself
+        assert [r["type"] for r in records] == ["intent", "done"] * 2
+        assert records[0]["before"] == get_fingerprint(original)
+        assert records[2]["after"] == read_fingerprint(path)
+        assert list(cdc.read()["mcpServers"]) == ["mcp_2"]
+
+
+class TestBatchJournal:
+    def test_apply_many(self, tmp_path):
+        paths = make_configs(tmp_path, 6)
+        McpEnum.apply([McpEnum.mcp_1], ClaudeDesktopConfig(path=paths[0]))
+        paths[1].write_text("{not json")
+        journal_path = tmp_path / "batch.journal"
+        with Journal(journal_path) as journal:
+            results = apply_many(
+                McpEnum,
+                [McpEnum.mcp_1],
+                paths,
+                max_workers=3,
+                journal=journal,
+            )
+        assert [res.status for res in results] == [
+            STATUS_UNCHANGED,
+            STATUS_ERROR,
+        ] + [STATUS_CHANGED] * 4
+        state = Journal.read(journal_path)
+        assert state.enum == ENUM_NAME
+        assert state.wanted == ["mcp_1"]
+        assert state.unfinished == [paths[1]]
+        assert state.interrupted == []
+
+        # the failed file is fixed, only it is applied again
+        paths[1].write_text("{}")
+        results = resume_many(McpEnum, journal_path)
+        assert [(res.path, res.status) for res in results] == [
+            (paths[1], STATUS_CHANGED)
+        ]
+        assert Journal.read(journal_path).unfinished == []
+        assert resume_many(McpEnum, journal_path) == []
+
+    def test_resume_interrupted(self, tmp_path):
+        paths = make_configs(tmp_path, 4)
+        journal_path = tmp_path / "batch.journal"
+        # simulate a batch killed while writing paths[1] and paths[2], after
+        # the write of paths[1] and before the write of paths[2]
+        with Journal(journal_path) as journal:
+            journal.begin(ENUM_NAME, ["mcp_1"], paths)
+            cdc = ClaudeDesktopConfig(path=paths[0], journal=journal)
+            McpEnum.apply([McpEnum.mcp_1], cdc)
+            for path in paths[1:3]:
+                data = json.dumps({"mcpServers": {"mcp_1": {}}}).encode()
+                journal.intend(path, read_fingerprint(path), get_fingerprint(data))
+            paths[1].write_bytes(data)
+        state = Journal.read(journal_path)
+        assert state.unfinished == paths[1:]
+        assert [entry.is_applied() for entry in state.interrupted] == [True, False]
+
+        results = resume_many(McpEnum, journal_path, max_workers=2)
+        assert [(res.path, res.status) for res in results] == [
+            (paths[2], STATUS_CHANGED),
+            (paths[3], STATUS_CHANGED),
+        ]
+        assert Journal.read(journal_path) == JournalState(
+            enum=ENUM_NAME, wanted=["mcp_1"]
+        )
+
+    def test_resume_errors(self, tmp_path):
+        assert resume_many(McpEnum, tmp_path / "missing.journal") == []
+        journal_path = tmp_path / "batch.journal"
+        with Journal(journal_path) as journal:
+            apply_many(McpEnum, [], [], journal=journal)
+            with pytest.raises(ValueError):
+                apply_many(McpEnum, [], [], use_process=True, journal=journal)
+        with pytest.raises(ValueError):
+            resume_many(OtherMcpEnum, journal_path)
+
+    def test_apply_many_async(self, tmp_path):
+        paths = make_configs(tmp_path, 4)
+        journal_path = tmp_path / "batch.journal"
+
+        async def main():
+            with Journal(journal_path) as journal:
+                return [
+                    res
+                    async for res in apply_many_async(
+                        McpEnum,
+                        [McpEnum.mcp_2],
+                        paths,
+                        max_concurrency=2,
+                        journal=journal,
+                    )
+                ]
+
+        results = asyncio.run(main())
+        assert {res.status for res in results} == {STATUS_CHANGED}
+        state = Journal.read(journal_path)
+        assert state.wanted == ["mcp_2"] and state.unfinished == []
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.journal",
+        preview=False,
+    )
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import weakref
+
+import pytest
+
+from claude_desktop_config import layers
+from claude_desktop_config.impl import (
+    ClaudeDesktopConfig,
+    FrozenDict,
+    Mcp,
+    BaseMcpEnum,
+    fingerprint_settings,
+)
+from claude_desktop_config.layers import (
+    MODE_REPLACE,
+    MODE_MERGE,
+    Layer,
+    MergedLayers,
+    merge_layers,
+)
+from claude_desktop_config.metrics import COUNTER_MERGES_CACHED, instrument
+
+
+class CompanyMcpEnum(BaseMcpEnum):
+    github = Mcp(
+        name="github",
+        settings={"command": "npx", "env": {"ORG": "acme", "LEVEL": "1"}},
+    )
+    slack = Mcp(name="slack", settings={"command": "npx", "args": ["slack"]})
+
+
+@pytest.fixture(autouse=True)
+def clear_merge_cache():
+    layers._merge_cache.clear()
+    yield
+    layers._merge_cache.clear()
+
+
+class TestLayer:
+    def test_fingerprint(self):
+        layer = Layer({"a": {"command": "x", "n": 1}, "b": None})
+        assert isinstance(layer.servers, FrozenDict)
+        # same content, same fingerprint
+        assert Layer({"b": None, "a": {"n": 1.0, "command": "x"}}) == layer
+        assert (
+            Layer({"b": None, "a": {"n": 1.0, "command": "x"}}).fingerprint
+            == layer.fingerprint
+        )
+        assert Layer({"a": {"command": "x", "n": 1}}).fingerprint != layer.fingerprint
+        other_mode = Layer(layer.servers, mode=MODE_MERGE)
+        assert other_mode.fingerprint != layer.fingerprint
+        with pytest.raises(ValueError):
+            Layer({}, mode="append")
+
+    def test_from_enum(self):
+        layer = Layer.from_enum(CompanyMcpEnum)
+        assert layer.mode == MODE_REPLACE
+        assert layer.servers == {
+            "github": CompanyMcpEnum.github.value.settings,
+            "slack": CompanyMcpEnum.slack.value.settings,
+        }
+        layer = Layer.from_enum(CompanyMcpEnum, [CompanyMcpEnum.slack])
+        assert layer.servers["github"] is None
+
+
+class TestMergeLayers:
+    def test_rules(self):
+        team = Layer(
+            {
+                "github": {"env": {"LEVEL": None, "TEAM": "data"}},
+                "jira": {"command": "jira", "debug": None},
+            },
+            mode=MODE_MERGE,
+        )
+        user = {"slack": None, "notes": {"command": "notes"}}
+        merged = merge_layers([CompanyMcpEnum, team, user])
+        assert merged.servers == {
+            "github": {"command": "npx", "env": {"ORG": "acme", "TEAM": "data"}},
+            "jira": {"command": "jira"},
+            "notes": {"command": "notes"},
+        }
+        assert merged.removed == {"slack"}
+        assert merged.fingerprints == {
+            name: fingerprint_settings(settings)
+            for name, settings in merged.servers.items()
+        }
+
+        # a later layer defines a removed server again, a replace drops the
+        # previous settings
+        merged = merge_layers(
+            [CompanyMcpEnum, user, {"slack": {"command": "new"}, "github": {}}]
+        )
+        assert merged.servers == {
+            "github": {},
+            "notes": {"command": "notes"},
+            "slack": {"command": "new"},
+        }
+        assert merged.removed == frozenset()
+        assert merge_layers([]) == MergedLayers(servers={})
+
+    def test_enum_class_is_freed(self):
+        class McpEnum(BaseMcpEnum):
+            a = Mcp(name="a", settings={"command": "a"})
+
+        assert merge_layers([McpEnum]).servers == {"a": {"command": "a"}}
+        ref = weakref.ref(McpEnum)
+        del McpEnum
+        gc.collect()
+        assert ref() is None
+
+    def test_memoized(self):
+        team = Layer({"jira": {"command": "jira"}})
+        with instrument() as stats:
+            first = merge_layers([CompanyMcpEnum, team])
+            assert merge_layers([CompanyMcpEnum, team]) is first
+            # the shared leading layers are reused, only the last is merged
+            user_1 = merge_layers([CompanyMcpEnum, team, {"a": {"command": "1"}}])
+            user_2 = merge_layers([CompanyMcpEnum, team, {"a": {"command": "2"}}])
+        assert stats.counters[COUNTER_MERGES_CACHED] == 3
+        assert user_1.servers["github"] is user_2.servers["github"]
+        assert user_1.servers["a"] == {"command": "1"}
+        assert len(layers._merge_cache) == 4
+
+    def test_execute(self, tmp_path):
+        path = tmp_path / "claude_desktop_config.json"
+        path.write_text('{"mcpServers": {"slack": {}, "mine": {}}, "theme": "dark"}')
+        cdc = ClaudeDesktopConfig(path=path)
+        merged = merge_layers([CompanyMcpEnum, {"slack": None}])
+        assert cdc.update(merged.execute) is True
+        assert cdc.read() == {
+            "mcpServers": {
+                "mine": {},
+                "github": {"command": "npx", "env": {"ORG": "acme", "LEVEL": "1"}},
+            },
+            "theme": "dark",
+        }
+        assert cdc.update(merged.execute) is False
+        change_set = merged.execute(cdc.read())
+        assert change_set.unchanged == ["github", "slack"]
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.layers",
+        preview=False,
+    )
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+
+from claude_desktop_config import metrics
+from claude_desktop_config.metrics import (
+    PHASE_READ,
+    PHASE_PARSE,
+    PHASE_PLAN,
+    PHASE_SERIALIZE,
+    PHASE_WRITE,
+    COUNTER_BYTES_READ,
+    COUNTER_BYTES_WRITTEN,
+    COUNTER_SERVERS_COMPARED,
+    COUNTER_PLANS_CACHED,
+    COUNTER_WRITES_SKIPPED,
+    Collector,
+    MetricsAggregator,
+    percentile,
+    instrument,
+)
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.batch import apply_many
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+    mcp_2 = Mcp(name="mcp_2", settings={"command": "npx", "args": ["mcp2"]})
+
+
+def make_cdc(tmp_path, name: str = "claude_desktop_config.json", **kwargs):
+    path = tmp_path / name
+    config = {"mcpServers": {"mcp_2": {"command": "old"}}, "theme": "dark"}
+    path.write_text(json.dumps(config, indent=4))
+    return ClaudeDesktopConfig(path=path, **kwargs)
+
+
+class ListCollector(Collector):
+    def __init__(self):
+        self.events = list()
+
+    def record(self, phase: str, seconds: float):
+        self.events.append(("record", phase))
+
+    def count(self, name: str, value: int):
+        self.events.append(("count", name, value))
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile(values, 0) == 1.0
+
+
+class TestMetricsAggregator:
+    def test_record_and_count(self):
+        stats = MetricsAggregator()
+        for i in range(1, 101):
+            stats.record(PHASE_READ, i / 1000)
+        stats.record("custom", 0.5)
+        stats.count(COUNTER_BYTES_READ, 10)
+        stats.count(COUNTER_BYTES_READ, 5)
+        assert stats.percentiles(PHASE_READ) == (0.05, 0.095, 0.099)
+        assert stats.percentiles(PHASE_WRITE) == (0.0, 0.0, 0.0)
+        assert stats.counters == {COUNTER_BYTES_READ: 15}
+
+        lines = stats.summary().splitlines()
+        assert lines[0].split() == ["phase", "count", "total", "p50", "p95", "p99"]
+        assert lines[1].split() == [
+            "read",
+            "100",
+            "5050.000ms",
+            "50.000ms",
+            "95.000ms",
+            "99.000ms",
+        ]
+        # unknown phases come after the known ones
+        assert lines[2].split()[:2] == ["custom", "1"]
+        assert lines[3] == "bytes_read=15"
+
+        stats.clear()
+        assert stats.durations == {} and stats.counters == {}
+        assert len(stats.summary().splitlines()) == 1
+
+
+class TestInstrument:
+    def test_disabled(self):
+        assert metrics._collectors == ()
+        assert metrics.phase(PHASE_READ) is metrics.phase(PHASE_PARSE)
+        with metrics.phase(PHASE_READ):
+            pass
+        metrics.count(COUNTER_BYTES_READ, 1)
+
+    def test_nested(self, capsys):
+        outer = ListCollector()
+        with instrument(outer) as collector:
+            assert collector is outer
+            with instrument(print_summary=True) as inner:
+                with metrics.phase(PHASE_READ):
+                    pass
+                metrics.count(COUNTER_BYTES_READ, 3)
+            metrics.count(COUNTER_BYTES_READ, 1)
+        assert metrics._collectors == ()
+        assert outer.events == [
+            ("record", PHASE_READ),
+            ("count", COUNTER_BYTES_READ, 3),
+            ("count", COUNTER_BYTES_READ, 1),
+        ]
+        assert inner.counters == {COUNTER_BYTES_READ: 3}
+        assert "bytes_read=3" in capsys.readouterr().err
+
+    def test_phase_recorded_on_error(self):
+        with instrument() as stats:
+            try:
+                with metrics.phase(PHASE_PARSE):
+                    raise ValueError
+            except ValueError:
+                pass
+        assert len(stats.durations[PHASE_PARSE]) == 1
+
+
+class TestHotPaths:
+    def test_apply(self, tmp_path):
+        cdc = make_cdc(tmp_path)
+        nbytes = cdc.path.stat().st_size
+        with instrument() as stats:
+            assert McpEnum.apply([McpEnum.mcp_1, McpEnum.mcp_2], cdc) is True
+        assert set(stats.durations) == {
+            PHASE_READ,
+            PHASE_PARSE,
+            PHASE_PLAN,
+            PHASE_SERIALIZE,
+            PHASE_WRITE,
+        }
+        assert stats.counters == {
+            COUNTER_BYTES_READ: nbytes,
+            COUNTER_BYTES_WRITTEN: cdc.path.stat().st_size,
+            COUNTER_SERVERS_COMPARED: 1,
+        }
+
+        with instrument() as stats:
+            assert McpEnum.apply([McpEnum.mcp_1, McpEnum.mcp_2], cdc) is False
+            assert McpEnum.apply([McpEnum.mcp_1, McpEnum.mcp_2], cdc) is False
+        assert PHASE_WRITE not in stats.durations
+        assert stats.counters[COUNTER_WRITES_SKIPPED] == 2
+        assert stats.counters[COUNTER_PLANS_CACHED] == 1
+
+    def test_apply_plan_and_update(self, tmp_path):
+        cdc = make_cdc(tmp_path)
+        plan = McpEnum.plan([McpEnum.mcp_1], cdc.read())
+        with instrument() as stats:
+            McpEnum.apply_plan(plan, cdc, concurrency="lock")
+            McpEnum.apply_plan(plan, cdc, concurrency="optimistic")
+        assert len(stats.durations[PHASE_PLAN]) == 2
+        assert len(stats.durations[PHASE_WRITE]) == 1
+        assert stats.counters[COUNTER_WRITES_SKIPPED] == 1
+
+    def test_write_and_session(self, tmp_path):
+        cdc = make_cdc(tmp_path)
+        with instrument() as stats:
+            config = cdc.read()
+            assert cdc.write(config, atomic=True) is False
+            cdc.write(config)
+            with cdc.session():
+                pass
+            with cdc.session(track=True) as doc:
+                assert cdc.write(doc) is False
+        assert stats.counters[COUNTER_WRITES_SKIPPED] == 4
+        assert len(stats.durations[PHASE_WRITE]) == 2
+
+    def test_minimal_edit_and_lazy(self, tmp_path, monkeypatch):
+        from claude_desktop_config import impl
+
+        monkeypatch.setattr(impl, "LAZY_READ_MIN_SIZE", 0)
+        monkeypatch.setattr(impl, "MMAP_READ_MIN_SIZE", 0)
+        for kwargs in [{"minimal_edit": True}, {"lazy": True}]:
+            cdc = make_cdc(tmp_path, **kwargs)
+            nbytes = cdc.path.stat().st_size
+            with instrument() as stats:
+                McpEnum.apply([McpEnum.mcp_1], cdc)
+                McpEnum.apply([McpEnum.mcp_2], cdc, concurrency="lock")
+            assert len(stats.durations[PHASE_READ]) == 2
+            assert len(stats.durations[PHASE_PARSE]) == 2
+            assert stats.counters[COUNTER_BYTES_READ] >= nbytes
+
+    def test_apply_many_threads(self, tmp_path):
+        cdcs = [make_cdc(tmp_path, name=f"{i}.json") for i in range(8)]
+        main_thread = threading.get_ident()
+        threads = set()
+
+        class ThreadCollector(MetricsAggregator):
+            def record(self, phase: str, seconds: float):
+                threads.add(threading.get_ident())
+                super().record(phase, seconds)
+
+        with instrument(ThreadCollector()) as stats:
+            apply_many(McpEnum, [McpEnum.mcp_1], cdcs, max_workers=4)
+        assert len(stats.durations[PHASE_WRITE]) == 8
+        assert threads and main_thread not in threads
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.metrics",
+        preview=False,
+    )
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import weakref
+
+import pytest
+
+from claude_desktop_config import metrics
+from claude_desktop_config.impl import (
+    ClaudeDesktopConfig,
+    ReadCache,
+    Mcp,
+    BaseMcpEnum,
+)
+from claude_desktop_config.metrics import instrument
+from claude_desktop_config.profile import McpProfile
+from claude_desktop_config.snapshot import SnapshotStore
+
+# hand written, 2 spaces indentation and an unmanaged server
+TEXT = """{
+  "preferences": {"theme": "dark",   "fonts": [1, 2, 3]},
+  "mcpServers": {
+    "mine": {"command": "mine"},
+    "a": {"command": "old"}
+  },
+  "cache": [ {"id": 1}, {"id": 2} ]
+}
+"""
+
+
+def make_enum_class():
+    # a new class per test, profiles and caches are per enum class
+    class McpEnum(BaseMcpEnum):
+        a = Mcp(name="a", settings={"command": "npx", "args": ["a"]})
+        b = Mcp(name="b", settings={"command": "npx", "args": ["b"]})
+        c = Mcp(name="c", settings={"command": "npx", "args": ["c"]})
+
+    McpEnum.register_profile("minimal", [McpEnum.a])
+    McpEnum.register_profile("full", [McpEnum.a, McpEnum.b, McpEnum.c])
+    return McpEnum
+
+
+@pytest.fixture
+def McpEnum():
+    return make_enum_class()
+
+
+def make_cdc(tmp_path, text: str = TEXT, name: str = "config.json", **kwargs):
+    path = tmp_path / name
+    path.write_text(text)
+    return ClaudeDesktopConfig(path=path, **kwargs)
+
+
+def test_register_profile(McpEnum):
+    profile = McpEnum.register_profile("dev", [McpEnum.a, McpEnum.b])
+    assert profile == McpProfile(name="dev", wanted=frozenset(["a", "b"]))
+    assert list(McpEnum._get_profiles()) == ["minimal", "full", "dev"]
+    assert McpEnum.register_profile("dev", [McpEnum.b]).wanted == {"b"}
+
+
+def test_enum_class_is_freed(tmp_path):
+    McpEnum = make_enum_class()
+    cdc = make_cdc(tmp_path)
+    McpEnum.switch_profile("full", cdc)
+    McpEnum.apply([McpEnum.b], cdc)
+    ref = weakref.ref(McpEnum)
+    del McpEnum
+    gc.collect()
+    assert ref() is None
+
+
+class TestSwitchProfile:
+    def test_same_result_as_apply(self, tmp_path, McpEnum):
+        for name, wanted in [
+            ("full", [McpEnum.a, McpEnum.b, McpEnum.c]),
+            ("minimal", [McpEnum.a]),
+        ]:
+            cdc_switch = make_cdc(tmp_path, name="switch.json")
+            cdc_apply = make_cdc(tmp_path, name="apply.json")
+            assert McpEnum.switch_profile(name, cdc_switch) is True
+            assert McpEnum.apply(wanted, cdc_apply) is True
+            assert cdc_switch.read() == cdc_apply.read()
+            assert McpEnum.switch_profile(name, cdc_switch) is False
+
+        # every byte outside of mcpServers is kept
+        text = cdc_switch.path.read_text()
+        assert text.startswith(TEXT[: TEXT.index('"mcpServers"')])
+        assert text.endswith(TEXT[TEXT.index('  "cache"') - 2 :])
+        assert '"mine": {"command": "mine"}' in text
+
+    def test_switch_back_and_forth(self, tmp_path, McpEnum):
+        cdcs = [make_cdc(tmp_path, name=f"{i}.json") for i in range(5)]
+        # the first round serializes the new states
+        for name in ["minimal", "full", "minimal"]:
+            for cdc in cdcs:
+                McpEnum.switch_profile(name, cdc)
+        with instrument() as stats:
+            for _ in range(3):
+                for cdc in cdcs:
+                    assert McpEnum.switch_profile("full", cdc) is True
+                for cdc in cdcs:
+                    assert McpEnum.switch_profile("minimal", cdc) is True
+        assert stats.counters[metrics.COUNTER_FRAGMENTS_CACHED] == 30
+        assert metrics.PHASE_PLAN not in stats.durations
+        assert McpEnum.switch_profile("minimal", cdcs[0]) is False
+
+    def test_precomputed(self, tmp_path, McpEnum):
+        # a file written by this library, switched for the first time
+        cdc = make_cdc(tmp_path, text="{}")
+        McpEnum.apply([McpEnum.a], cdc)
+        with instrument() as stats:
+            assert McpEnum.switch_profile("full", cdc) is True
+        assert stats.counters[metrics.COUNTER_FRAGMENTS_CACHED] == 1
+        assert list(cdc.read()["mcpServers"]) == ["a", "b", "c"]
+
+    def test_fallback_to_apply(self, tmp_path, McpEnum):
+        # no mcpServers object to splice into
+        cdc = make_cdc(tmp_path, text='{"theme": "dark"}')
+        assert McpEnum.switch_profile("minimal", cdc, concurrency="lock") is True
+        assert cdc.read() == {
+            "theme": "dark",
+            "mcpServers": {"a": {"command": "npx", "args": ["a"]}},
+        }
+        with pytest.raises(FileNotFoundError):
+            McpEnum.switch_profile("minimal", ClaudeDesktopConfig(tmp_path / "x"))
+
+    def test_unknown_profile(self, tmp_path, McpEnum):
+        with pytest.raises(ValueError):
+            McpEnum.switch_profile("dev", make_cdc(tmp_path))
+
+    @pytest.mark.parametrize("concurrency", ["lock", "optimistic"])
+    def test_concurrency(self, tmp_path, McpEnum, concurrency):
+        cdc = make_cdc(tmp_path)
+        assert McpEnum.switch_profile("full", cdc, concurrency=concurrency)
+        assert not McpEnum.switch_profile("full", cdc, concurrency=concurrency)
+        with pytest.raises(ValueError):
+            McpEnum.switch_profile("full", cdc, concurrency="none")
+
+    def test_cache_and_snapshots(self, tmp_path, McpEnum):
+        store = SnapshotStore(tmp_path / "snapshots")
+        cdc = make_cdc(tmp_path, cache=ReadCache(), snapshots=store)
+        original = cdc.path.read_bytes()
+        assert "b" not in cdc.read()["mcpServers"]
+        McpEnum.switch_profile("full", cdc)
+        # the cached config of the old content is not returned
+        assert "b" in cdc.read()["mcpServers"]
+        [snap] = store.history(cdc.path)
+        assert store.read(snap) == original
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.profile",
+        preview=False,
+    )
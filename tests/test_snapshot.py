@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+
+import pytest
+
+from claude_desktop_config import snapshot
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.snapshot import Snapshot, SnapshotStore
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+
+
+def write_config(path, config) -> bytes:
+    data = json.dumps(config, indent=4).encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return data
+
+
+def count_blobs(store: SnapshotStore) -> int:
+    return sum(1 for p in store.dir_blobs.glob("*/*") if not p.name.startswith("."))
+
+
+@pytest.fixture
+def store(tmp_path) -> SnapshotStore:
+    return SnapshotStore(tmp_path / "snapshots")
+
+
+class TestSnapshotStore:
+    def test_snapshot_and_history(self, tmp_path, store):
+        path = tmp_path / "a" / "claude_desktop_config.json"
+        assert store.snapshot(path) is None
+        assert store.history(path) == []
+        assert store.paths() == []
+
+        v1 = write_config(path, {"theme": "dark"})
+        snap_1 = store.snapshot(path)
+        assert isinstance(snap_1, Snapshot)
+        assert snap_1.path == path
+        # same content as the latest snapshot, nothing is added
+        assert store.snapshot(path) == snap_1
+
+        v2 = write_config(path, {"theme": "light"})
+        snap_2 = store.snapshot(path, data=v2)
+        write_config(path, {"theme": "dark"})
+        snap_3 = store.snapshot(path)
+        assert store.history(path) == [snap_1, snap_2, snap_3]
+        assert snap_1.time_ns <= snap_2.time_ns <= snap_3.time_ns
+        assert store.read(snap_1) == store.read(snap_3) == v1
+        assert store.read(snap_2) == v2
+        assert store.paths() == [path]
+        # the same content is stored once
+        assert count_blobs(store) == 2
+
+    def test_dedup_across_files(self, tmp_path, store):
+        paths = [tmp_path / f"user_{i}" / "config.json" for i in range(50)]
+        for path in paths:
+            write_config(path, {"mcpServers": {}})
+            store.snapshot(path)
+        assert count_blobs(store) == 1
+        assert sorted(store.paths()) == sorted(paths)
+        assert all(len(store.history(path)) == 1 for path in paths)
+
+    def test_compressed(self, tmp_path, store):
+        path = tmp_path / "config.json"
+        write_config(path, {"cache": ["x" * 100] * 100})
+        snap = store.snapshot(path)
+        blob_path = store._get_blob_path(snap.sha256)
+        assert blob_path.stat().st_size < path.stat().st_size / 10
+
+    def test_durable(self, tmp_path, store, monkeypatch):
+        path = tmp_path / "config.json"
+        v1 = write_config(path, {"theme": "dark"})
+        synced = list()
+        fsync = snapshot.os.fsync
+        monkeypatch.setattr(snapshot.os, "fsync", lambda fd: synced.append(fd))
+        snap_1 = store.snapshot(path)
+        # the blob and the new log
+        assert len(synced) == 2
+        write_config(path, {"theme": "light"})
+        store.snapshot(path)
+        # the blob and the append to the log
+        assert len(synced) == 4
+        monkeypatch.setattr(snapshot.os, "fsync", fsync)
+
+        # an empty blob left by a power loss is written again
+        blob_path = store._get_blob_path(snap_1.sha256)
+        blob_path.write_bytes(b"")
+        write_config(path, {"theme": "dark"})
+        store.snapshot(path)
+        assert store.read(snap_1) == v1
+
+    def test_restore(self, tmp_path, store):
+        path = tmp_path / "config.json"
+        v1 = write_config(path, {"theme": "dark"})
+        snap_1 = store.snapshot(path)
+        write_config(path, {"theme": "light"})
+        assert store.restore(snap_1) is True
+        assert path.read_bytes() == v1
+        assert store.restore(snap_1) is False
+        path.unlink()
+        assert store.restore(snap_1, fsync_dir=True) is True
+        assert path.read_bytes() == v1
+
+    def test_prune(self, tmp_path, store):
+        path_a = tmp_path / "a.json"
+        path_b = tmp_path / "b.json"
+        for i in range(5):
+            write_config(path_a, {"version": i})
+            store.snapshot(path_a)
+        write_config(path_b, {"version": 0})
+        store.snapshot(path_b)
+        assert count_blobs(store) == 5
+
+        # nothing to prune, blobs are kept
+        assert store.prune() == 0
+        assert count_blobs(store) == 5
+
+        assert store.prune(max_count=3) == 2
+        history = store.history(path_a)
+        assert [json.loads(store.read(s)) for s in history] == [
+            {"version": i} for i in (2, 3, 4)
+        ]
+        # version 0 is still referenced by b.json
+        assert count_blobs(store) == 3 + 1
+
+        [snap_b] = store.history(path_b)
+        now_ns = snap_b.time_ns
+        age = (now_ns - history[1].time_ns + 1000) / 1e9
+        assert store.prune(max_age=age, now_ns=now_ns) == 1
+        assert store.history(path_a) == history[1:]
+        assert store.history(path_b) == [snap_b]
+        assert count_blobs(store) == 3
+
+        assert store.prune(max_count=0) == 3
+        assert store.paths() == []
+        assert count_blobs(store) == 0
+        assert SnapshotStore(tmp_path / "empty").prune(max_count=1) == 0
+
+    def test_concurrent_snapshots(self, tmp_path, store):
+        path = tmp_path / "config.json"
+        contents = [json.dumps({"i": i}).encode() for i in range(40)]
+
+        def take(data: bytes):
+            store.snapshot(path, data=data)
+
+        threads = [threading.Thread(target=take, args=(c,)) for c in contents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        history = store.history(path)
+        assert sorted(store.read(s) for s in history) == sorted(contents)
+
+
+class TestClaudeDesktopConfigSnapshots:
+    def test_write(self, tmp_path, store):
+        path = tmp_path / "claude_desktop_config.json"
+        cdc = ClaudeDesktopConfig(path=path, snapshots=store)
+        # no snapshot of a file that doesn't exist yet
+        cdc.write({"theme": "dark"})
+        assert store.history(path) == []
+        before = path.read_bytes()
+        cdc.write({"theme": "light"}, atomic=True)
+        [snap] = store.history(path)
+        assert store.read(snap) == before
+
+    def test_update_and_apply(self, tmp_path, store):
+        path = tmp_path / "claude_desktop_config.json"
+        original = write_config(path, {"mcpServers": {}})
+        cdc = ClaudeDesktopConfig(path=path, snapshots=store)
+        assert McpEnum.apply([McpEnum.mcp_1], cdc, concurrency="lock") is True
+        # unchanged, no write and no snapshot
+        assert McpEnum.apply([McpEnum.mcp_1], cdc, concurrency="lock") is False
+        [snap] = store.history(path)
+        assert store.read(snap) == original
+        store.restore(snap)
+        assert cdc.read() == {"mcpServers": {}}
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.snapshot",
+        preview=False,
+    )
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+
+import json
+import random
+
+import pytest
+
+from claude_desktop_config import impl
+from claude_desktop_config.impl import (
+    ClaudeDesktopConfig,
+    ConflictError,
+    ReadCache,
+    BaseMcpEnum,
+    Mcp,
+    enable_mcp_server,
+    disable_mcp_server,
+)
+from claude_desktop_config.codec import StdlibJsonCodec, get_default_codec
+from claude_desktop_config.document import ConfigDocument
+from claude_desktop_config.source_map import (
+    parse_with_source_map,
+    locate_servers,
+    parse_lazy,
+    splice,
+)
+
+# hand written, 2 spaces indentation and odd spacing
+TEXT = """{
+  "preferences": {"theme": "dark",   "fonts": [1, 2, 3]},
+  "mcpServers": {
+    "a": {"command": "a", "args": ["x"]},
+    "b": {
+      "command": "b"
+    }
+  },
+  "cache": [ {"id": 1}, {"id": 2} ]
+}
+"""
+
+
+def dumps(value) -> str:
+    return json.dumps(value, indent=4)
+
+
+def make_cdc(tmp_path, text: str = TEXT, **kwargs) -> ClaudeDesktopConfig:
+    path = tmp_path / "claude_desktop_config.json"
+    path.write_text(text)
+    return ClaudeDesktopConfig(path=path, minimal_edit=True, **kwargs)
+
+
+class TestParseWithSourceMap:
+    def test_offsets(self):
+        config, source = parse_with_source_map(TEXT)
+        assert config == json.loads(TEXT)
+        for key, span in source.root.entries.items():
+            assert TEXT[span.start : span.value_start].startswith(json.dumps(key))
+            assert json.loads(TEXT[span.value_start : span.end]) == config[key]
+        for key, span in source.servers.entries.items():
+            value = config["mcpServers"][key]
+            assert json.loads(TEXT[span.value_start : span.end]) == value
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            '{"a": 1, "a": 2}',
+            '{"mcpServers": {"a": {}, "a": {}}}',
+            "[1, 2]",
+            '{"a": 1} trailing',
+            '{"a": NaN}',
+        ],
+    )
+    def test_unsupported(self, text):
+        try:
+            expected = json.loads(text)
+        except json.JSONDecodeError:
+            with pytest.raises(json.JSONDecodeError):
+                parse_with_source_map(text)
+        else:
+            config, source = parse_with_source_map(text)
+            assert config == expected
+            if text != '{"a": NaN}':
+                assert source is None
+
+
+def random_value(rnd: random.Random, depth: int = 0):
+    kind = rnd.randrange(6 if depth < 3 else 3)
+    if kind == 0:
+        return rnd.choice(["x", "é", 'a"b', ""])
+    elif kind == 1:
+        return rnd.choice([0, -1, 1.5, True, None])
+    elif kind == 2:
+        return rnd.choice([{}, []])
+    elif kind == 3:
+        return [random_value(rnd, depth + 1) for _ in range(rnd.randrange(3))]
+    return {f"k{i}": random_value(rnd, depth + 1) for i in range(rnd.randrange(3))}
+
+
+class TestSplice:
+    def test_keeps_untouched_bytes(self):
+        config, source = parse_with_source_map(TEXT)
+        doc = ConfigDocument(config, source=source)
+        doc["mcpServers"]["a"]["args"].append("y")
+        new_text, new_source = splice(source, doc, doc.dirty_paths, dumps)
+        assert json.loads(new_text) == doc
+        # only the "a" entry changed
+        a = source.servers.entries["a"]
+        assert new_text.startswith(TEXT[: a.value_start])
+        assert new_text.endswith(TEXT[a.end :])
+        assert '"args": [\n' in new_text
+
+        # the new source map is valid for the new text
+        doc.mark_clean()
+        doc["cache"] = []
+        newer_text, _ = splice(new_source, doc, doc.dirty_paths, dumps)
+        assert json.loads(newer_text) == doc
+        assert newer_text.startswith(new_text[: new_source.root.entries["cache"].start])
+
+    def test_whole_document_replaced(self):
+        config, source = parse_with_source_map(TEXT)
+        doc = ConfigDocument(config, source=source)
+        doc.clear()
+        assert splice(source, doc, doc.dirty_paths, dumps) is None
+
+    @pytest.mark.parametrize("seed", range(30))
+    def test_random_mutations(self, seed):
+        rnd = random.Random(seed)
+        texts = [TEXT, json.dumps(json.loads(TEXT)), "{}", '{ "mcpServers": { } }']
+        text = rnd.choice(texts)
+        config, source = parse_with_source_map(text)
+        doc = ConfigDocument(config, source=source)
+        for _ in range(3):
+            for _ in range(rnd.randrange(1, 5)):
+                op = rnd.randrange(5)
+                name = rnd.choice("abcd")
+                if op == 0:
+                    enable_mcp_server(doc, name, random_value(rnd, 1) or {})
+                elif op == 1:
+                    disable_mcp_server(doc, name)
+                elif op == 2:
+                    doc[rnd.choice(["preferences", "cache", "new"])] = random_value(rnd)
+                elif op == 3 and "preferences" in doc:
+                    del doc["preferences"]
+                elif op == 4 and doc.get("mcpServers"):
+                    doc["mcpServers"] = dict(reversed(doc["mcpServers"].items()))
+            text, source = splice(source, doc, doc.dirty_paths, dumps)
+            assert json.loads(text) == doc
+            assert list(json.loads(text)) == list(doc)
+            config, expected = parse_with_source_map(text)
+            assert source == expected
+            doc.mark_clean()
+
+
+class TestClaudeDesktopConfigMinimalEdit:
+    @pytest.mark.parametrize(
+        "codec",
+        [StdlibJsonCodec(), get_default_codec()],
+    )
+    def test_write(self, tmp_path, codec):
+        cdc = make_cdc(tmp_path, codec=codec)
+        doc = cdc.read(track=True)
+        assert doc.source is not None
+        enable_mcp_server(doc, "c", {"command": "c"})
+        assert cdc.write(doc) is True
+        text = cdc.path.read_text()
+        assert text.startswith(TEXT[: TEXT.index('\n  },\n  "cache"')])
+        assert text.endswith('\n  },\n  "cache": [ {"id": 1}, {"id": 2} ]\n}\n')
+        assert '    "c": {\n        "command": "c"\n    }\n' in text
+        assert cdc.read() == doc
+
+        # the document can be written again, from the new offsets
+        disable_mcp_server(doc, "c")
+        assert cdc.write(doc, atomic=True) is True
+        assert cdc.path.read_text() == TEXT
+
+    def test_stale_file(self, tmp_path):
+        cdc = make_cdc(tmp_path)
+        doc = cdc.read(track=True)
+        cdc.path.write_text(json.dumps(json.loads(TEXT)) + "  ")
+        enable_mcp_server(doc, "c", {"command": "c"})
+        cdc.write(doc)
+        # written in full, the offsets were stale
+        assert cdc.path.read_text() == json.dumps(doc, indent=4)
+        assert doc.source is None
+
+    def test_other_file(self, tmp_path):
+        cdc = make_cdc(tmp_path)
+        doc = cdc.read(track=True)
+        other = ClaudeDesktopConfig(path=tmp_path / "other.json", minimal_edit=True)
+        other.write(doc)
+        assert other.path.read_text() == json.dumps(doc, indent=4)
+
+    @pytest.mark.parametrize("concurrency", ["lock", "optimistic"])
+    def test_update(self, tmp_path, concurrency):
+        cdc = make_cdc(tmp_path)
+
+        def mutate(config):
+            config["mcpServers"]["b"]["command"] = "b2"
+
+        assert cdc.update(mutate, concurrency=concurrency, track=True) is True
+        # the "b" entry is serialized again, with the indentation of the file
+        b = TEXT[TEXT.index('{\n      "command": "b"') : TEXT.index("\n  },")]
+        expected = TEXT.replace(b, '{\n        "command": "b2"\n    }')
+        assert cdc.path.read_text() == expected
+
+    def test_session_and_enum(self, tmp_path):
+        cdc = make_cdc(tmp_path)
+        with cdc.session(track=True) as config:
+            config["preferences"]["theme"] = "light"
+        text = cdc.path.read_text()
+        assert text.endswith(TEXT[TEXT.index(',\n  "mcpServers"') :])
+
+        class McpEnum(BaseMcpEnum):
+            a = Mcp(name="a", settings={"command": "a", "args": ["x"]})
+            c = Mcp(name="c", settings={"command": "c"})
+
+        assert McpEnum.apply([McpEnum.a, McpEnum.c], cdc) is True
+        new_text = cdc.path.read_text()
+        assert json.loads(new_text)["mcpServers"] == {
+            "a": {"command": "a", "args": ["x"]},
+            "b": {"command": "b"},
+            "c": {"command": "c"},
+        }
+        # "a" and "b" were not touched
+        assert '    "b": {\n      "command": "b"\n    },\n' in new_text
+        assert '    "a": {"command": "a", "args": ["x"]},\n' in new_text
+        assert McpEnum.apply([McpEnum.a, McpEnum.c], cdc) is False
+
+
+class TestParseLazy:
+    def test_parse_lazy(self):
+        data = TEXT.encode("utf-8")
+        servers, source = parse_lazy(data)
+        assert servers == json.loads(TEXT)["mcpServers"]
+        assert source.indent == "  "
+        value = data[source.value_start : source.value_end]
+        assert value.decode("utf-8") == source.text
+        assert json.loads(value) == servers
+        assert locate_servers(data) == (
+            source.value_start,
+            source.value_end,
+            source.indent,
+        )
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "{}",
+            "[]",
+            '{"a": 1}',
+            '{"mcpServers": []}',
+            '{"mcpServers": {}, "mcpServers": {}}',
+            '{"mcpServers": {}, "a": {"mcpServers": {}}}',
+            '{"mcpServers": {}, "\\u006dcpServers": {}}',
+            '{"mcpServers": {"a": 1, "a": 2}}',
+            '{"mcpServers": {}} []',
+            '{"a": ' + "[" * 20 + "]" * 20 + ', "mcpServers": {}}',
+        ],
+    )
+    def test_parse_in_full(self, text):
+        assert parse_lazy(text.encode("utf-8")) is None
+
+    def test_skip(self):
+        text = json.dumps(
+            {
+                "a": 1,
+                "b": 'x"]}',
+                "c": [{"d": [None, True, "{["]}, -1.5e3],
+                "mcpServers": {"e": {"command": "é"}},
+                "f": "mcpServer",
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+        servers, source = parse_lazy(text.encode("utf-8"))
+        assert servers == {"e": {"command": "é"}}
+
+
+@pytest.fixture
+def lazy_cdc(tmp_path, monkeypatch):
+    monkeypatch.setattr(impl, "LAZY_READ_MIN_SIZE", 0)
+    path = tmp_path / "claude_desktop_config.json"
+    path.write_text(TEXT)
+    return ClaudeDesktopConfig(path=path, lazy=True)
+
+
+class TestClaudeDesktopConfigLazy:
+    def test_read_write(self, lazy_cdc):
+        cdc = lazy_cdc
+        doc = cdc.read(track=True)
+        assert doc.partial is True
+        assert dict.__len__(doc) == 1
+        enable_mcp_server(doc, "c", {"command": "c"})
+        disable_mcp_server(doc, "a")
+        assert doc.partial is True
+        assert cdc.write(doc) is True
+        text = cdc.path.read_text()
+        assert text.startswith(TEXT[: TEXT.index('    "a"')])
+        assert text.endswith(TEXT[TEXT.index('\n  },\n  "cache"') :])
+        assert json.loads(text)["mcpServers"] == {
+            "b": {"command": "b"},
+            "c": {"command": "c"},
+        }
+
+        # written again from the new offsets, then loaded
+        disable_mcp_server(doc, "c")
+        assert cdc.write(doc, atomic=True) is True
+        assert doc.partial is True
+        assert doc == json.loads(cdc.path.read_text())
+        assert doc.partial is False
+        assert list(doc) == ["preferences", "mcpServers", "cache"]
+
+    def test_load_on_access(self, lazy_cdc):
+        expected = json.loads(TEXT)
+        accesses = [
+            lambda doc: doc["preferences"],
+            lambda doc: doc.get("cache"),
+            lambda doc: "cache" in doc,
+            lambda doc: len(doc),
+            lambda doc: list(doc.items()),
+            lambda doc: repr(doc),
+            lambda doc: doc.pop("cache"),
+            lambda doc: doc.update(cache=1),
+            lambda doc: json.dumps(doc),
+        ]
+        for access in accesses:
+            doc = lazy_cdc.read(track=True)
+            assert doc["mcpServers"] == expected["mcpServers"]
+            assert "mcpServers" in doc
+            assert doc.partial is True
+            access(doc)
+            assert doc.partial is False
+        doc = lazy_cdc.read(track=True)
+        doc["mcpServers"]["a"]["command"] = "a2"
+        doc.load()
+        assert doc["mcpServers"]["a"]["command"] == "a2"
+        assert list(doc) == list(expected)
+
+    def test_write_other_key(self, lazy_cdc):
+        doc = lazy_cdc.read(track=True)
+        enable_mcp_server(doc, "c", {"command": "c"})
+        doc["cache"] = []
+        assert lazy_cdc.write(doc) is True
+        text = lazy_cdc.path.read_text()
+        assert text.startswith(TEXT[: TEXT.index('\n  },\n  "cache"')])
+        assert json.loads(text) == doc
+
+    def test_stale_file(self, lazy_cdc):
+        doc = lazy_cdc.read(track=True)
+        lazy_cdc.path.write_text(TEXT + " ")
+        with pytest.raises(ConflictError):
+            doc.load()
+        enable_mcp_server(doc, "c", {"command": "c"})
+        with pytest.raises(ConflictError):
+            lazy_cdc.write(doc)
+
+    def test_fallback(self, tmp_path):
+        # small files are read in full
+        cdc = make_cdc(tmp_path, lazy=True)
+        doc = cdc.read(track=True)
+        assert doc.partial is False
+        assert doc.source is not None
+
+    def test_update_and_enum(self, lazy_cdc):
+        cdc = lazy_cdc
+        cdc.cache = ReadCache()
+
+        def mutate(config):
+            assert config.partial is True
+            config["mcpServers"]["b"]["command"] = "b2"
+
+        assert cdc.update(mutate, concurrency="optimistic", track=True) is True
+        assert cdc.read()["mcpServers"]["b"] == {"command": "b2"}
+
+        class McpEnum(BaseMcpEnum):
+            a = Mcp(name="a", settings={"command": "a", "args": ["x"]})
+            c = Mcp(name="c", settings={"command": "c"})
+
+        for concurrency in [None, "lock"]:
+            assert McpEnum.apply([McpEnum.c], cdc, concurrency=concurrency) is True
+            assert McpEnum.apply([McpEnum.c], cdc, concurrency=concurrency) is False
+            assert cdc.read()["mcpServers"] == {
+                "b": {"command": "b2"},
+                "c": {"command": "c"},
+            }
+            text = cdc.path.read_text()
+            assert text.endswith(TEXT[TEXT.index('\n  },\n  "cache"') :])
+            doc = cdc.read(track=True)
+            disable_mcp_server(doc, "c")
+            cdc.write(doc)
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.source_map",
+        preview=False,
+    )
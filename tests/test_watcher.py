@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import threading
+from pathlib import Path
+
+import pytest
+
+from claude_desktop_config.tests.helper import make_configs
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config import watcher as watcher_module
+from claude_desktop_config.os_platform import IS_LINUX
+from claude_desktop_config.batch import STATUS_CHANGED, STATUS_UNCHANGED
+from claude_desktop_config.watcher import (
+    PollingBackend,
+    InotifyBackend,
+    McpDriftWatcher,
+    BACKEND_INOTIFY,
+    BACKEND_POLL,
+)
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "mcp_1"})
+    mcp_2 = Mcp(name="mcp_2", settings={"command": "mcp_2"})
+
+
+def wait_until(func, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if func():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+backends = [BACKEND_POLL]
+if IS_LINUX:
+    backends.append(BACKEND_INOTIFY)
+
+
+class TestBackend:
+    def test_polling_backend(self, tmp_path):
+        paths = make_configs(tmp_path, 2, as_str=True)
+        backend = PollingBackend(paths, interval=0.01)
+        assert backend.wait(timeout=0.05) == set()
+        with open(paths[1], "a") as f:
+            f.write(" ")
+        assert backend.wait(timeout=1) == {paths[1]}
+        backend.interrupt()
+        assert backend.wait(timeout=1) == set()
+        backend.close()
+
+    @pytest.mark.skipif(not IS_LINUX, reason="inotify is Linux only")
+    def test_inotify_backend(self, tmp_path):
+        paths = make_configs(tmp_path, 2, as_str=True)
+        # a file in a watched directory that is not watched
+        (tmp_path / "user_0" / "other.json").write_text("{}")
+        backend = InotifyBackend(paths)
+        try:
+            assert backend.wait(timeout=0.05) == set()
+            ClaudeDesktopConfig(path=Path(paths[0])).write({"a": 1}, atomic=True)
+            (tmp_path / "user_0" / "other.json").write_text("{}")
+            assert backend.wait(timeout=1) == {paths[0]}
+            backend.interrupt()
+            assert backend.wait(timeout=1) == set()
+        finally:
+            backend.close()
+
+    @pytest.mark.skipif(not IS_LINUX, reason="inotify is Linux only")
+    def test_inotify_backend_missing_dir(self, tmp_path):
+        with pytest.raises(OSError):
+            InotifyBackend([str(tmp_path / "missing" / "config.json")])
+
+
+class TestMcpDriftWatcher:
+    def test_reconcile(self, tmp_path):
+        paths = make_configs(tmp_path, 3, as_str=True)
+        watcher = McpDriftWatcher(
+            mcp_enum_class=McpEnum,
+            wanted_mcps=[McpEnum.mcp_1],
+            cdcs=paths,
+        )
+        results = watcher.reconcile()
+        assert [res.status for res in results] == [STATUS_CHANGED] * 3
+        # nothing changed on disk, nothing to do
+        assert watcher.reconcile() == []
+        # touched but the content is still right
+        with open(paths[0], "a") as f:
+            f.write(" ")
+        results = watcher.reconcile()
+        assert [res.status for res in results] == [STATUS_UNCHANGED]
+
+    def test_reconcile_edited_right_after_write(self, tmp_path, monkeypatch):
+        [path] = make_configs(tmp_path, 1, as_str=True)
+        watcher = McpDriftWatcher(McpEnum, [McpEnum.mcp_1], [path])
+        apply_one = watcher_module._apply_one
+        edits = list()
+
+        def apply_then_edit(args):
+            res = apply_one(args)
+            if not edits:
+                # a user edits the file before the watcher records its write
+                edits.append(1)
+                Path(path).write_text(json.dumps({"mcpServers": {}}))
+            return res
+
+        monkeypatch.setattr(watcher_module, "_apply_one", apply_then_edit)
+        assert [res.status for res in watcher.reconcile()] == [STATUS_CHANGED]
+        assert [res.status for res in watcher.reconcile()] == [STATUS_CHANGED]
+        assert watcher.reconcile() == []
+        assert list(json.loads(Path(path).read_text())["mcpServers"]) == ["mcp_1"]
+
+    def test_invalid_backend(self, tmp_path):
+        watcher = McpDriftWatcher(McpEnum, [], [], backend="invalid")
+        with pytest.raises(ValueError):
+            watcher.run()
+
+    @pytest.mark.parametrize("backend", backends)
+    def test_run(self, tmp_path, backend):
+        paths = make_configs(tmp_path, 3, as_str=True)
+        results = list()
+        watcher = McpDriftWatcher(
+            mcp_enum_class=McpEnum,
+            wanted_mcps=[McpEnum.mcp_1, McpEnum.mcp_2],
+            cdcs=paths,
+            debounce=0.05,
+            poll_interval=0.02,
+            backend=backend,
+            on_result=results.append,
+        )
+        thread = threading.Thread(target=watcher.run, daemon=True)
+        thread.start()
+        try:
+            assert wait_until(lambda: len(results) == 3)
+            # hand edit a file, it is restored
+            cdc = ClaudeDesktopConfig(path=Path(paths[1]))
+            config = cdc.read()
+            del config["mcpServers"]["mcp_2"]
+            config["mcpServers"]["manual"] = {"command": "manual"}
+            cdc.write(config)
+            assert wait_until(lambda: len(results) == 4)
+            assert results[3].status == STATUS_CHANGED
+            assert wait_until(
+                lambda: set(cdc.read()["mcpServers"]) == {"mcp_1", "mcp_2", "manual"}
+            )
+            # our own write must not trigger another re-apply
+            time.sleep(0.3)
+            assert len(results) == 4
+        finally:
+            watcher.stop()
+            thread.join(timeout=5)
+        assert not thread.is_alive()
+
+
+if __name__ == "__main__":
+    from claude_desktop_config.tests import run_cov_test
+
+    run_cov_test(
+        __file__,
+        "claude_desktop_config.watcher",
+        preview=False,
+    )
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load test configuration.
+
+Every run writes the results to ``tests_load/results/latest.json``.
+Set the ``CDC_LOAD_TEST_BASELINE`` environment variable to:
+
+- ``check``: fail the run if any benchmark regresses against
+  ``tests_load/baseline.json`` by more than ``CDC_LOAD_TEST_TOLERANCE``
+  (default ``0.5``, i.e. 50%).
+- ``update``: overwrite ``tests_load/baseline.json`` with this run.
+"""
+
+import os
+import json
+from pathlib import Path
+
+import pytest
+
+from claude_desktop_config.tests.bench import BenchReport, Regression
+
+dir_here = Path(__file__).absolute().parent
+path_baseline = dir_here / "baseline.json"
+path_results = dir_here / "results" / "latest.json"
+
+_report = BenchReport()
+_regressions: list[Regression] = list()
+
+
+@pytest.fixture(scope="session")
+def bench_report() -> BenchReport:
+    return _report
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _report.results:
+        return
+    _report.dump(path_results)
+    mode = os.environ.get("CDC_LOAD_TEST_BASELINE", "")
+    if mode == "update":
+        _report.dump(path_baseline)
+    elif mode == "check":
+        baseline = json.loads(path_baseline.read_text())
+        tolerance = float(os.environ.get("CDC_LOAD_TEST_TOLERANCE", "0.5"))
+        _regressions.extend(_report.compare(baseline, tolerance=tolerance))
+        if _regressions:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not _report.results:
+        return
+    terminalreporter.section("load test results")
+    for _, res in sorted(_report.results.items()):
+        terminalreporter.write_line(res.summary())
+    terminalreporter.write_line(f"results written to {path_results}")
+    if _regressions:
+        terminalreporter.section("regressions against baseline", red=True)
+        for regression in _regressions:
+            terminalreporter.write_line(str(regression))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+How ``BaseMcpEnum.apply`` scales with the number of enum members.
+"""
+
+import json
+
+import pytest
+
+from claude_desktop_config.impl import (
+    ClaudeDesktopConfig,
+    Mcp,
+    BaseMcpEnum,
+    enable_mcp_server,
+    disable_mcp_server,
+)
+from claude_desktop_config.tests.bench import run_bench
+
+
+def make_mcp_enum(n: int) -> type[BaseMcpEnum]:
+    return BaseMcpEnum(
+        f"McpEnum{n}",
+        {
+            f"mcp_{i}": Mcp(
+                name=f"mcp_{i}",
+                settings={
+                    "command": "npx",
+                    "args": ["-y", "mcp-remote", f"https://mcp{i}.example.com/sse"],
+                },
+            )
+            for i in range(n)
+        },
+    )
+
+
+def apply_reference(mcp_enum_class, wanted_mcps, config) -> bool:
+    """
+    The original implementation of the reconcile step, kept for comparison:
+    a membership scan of ``wanted_mcps`` for every enum member.
+    """
+    flag_list = list()
+    for mcp_enum in mcp_enum_class:
+        if mcp_enum in wanted_mcps:
+            flag = enable_mcp_server(
+                config,
+                name=mcp_enum.value.name,
+                settings=mcp_enum.value.settings,
+            )
+        else:
+            flag = disable_mcp_server(config, name=mcp_enum.value.name)
+        flag_list.append(flag)
+    return any(flag_list)
+
+
+# (members, repeat)
+members = [
+    (10, 200),
+    (100, 100),
+    (1_000, 20),
+    (10_000, 5),
+]
+
+
+@pytest.mark.parametrize("n,repeat", members)
+def test_apply_scaling(tmp_path, bench_report, n, repeat):
+    mcp_enum_class = make_mcp_enum(n)
+    # enable every other member, passed as a list like most callers do
+    wanted_mcps = list(mcp_enum_class)[::2]
+    other_mcps = list(mcp_enum_class)[1::2]
+    path = tmp_path / "claude_desktop_config.json"
+    path.write_text(json.dumps({}, indent=4))
+    cdc = ClaudeDesktopConfig(path=path)
+    assert mcp_enum_class.apply(wanted_mcps, cdc) is True
+    config = cdc.read()
+
+    # steady state: nothing to change
+    bench_report.add(
+        run_bench(
+            f"apply.unchanged.members={n}",
+            lambda: mcp_enum_class.apply(wanted_mcps, cdc),
+            repeat=repeat,
+            ops_per_call=n,
+        )
+    )
+
+    # every call flips the wanted set, half of the servers change
+    counter = [0]
+
+    def apply_flip():
+        counter[0] += 1
+        wanted = other_mcps if counter[0] % 2 else wanted_mcps
+        assert mcp_enum_class.apply(wanted, cdc) is True
+
+    bench_report.add(
+        run_bench(
+            f"apply.changed.members={n}",
+            apply_flip,
+            repeat=repeat,
+            ops_per_call=n,
+        )
+    )
+
+    # the reconcile step alone, original implementation
+    bench_report.add(
+        run_bench(
+            f"apply.reference_reconcile.members={n}",
+            lambda: apply_reference(mcp_enum_class, wanted_mcps, config),
+            repeat=min(repeat, 3) if n >= 10_000 else repeat,
+            ops_per_call=n,
+        )
+    )
+
+
+def test_plan_many_profiles(bench_report):
+    """
+    Plan 2,000 profiles that share 4 distinct states of 100 managed servers,
+    the plan is computed once per state and reused for the other profiles.
+    """
+    n, n_profiles, n_states = 100, 2_000, 4
+    mcp_enum_class = make_mcp_enum(n)
+    members = list(mcp_enum_class)
+    wanted_mcps = members[::2]
+    states = list()
+    for k in range(n_states):
+        config = {"mcpServers": {}}
+        for mcp_enum in members[k::n_states]:
+            config["mcpServers"][mcp_enum.value.name] = {"command": f"v{k}"}
+        states.append(json.dumps(config))
+    configs = [json.loads(states[i % n_states]) for i in range(n_profiles)]
+
+    def plan_all():
+        mcp_enum_class._get_plan_cache().clear()
+        plans = {id(mcp_enum_class.plan(wanted_mcps, config)) for config in configs}
+        assert len(plans) == n_states
+
+    bench_report.add(
+        run_bench(
+            f"plan.profiles={n_profiles}.states={n_states}.members={n}",
+            plan_all,
+            repeat=5,
+            ops_per_call=n_profiles,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of ``apply_many`` across many config files.
+"""
+
+import json
+
+import pytest
+
+from claude_desktop_config.impl import Mcp, BaseMcpEnum
+from claude_desktop_config.batch import apply_many, STATUS_ERROR
+from claude_desktop_config.tests.bench import run_bench
+
+
+# defined at module level so it can be sent to a process pool
+McpEnum = BaseMcpEnum(
+    "McpEnum",
+    {
+        f"mcp_{i}": Mcp(
+            name=f"mcp_{i}",
+            settings={
+                "command": "npx",
+                "args": ["-y", "mcp-remote", f"https://mcp{i}.example.com/sse"],
+            },
+        )
+        for i in range(50)
+    },
+    module=__name__,
+)
+wanted_a = list(McpEnum)[::2]
+wanted_b = list(McpEnum)[1::2]
+
+
+@pytest.mark.parametrize("n_files", [100, 1_000])
+@pytest.mark.parametrize(
+    "label,max_workers,use_process",
+    [
+        ("serial", 1, False),
+        ("threads=8", 8, False),
+        ("processes=4", 4, True),
+    ],
+)
+def test_apply_many(tmp_path, bench_report, n_files, label, max_workers, use_process):
+    paths = list()
+    for i in range(n_files):
+        path = tmp_path / f"user_{i}" / "claude_desktop_config.json"
+        path.parent.mkdir(parents=True)
+        path.write_text(json.dumps({"preferences": {"theme": "dark"}}, indent=4))
+        paths.append(path)
+
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        wanted = wanted_a if counter[0] % 2 else wanted_b
+        results = apply_many(
+            McpEnum,
+            wanted,
+            paths,
+            max_workers=max_workers,
+            use_process=use_process,
+            chunksize=32,
+        )
+        assert not any(res.status == STATUS_ERROR for res in results)
+
+    bench_report.add(
+        run_bench(
+            f"apply_many.{label}.files={n_files}",
+            run,
+            repeat=3,
+            ops_per_call=n_files,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of ``discover_claude_desktop_configs`` over many user homes,
+without cache, with a fresh cache, and serial vs threaded.
+"""
+
+import os
+import time
+
+import pytest
+
+from claude_desktop_config.discovery import (
+    RELATIVE_PATH_LINUX,
+    DiscoveryCache,
+    discover_claude_desktop_configs,
+)
+from claude_desktop_config.tests.bench import run_bench
+
+
+def make_homes(root, n_homes: int):
+    for i in range(n_homes):
+        home = root / f"user_{i}"
+        if i % 4 == 0:
+            home.mkdir(parents=True)
+            continue
+        path = home.joinpath(*RELATIVE_PATH_LINUX)
+        path.parent.mkdir(parents=True)
+        path.write_text("{}")
+    # out of the racy window, so the cache can be used
+    mtime_ns = time.time_ns() - 60_000_000_000
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.mark.parametrize("n_homes", [1_000, 10_000])
+@pytest.mark.parametrize(
+    "label,max_workers,cached",
+    [
+        ("serial", 1, False),
+        ("threads=16", 16, False),
+        ("cached.threads=16", 16, True),
+    ],
+)
+def test_discover(tmp_path, bench_report, n_homes, label, max_workers, cached):
+    root = tmp_path / "home"
+    make_homes(root, n_homes)
+    cache = DiscoveryCache() if cached else None
+
+    def run():
+        cdcs = discover_claude_desktop_configs(
+            roots=[root],
+            relative_path=RELATIVE_PATH_LINUX,
+            cache=cache,
+            max_workers=max_workers,
+        )
+        assert sum(1 for _ in cdcs) == n_homes - (n_homes + 3) // 4
+
+    bench_report.add(
+        run_bench(
+            f"discover.{label}.homes={n_homes}",
+            run,
+            repeat=3,
+            ops_per_call=n_homes,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cost of journaling a batch apply: ``apply_many`` with and without a
+``Journal``. Every call switches the wanted MCP set so every file is written.
+Journaled files are also written atomically, with an fsync each, the intents
+of concurrent workers share their fsyncs.
+"""
+
+import json
+
+import pytest
+
+from claude_desktop_config.impl import Mcp, BaseMcpEnum
+from claude_desktop_config.batch import apply_many
+from claude_desktop_config.journal import Journal
+from claude_desktop_config.tests.bench import run_bench
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+    mcp_2 = Mcp(name="mcp_2", settings={"command": "npx", "args": ["mcp2"]})
+
+
+@pytest.mark.parametrize("max_workers", [1, 16])
+@pytest.mark.parametrize("mode", ["plain", "journal"])
+def test_apply_many_journal(tmp_path, bench_report, max_workers, mode):
+    n_files = 200
+    paths = list()
+    for i in range(n_files):
+        path = tmp_path / "home" / f"user_{i}" / "claude_desktop_config.json"
+        path.parent.mkdir(parents=True)
+        path.write_text(json.dumps({"mcpServers": {}, "theme": "dark"}, indent=4))
+        paths.append(path)
+    journal = Journal(tmp_path / "batch.journal") if mode == "journal" else None
+    wanted_sets = [[McpEnum.mcp_1], [McpEnum.mcp_2]]
+    counter = [0]
+
+    def apply():
+        counter[0] += 1
+        results = apply_many(
+            McpEnum,
+            wanted_sets[counter[0] % 2],
+            paths,
+            max_workers=max_workers,
+            journal=journal,
+        )
+        assert all(res.changed for res in results)
+
+    bench_report.add(
+        run_bench(
+            f"apply_many_{mode}.workers={max_workers}.files={n_files}",
+            apply,
+            repeat=5,
+            ops_per_call=n_files,
+        )
+    )
+    if journal is not None:
+        journal.close()
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
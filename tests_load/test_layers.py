@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Merging the company, team and user layers of many users: a merge per user
+vs ``merge_layers``, which memoizes the merge of the shared layers. Users
+either have no override, or each has its own override layer.
+"""
+
+import pytest
+
+from claude_desktop_config import layers
+from claude_desktop_config.impl import Mcp, BaseMcpEnum
+from claude_desktop_config.layers import MODE_MERGE, Layer, merge_layers
+from claude_desktop_config.tests.bench import run_bench
+
+CompanyMcpEnum = BaseMcpEnum(
+    "CompanyMcpEnum",
+    {
+        f"mcp_{i}": Mcp(
+            name=f"mcp_{i}",
+            settings={
+                "command": "npx",
+                "args": ["-y", "mcp-remote", f"https://mcp{i}.example.com/sse"],
+                "env": {"ORG": "acme", "REGION": "us"},
+            },
+        )
+        for i in range(50)
+    },
+)
+
+
+@pytest.mark.parametrize("overrides", ["none", "per_user"])
+@pytest.mark.parametrize("mode", ["merge_per_user", "merge_layers"])
+def test_merge_layers(bench_report, overrides, mode):
+    n_users = 2_000
+    company = Layer.from_enum(CompanyMcpEnum)
+    team = Layer(
+        {f"mcp_{i}": {"env": {"REGION": "eu", "TEAM": "data"}} for i in range(20)},
+        mode=MODE_MERGE,
+    )
+    if overrides == "none":
+        user_layers = [Layer({})] * n_users
+    else:
+        user_layers = [Layer({f"user_{i}": {"command": "x"}}) for i in range(n_users)]
+
+    def merge():
+        layers._merge_cache.clear()
+        for user in user_layers:
+            if mode == "merge_layers":
+                merge_layers([company, team, user])
+            else:
+                merged = layers._EMPTY
+                for layer in (company, team, user):
+                    merged = layers._merge(merged, layer)
+
+    bench_report.add(
+        run_bench(
+            f"layers_{mode}.overrides={overrides}.users={n_users}",
+            merge,
+            repeat=3,
+            ops_per_call=n_users,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+Memory of many ``Mcp`` objects: the frozen, slotted ``Mcp`` with interned
+settings vs the original plain dataclass holding its own dicts and lists.
+"""
+
+import typing as T
+import dataclasses
+
+import pytest
+
+from claude_desktop_config.impl import Mcp, BaseMcpEnum
+from claude_desktop_config.tests.bench import run_bench
+
+
+@dataclasses.dataclass
+class LegacyMcp:
+    """
+    The original representation, kept for comparison.
+    """
+
+    name: str = dataclasses.field()
+    settings: dict[str, T.Any] = dataclasses.field()
+
+
+def make_settings(i: int) -> dict[str, T.Any]:
+    """
+    Generated settings, as they come out of a template: a handful of
+    distinct ``args`` and ``env`` values, but new objects every time.
+    """
+    return {
+        "command": "npx",
+        "args": ["-y", "mcp-remote", f"https://mcp{i % 10}.example.com/sse"],
+        "env": {"DEBUG": "false", "REGION": f"region-{i % 3}"},
+    }
+
+
+# (members, repeat)
+members = [
+    (1_000, 10),
+    (10_000, 3),
+]
+
+klasses = {
+    "legacy": LegacyMcp,
+    "frozen": Mcp,
+}
+
+
+@pytest.mark.parametrize("n,repeat", members)
+@pytest.mark.parametrize("kind", list(klasses))
+def test_mcp_memory(bench_report, kind, n, repeat):
+    klass = klasses[kind]
+
+    def make_mcps():
+        return [klass(name=f"mcp_{i}", settings=make_settings(i)) for i in range(n)]
+
+    bench_report.add(
+        run_bench(
+            f"mcp.create.{kind}.members={n}",
+            make_mcps,
+            repeat=repeat,
+            ops_per_call=n,
+        )
+    )
+
+
+def test_enum_create(bench_report):
+    """
+    A hashable ``Mcp`` makes defining a large enum linear, the enum machinery
+    falls back to a linear scan per member for unhashable values.
+    """
+    n = 10_000
+    mcps = {
+        f"mcp_{i}": Mcp(name=f"mcp_{i}", settings=make_settings(i)) for i in range(n)
+    }
+
+    bench_report.add(
+        run_bench(
+            f"enum.create.members={n}",
+            lambda: BaseMcpEnum(f"McpEnum{n}", mcps),
+            repeat=3,
+            ops_per_call=n,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""
+Overhead of the instrumentation on ``BaseMcpEnum.apply`` of a small config,
+the worst case since the hot path does little I/O: disabled (no collector
+installed) vs enabled with the built-in aggregator.
+"""
+
+import json
+import contextlib
+
+import pytest
+
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.metrics import instrument
+from claude_desktop_config.tests.bench import run_bench
+
+
+McpEnum = BaseMcpEnum(
+    "McpEnum",
+    {
+        f"mcp_{i}": Mcp(name=f"mcp_{i}", settings={"command": "npx", "args": [str(i)]})
+        for i in range(10)
+    },
+)
+wanted_a = list(McpEnum)[::2]
+wanted_b = list(McpEnum)[1::2]
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+@pytest.mark.parametrize("changed", [False, True])
+def test_apply_overhead(tmp_path, bench_report, enabled, changed):
+    path = tmp_path / "claude_desktop_config.json"
+    path.write_text(json.dumps({"theme": "dark"}, indent=4))
+    cdc = ClaudeDesktopConfig(path=path)
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        wanted = wanted_a if not changed or counter[0] % 2 else wanted_b
+        McpEnum.apply(wanted, cdc)
+
+    label = "enabled" if enabled else "disabled"
+    state = "changed" if changed else "unchanged"
+    with instrument() if enabled else contextlib.nullcontext():
+        bench_report.add(
+            run_bench(f"metrics.{label}.apply.{state}", run, repeat=2_000)
+        )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+Switching config files back and forth between two MCP sets:
+``BaseMcpEnum.apply`` vs ``BaseMcpEnum.switch_profile``. Both profiles are
+registered ahead of time. ``apply`` writes in place by default, it is also
+measured with ``concurrency="lock"``, which writes atomically like
+``switch_profile`` does.
+"""
+
+import json
+
+import pytest
+
+from claude_desktop_config.impl import ClaudeDesktopConfig, Mcp, BaseMcpEnum
+from claude_desktop_config.tests.bench import run_bench
+
+KB = 1_000
+
+
+class McpEnum(BaseMcpEnum):
+    mcp_1 = Mcp(name="mcp_1", settings={"command": "npx", "args": ["mcp1"]})
+    mcp_2 = Mcp(name="mcp_2", settings={"command": "npx", "args": ["mcp2"]})
+    mcp_3 = Mcp(name="mcp_3", settings={"command": "npx", "args": ["mcp3"]})
+
+
+PROFILES = {
+    "minimal": [McpEnum.mcp_1],
+    "full": [McpEnum.mcp_1, McpEnum.mcp_2, McpEnum.mcp_3],
+}
+for _name, _wanted in PROFILES.items():
+    McpEnum.register_profile(_name, _wanted)
+
+
+@pytest.mark.parametrize("size", [1 * KB, 100 * KB])
+@pytest.mark.parametrize("mode", ["apply", "apply_lock", "switch_profile"])
+def test_switch_profile(tmp_path, bench_report, size, mode):
+    n_files = 100
+    config = {"mcpServers": {}, "cache": ["x" * 90] * (size // 100)}
+    data = json.dumps(config, indent=4).encode("utf-8")
+    cdcs = list()
+    for i in range(n_files):
+        path = tmp_path / f"user_{i}" / "claude_desktop_config.json"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(data)
+        cdcs.append(ClaudeDesktopConfig(path=path))
+    counter = [0]
+
+    def switch():
+        counter[0] += 1
+        name = "full" if counter[0] % 2 else "minimal"
+        for cdc in cdcs:
+            if mode == "switch_profile":
+                McpEnum.switch_profile(name, cdc)
+            elif mode == "apply_lock":
+                McpEnum.apply(PROFILES[name], cdc, concurrency="lock")
+            else:
+                McpEnum.apply(PROFILES[name], cdc)
+
+    bench_report.add(
+        run_bench(
+            f"profile_{mode}.{size // KB}KB.files={n_files}",
+            switch,
+            repeat=6,
+            ops_per_call=n_files,
+            bytes_per_call=len(data) * n_files,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput and latency of ``ClaudeDesktopConfig.read`` and ``write``
+on configs from 1 KB to 50 MB, of a minimal-edit write of one server, of a
+lazy read of ``mcpServers`` only, and of memory-mapped vs plain reads.
+"""
+
+import typing as T
+
+import pytest
+
+from claude_desktop_config import impl
+from claude_desktop_config.impl import ReadCache, ClaudeDesktopConfig
+from claude_desktop_config.codec import StdlibJsonCodec, get_default_codec
+from claude_desktop_config.tests.bench import run_bench
+
+KB = 1_000
+MB = 1_000_000
+
+# (size, repeat)
+sizes = [
+    (1 * KB, 200),
+    (100 * KB, 50),
+    (1 * MB, 20),
+    (10 * MB, 5),
+    (50 * MB, 3),
+]
+
+codecs = {
+    "json": StdlibJsonCodec(),
+    "default": get_default_codec(),
+}
+
+
+def make_config(size: int) -> dict[str, T.Any]:
+    """
+    Make a config whose serialized size is roughly ``size`` bytes: a few MCP
+    servers plus a large section of cached data from other tools.
+    """
+    config = {
+        "mcpServers": {
+            f"mcp_{i}": {
+                "command": "npx",
+                "args": ["-y", "mcp-remote", f"https://mcp{i}.example.com/sse"],
+                "env": {"DEBUG": "false"},
+            }
+            for i in range(5)
+        },
+        "cache": [],
+    }
+    n = max(0, (size - 800) // 200)
+    config["cache"] = [
+        {
+            "id": i,
+            "key": f"some/cached/key/{i:08d}",
+            "value": "x" * 64,
+            "enabled": i % 2 == 0,
+            "weight": i / 7,
+        }
+        for i in range(n)
+    ]
+    return config
+
+
+def size_label(size: int) -> str:
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+@pytest.mark.parametrize("codec_name", list(codecs))
+@pytest.mark.parametrize("size,repeat", sizes)
+def test_read_write(tmp_path, bench_report, size, repeat, codec_name):
+    codec = codecs[codec_name]
+    path = tmp_path / "claude_desktop_config.json"
+    cdc = ClaudeDesktopConfig(path=path, codec=codec)
+    config = make_config(size)
+    cdc.write(config)
+    nbytes = path.stat().st_size
+    label = size_label(size)
+
+    bench_report.add(
+        run_bench(
+            f"read.{codec_name}.{label}",
+            cdc.read,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+    bench_report.add(
+        run_bench(
+            f"write.{codec_name}.{label}",
+            lambda: cdc.write(config),
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+    # alternate between two different contents so each call really writes
+    configs = [config, dict(config, flag=True)]
+    counter = [0]
+
+    def write_atomic():
+        counter[0] += 1
+        assert cdc.write(configs[counter[0] % 2], atomic=True) is True
+
+    bench_report.add(
+        run_bench(
+            f"write_atomic.{codec_name}.{label}",
+            write_atomic,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+
+@pytest.mark.parametrize("size,repeat", sizes)
+def test_read_cached_and_write_skipped(tmp_path, bench_report, size, repeat):
+    path = tmp_path / "claude_desktop_config.json"
+    cdc = ClaudeDesktopConfig(path=path, cache=ReadCache())
+    config = make_config(size)
+    cdc.write(config)
+    nbytes = path.stat().st_size
+    label = size_label(size)
+
+    bench_report.add(
+        run_bench(
+            f"read_cached.{label}",
+            cdc.read,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+    def write_skipped():
+        assert cdc.write(config, atomic=True) is False
+
+    bench_report.add(
+        run_bench(
+            f"write_skipped.{label}",
+            write_skipped,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+
+@pytest.mark.parametrize("size,repeat", sizes)
+def test_write_minimal_edit(tmp_path, bench_report, size, repeat):
+    """
+    Change one MCP server of a document read with ``minimal_edit``, only
+    that entry is serialized, the cost should not follow the file size.
+    """
+    path = tmp_path / "claude_desktop_config.json"
+    cdc = ClaudeDesktopConfig(path=path, minimal_edit=True)
+    cdc.write(make_config(size))
+    nbytes = path.stat().st_size
+    label = size_label(size)
+    doc = cdc.read(track=True)
+    assert doc.source is not None
+    counter = [0]
+
+    def write_one_server():
+        counter[0] += 1
+        doc["mcpServers"]["mcp_0"]["env"]["DEBUG"] = str(counter[0] % 2 == 0)
+        assert cdc.write(doc) is True
+
+    bench_report.add(
+        run_bench(
+            f"write_minimal_edit.{label}",
+            write_one_server,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+
+@pytest.mark.parametrize("servers_first", [True, False])
+@pytest.mark.parametrize("size,repeat", sizes)
+def test_read_lazy(tmp_path, bench_report, size, repeat, servers_first):
+    """
+    Read only ``mcpServers`` with ``lazy``. When it comes first, the rest of
+    the file is not scanned. When it comes last, the entries before it are
+    skipped without being parsed.
+    """
+    path = tmp_path / "claude_desktop_config.json"
+    cdc = ClaudeDesktopConfig(path=path, lazy=True)
+    config = make_config(size)
+    if not servers_first:
+        config = {"cache": config["cache"], "mcpServers": config["mcpServers"]}
+    cdc.write(config)
+    nbytes = path.stat().st_size
+    label = size_label(size)
+
+    def read_servers():
+        doc = cdc.read(track=True)
+        assert len(doc["mcpServers"]) == 5
+
+    position = "first" if servers_first else "last"
+    bench_report.add(
+        run_bench(
+            f"read_lazy.{position}.{label}",
+            read_servers,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+
+@pytest.mark.parametrize("mode", ["mmap", "plain"])
+@pytest.mark.parametrize("size,repeat", sizes)
+def test_read_mmap(tmp_path, monkeypatch, bench_report, size, repeat, mode):
+    """
+    Force the memory-mapped or the plain read path at every size, to check
+    where ``MMAP_READ_MIN_SIZE`` should be.
+    """
+    codec = get_default_codec()
+    if not codec.accepts_buffer:
+        pytest.skip(f"{codec.name} can't parse a buffer")
+    min_size = 0 if mode == "mmap" else float("inf")
+    monkeypatch.setattr(impl, "MMAP_READ_MIN_SIZE", min_size)
+    path = tmp_path / "claude_desktop_config.json"
+    cdc = ClaudeDesktopConfig(path=path, codec=codec)
+    cdc.write(make_config(size))
+    nbytes = path.stat().st_size
+
+    bench_report.add(
+        run_bench(
+            f"read_{mode}.{size_label(size)}",
+            cdc.read,
+            repeat=repeat,
+            bytes_per_call=nbytes,
+        )
+    )
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cost of saving the previous content of many mostly identical config files
+before a write: a timestamped copy of each file vs ``SnapshotStore``.
+"""
+
+import json
+import shutil
+
+import pytest
+
+from claude_desktop_config.snapshot import SnapshotStore
+from claude_desktop_config.tests.bench import run_bench
+
+KB = 1_000
+
+
+@pytest.mark.parametrize("size", [10 * KB, 100 * KB])
+@pytest.mark.parametrize("mode", ["copy", "snapshot"])
+def test_backup_many_files(tmp_path, bench_report, size, mode):
+    n_files = 200
+    config = {"mcpServers": {}, "cache": ["x" * 90] * (size // 100)}
+    data = json.dumps(config, indent=4).encode("utf-8")
+    paths = list()
+    for i in range(n_files):
+        path = tmp_path / "home" / f"user_{i}" / "claude_desktop_config.json"
+        path.parent.mkdir(parents=True)
+        path.write_bytes(data)
+        paths.append(path)
+    dir_backup = tmp_path / "backup"
+    store = SnapshotStore(tmp_path / "snapshots")
+    counter = [0]
+
+    def backup():
+        counter[0] += 1
+        for i, path in enumerate(paths):
+            if mode == "copy":
+                dst = dir_backup / f"user_{i}" / f"{counter[0]}.json"
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(path, dst)
+            else:
+                store.snapshot(path)
+
+    bench_report.add(
+        run_bench(
+            f"backup_{mode}.{size // KB}KB.files={n_files}",
+            backup,
+            repeat=5,
+            ops_per_call=n_files,
+            bytes_per_call=len(data) * n_files,
+        )
+    )
+    root = dir_backup if mode == "copy" else store.root
+    disk_usage = sum(p.stat().st_size for p in root.rglob("*") if p.is_file())
+    print(f"backup_{mode}.{size // KB}KB disk usage: {disk_usage / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    import os
+
+    basename = os.path.basename(__file__)
+    pytest.main([basename, "-s", "--tb=native"])